@@ -73,6 +73,7 @@
 				#ifdef REMOTE_UARTBUS
 					//#define TEST_HALL2LED
 					#define SLAVE_ID	1		// must be unique for all hoverboards connected to the bus
+					//#define REMOTE_BAUD 115200	// high-baud link, default 4800 in remoteUartBus.h. Vehicle drivers/motor.py Motor(high_baudrate=115200) falls back to 4800 if the boards don't answer
 				#endif
 		//#define REMOTE_CRSF		// https://github.com/RoboDurden/Hoverboard-Firmware-Hack-Gen2.x/issues/26
 		//#define REMOTE_ROS2		// https://github.com/RoboDurden/Hoverboard-Firmware-Hack-Gen2.x/issues/122
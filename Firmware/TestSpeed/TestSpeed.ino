@@ -3,7 +3,8 @@
 #include "hoverserial.h"
 
 // ------------------- Config -------------------
-#define BAUDRATE 4800  // Baud rate for hoverboard communication
+#define BAUDRATE HOVER_BAUD_DEFAULT  // Baud rate for hoverboard communication
+//#define BAUDRATE HOVER_BAUD_HIGH  // high-baud mode, must match REMOTE_BAUD in HoverBoardGigaDevice/Inc/config.h
 #define SEND_MILLIS 100  // Command send interval
 #define ABS(x) ((x) < 0 ? -(x) : (x))  // Macro for absolute value calculation
 
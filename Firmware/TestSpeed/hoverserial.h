@@ -11,6 +11,11 @@ uint8_t beepsBackwards = 0;
 uint8_t activateWeakening = 0;
 */
 
+// Default REMOTE_BAUD of the UARTBUS firmware. The high-baud mode uses 115200,
+// which must be set in both the firmware config.h and the sketch.
+#define HOVER_BAUD_DEFAULT  4800
+#define HOVER_BAUD_HIGH     115200
+
 template <typename O,typename I> void HoverSetupEsp32(O& oSerial, I iBaud, I gpio_RX, I gpio_TX)
 {
   // Starts the serial connection using the baud, protocol, GPIO RX, GPIO TX.
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compass sampling benchmark: I2C transactions per second, CPU use and heading error of
+the data-ready synchronized BurstSampler + HeadingFilter (drivers/qmc5883p.py) against
+the old loop (status + data read every 50 ms, raw heading published), on the
+QMC5883P stand-in (sim/compass.py).
+
+Heading error is measured against the true heading at the moment each heading is
+published, so a stale sample counts as error while the tank turns.
+
+Usage: python3 bench_compass.py --duration 5 --odr 100 --window 5 --noise 0.03 --spike-rate 0.02
+"""
+import argparse
+import math
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.qmc5883p import REG_STATUS, REG_XOUT_LSB, FIELD, LSB_PER_GAUSS, STATUS_DRDY, BurstSampler, HeadingFilter
+from sim.compass import QMC5883PSimulator
+
+def heading(x: float, y: float) -> float:
+    return math.degrees(math.atan2(x, y)) % 360
+
+def angle_error(a: float, b: float) -> float:
+    return abs((a - b + 180) % 360 - 180)
+
+def legacy_loop(sensor: QMC5883PSimulator, stop: threading.Event, publish):
+    """What update_compass_thread did: read whatever is there every 50 ms."""
+    status, data = bytearray(1), bytearray(FIELD.size)
+    while not stop.is_set():
+        with sensor as i2c:
+            i2c.write_then_readinto(bytes((REG_STATUS,)), status)
+            i2c.write_then_readinto(bytes((REG_XOUT_LSB,)), data)
+        x, y, _ = (v / LSB_PER_GAUSS[8] for v in FIELD.unpack(data))
+        publish(heading(x, y), bool(status[0] & STATUS_DRDY))
+        time.sleep(.05)
+
+def burst_loop(sensor: QMC5883PSimulator, stop: threading.Event, publish, odr: int, heading_filter: HeadingFilter | None):
+    sampler = BurstSampler(sensor, odr=odr)
+    sampler.configure()
+    while not stop.is_set():
+        sample = sampler.read()
+        if sample is None:
+            continue
+        raw = heading(sample.x, sample.y)
+        publish(heading_filter.add(raw)[0] if heading_filter else raw, True)
+
+def run(name: str, args, loop, *loop_args) -> dict:
+    sensor = QMC5883PSimulator(odr=args.odr, rotation_rate=args.rotation_rate, noise=args.noise,
+                               spike_rate=args.spike_rate, seed=args.seed)
+    stop = threading.Event()
+    errors = []
+    fresh = []
+    cpu = []
+
+    def publish(value: float, new: bool):
+        errors.append(angle_error(value, sensor.heading_at(time.perf_counter())))
+        fresh.append(new)
+
+    def thread():
+        start = time.thread_time()
+        loop(sensor, stop, publish, *loop_args)
+        cpu.append(time.thread_time() - start)
+
+    worker = threading.Thread(target=thread, daemon=True)
+    start = time.perf_counter()
+    worker.start()
+    time.sleep(args.duration)
+    stop.set()
+    worker.join(timeout=2)
+    elapsed = time.perf_counter() - start
+    errors.sort()
+    return {
+        "name": name,
+        "transactions": sensor.transactions / elapsed,
+        "headings": len(errors) / elapsed,
+        "stale": 1 - sum(fresh) / len(fresh) if fresh else 0,
+        "cpu": cpu[0] / elapsed if cpu else 0,
+        "bus": sensor.bus_time / elapsed,
+        "p50": statistics.median(errors),
+        "p99": errors[int(len(errors) * 0.99)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--odr", type=int, choices=[10, 50, 100, 200], default=100)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.03, help="gauss per axis, about 3.4 deg at 0.5 gauss")
+    parser.add_argument("--spike-rate", type=float, default=0.02, help="fraction of samples with a 30 deg spike")
+    parser.add_argument("--rotation-rate", type=float, default=30, help="deg/s")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = [
+        run("old 50 ms loop", args, legacy_loop),
+        run("burst, raw", args, burst_loop, args.odr, None),
+        run(f"burst, mean of {args.window}", args, burst_loop, args.odr, HeadingFilter(args.window, "mean")),
+        run(f"burst, median of {args.window}", args, burst_loop, args.odr, HeadingFilter(args.window, "median")),
+    ]
+    print(f"QMC5883P at {args.odr} Hz, turning {args.rotation_rate} deg/s, {args.noise} G noise, {args.spike_rate:.0%} spikes")
+    print(f"{'':<20} | transactions/s | headings/s | stale | CPU   | bus busy | error p50 | error p99")
+    for r in results:
+        print(f"{r['name']:<20} | {r['transactions']:14.1f} | {r['headings']:10.1f} | {r['stale']:5.0%} | {r['cpu']:5.1%} | "
+              f"{r['bus']:8.1%} | {r['p50']:5.2f} deg | {r['p99']:5.2f} deg")
+
+if __name__ == "__main__":
+    main()
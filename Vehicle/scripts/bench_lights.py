@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+NeoPixel SPI encoding benchmark: frames encoded per second and CPU per frame for the
+old bit loop (a list of 24 ints per pixel, extended across the strip) against the
+lookup table encoder (drivers/neopixel.py), pure Python and NumPy, for a few strip
+lengths. Checks that every encoder produces the same bytes as the old one.
+
+Usage: python3 bench_lights.py --pixels 30 150 600 --duration 1 --fps 60
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.neopixel import RESET_BYTES, NeoPixelEncoder, np
+
+def legacy_encode(pixels) -> list[int]:
+    """What Lights._update_strip did before the lookup table."""
+    spi_data = []
+    for r, g, b in pixels:
+        grb = (g << 16) | (r << 8) | b
+        pixel = []
+        for i in range(23, -1, -1):
+            if (grb >> i) & 1:
+                pixel.extend([0b11110000])
+            else:
+                pixel.extend([0b11000000])
+        spi_data.extend(pixel)
+    spi_data.extend([0x00] * RESET_BYTES)
+    return spi_data
+
+def frames(num_pixels: int, rng: random.Random, count: int = 64) -> list[list[tuple[int, int, int]]]:
+    """Random animation frames, so nothing can be cached between calls."""
+    return [[(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(num_pixels)] for _ in range(count)]
+
+def run(encode, animation, duration: float) -> float:
+    """s of CPU per frame."""
+    encoded = 0
+    start = time.process_time()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        for frame in animation:
+            encode(frame)
+        encoded += len(animation)
+    return (time.process_time() - start) / encoded
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pixels", type=int, nargs="+", default=[30, 150, 600])
+    parser.add_argument("--duration", type=float, default=1.0, help="s per encoder and strip length")
+    parser.add_argument("--fps", type=int, default=60, help="animation rate the CPU column is for")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'pixels':>6} | {'encoder':<14} | {'frames/s':>9} | {'us/frame':>8} | CPU at {args.fps} fps | same bytes")
+    for num_pixels in args.pixels:
+        animation = frames(num_pixels, rng)
+        expected = bytes(legacy_encode(animation[0]))
+        encoder = NeoPixelEncoder(num_pixels)
+        runs = {"old bit loop": (legacy_encode, animation), "lookup table": (encoder.encode, animation)}
+        if np is not None:
+            runs["lookup, NumPy"] = (encoder.encode, [np.array(frame, dtype=np.uint8) for frame in animation])
+        for name, (encode, inputs) in runs.items():
+            same = bytes(encode(inputs[0])) == expected
+            per_frame = run(encode, inputs, args.duration)
+            print(f"{num_pixels:>6} | {name:<14} | {1 / per_frame:9.0f} | {per_frame * 1e6:8.1f} | "
+                  f"{per_frame * args.fps:13.2%} | {'yes' if same else 'NO'}")
+    if np is None:
+        print("NumPy not installed, skipped the NumPy encoder")
+
+if __name__ == "__main__":
+    main()
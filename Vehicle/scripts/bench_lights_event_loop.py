@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Event loop lag while websocket clients drag the headlight slider: Lights on the SPI
+stand-in (sim/spi.py), called straight from the handler coroutines like api/ws.py
+does, with show() transferring on the event loop (before) or handing off to
+update_lights_thread (after).
+
+Handler time is how long set_headlights blocks the coroutine that called it. Lag is
+how late a 1 ms asyncio.sleep wakes up, sampled continuously; it's what every other
+client's motor commands wait on. Also reports how many light requests turned
+into SPI transfers.
+
+Usage: python3 bench_lights_event_loop.py --clients 3 --rate 50 --duration 5
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.lights import Lights
+from sim.spi import SPISimulator
+
+async def monitor_lag(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+async def client(lights: Lights, stop: asyncio.Event, rate: float, rng: random.Random, calls: list[float]):
+    """Slider drags: bursts of changing levels, then a pause."""
+    level = rng.randrange(101)
+    while not stop.is_set():
+        for _ in range(rng.randrange(5, 30)):
+            level = max(0, min(100, level + rng.randrange(-10, 11)))
+            start = time.perf_counter()
+            lights.set_headlights(level)
+            calls.append(time.perf_counter() - start)
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.sleep(rng.uniform(0.1, 0.5))
+
+async def run(name: str, args, worker: bool) -> dict:
+    spi = SPISimulator()
+    lights = Lights(spi=spi, worker=worker)
+    lights.side_on()
+    await asyncio.sleep(0.01)  # let the worker send it
+    requests, transfers = lights.requests, spi.transfers
+
+    stop = asyncio.Event()
+    lags = []
+    calls = []
+    rng = random.Random(args.seed)
+    tasks = [asyncio.create_task(monitor_lag(stop, lags))]
+    tasks += [asyncio.create_task(client(lights, stop, args.rate, random.Random(rng.random()), calls)) for _ in range(args.clients)]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    lights.stop()
+
+    lags.sort()
+    calls.sort()
+    return {
+        "name": name,
+        "call p50": statistics.median(calls),
+        "call p99": calls[int(len(calls) * 0.99)],
+        "p50": statistics.median(lags),
+        "p99": lags[int(len(lags) * 0.99)],
+        "max": lags[-1],
+        "requests": lights.requests - requests,
+        "transfers": spi.transfers - transfers,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=50, help="light messages/s per client while dragging")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = [
+        asyncio.run(run("show() on the loop", args, worker=False)),
+        asyncio.run(run("update_lights_thread", args, worker=True)),
+    ]
+    print(f"{args.clients} clients dragging the headlight slider, {args.rate:.0f} msg/s each")
+    print(f"{'':<20} | handler p50 | handler p99 | lag p50  | lag p99  | lag max  | requests | SPI transfers")
+    for r in results:
+        print(f"{r['name']:<20} | {r['call p50'] * 1000:8.3f} ms | {r['call p99'] * 1000:8.3f} ms | "
+              f"{r['p50'] * 1000:5.2f} ms | {r['p99'] * 1000:5.2f} ms | {r['max'] * 1000:5.2f} ms | "
+              f"{r['requests']:8d} | {r['transfers']:8d}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the hoverboard control frame encoder.
+Compares the old bit-by-bit CRC + struct concatenation against drivers/hover_protocol.py.
+
+Usage: python3 bench_motor_codec.py [frames]
+"""
+import argparse
+import struct
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.hover_protocol import FrameEncoder
+
+# ----------------------
+# Old implementation (copied from drivers/motor.py before the codec)
+# ----------------------
+def legacy_calc_crc(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc ^= (byte << 8)
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = (crc << 1) ^ 0x1021
+            else:
+                crc <<= 1
+    return crc & 0xFFFF
+
+def legacy_build_packet(iSlave: int, iSpeed: int, wState: int) -> bytes:
+    START_BYTE = b'\x2F'
+    DATA_TYPE = b'\x00'
+    slave_byte = struct.pack("<B", iSlave)
+    speed_bytes = struct.pack("<h", iSpeed)
+    state_byte = struct.pack("<B", wState)
+    payload_without_crc = START_BYTE + DATA_TYPE + slave_byte + speed_bytes + state_byte
+    crc_bytes = struct.pack("<H", legacy_calc_crc(payload_without_crc))
+    return payload_without_crc + crc_bytes
+
+# ----------------------
+# Benchmark
+# ----------------------
+def run(name, encode, frames: int) -> float:
+    start = time.perf_counter()
+    for i in range(frames):
+        encode(i & 1, (i % 2001) - 1000, 32)
+    elapsed = time.perf_counter() - start
+    rate = frames / elapsed
+    print(f"{name:<10} {rate:>12,.0f} frames/s  ({elapsed * 1e6 / frames:.2f} us/frame)")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("frames", type=int, nargs="?", default=200_000, help="frames per encoder")
+    frames = parser.parse_args().frames
+    encoder = FrameEncoder()
+
+    # Sanity check: both encoders must produce identical frames
+    for speed in (-1000, -1, 0, 1, 500, 1000):
+        for slave in (0, 1):
+            assert legacy_build_packet(slave, speed, 32) == bytes(encoder.encode(slave, speed, 32))
+
+    before = run("before", legacy_build_packet, frames)
+    after = run("after", encoder.encode, frames)
+    print(f"speedup    {after / before:.1f}x")
+
+if __name__ == "__main__":
+    main()
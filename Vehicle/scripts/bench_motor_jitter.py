@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Compares the threaded Motor backend with AsyncMotor under load, the way the server runs
+them: set_motor is called from a coroutine while other coroutines and a busy thread
+(standing in for GPS/compass) compete for the loop and the GIL.
+
+Reports set_motor -> ESC latency percentiles/stdev and keep-alive period jitter,
+measured at the pty ESC stand-in (sim/esc.py).
+
+Usage: python3 bench_motor_jitter.py --rate 50 --duration 5
+"""
+import argparse
+import asyncio
+import bisect
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from core.types import MotorCommand
+from drivers.async_motor import AsyncMotor
+from drivers.motor import Motor
+from sim.esc import ESCSimulator
+
+VALUES = 999
+
+def busy_thread(stop: threading.Event):
+    x = 0
+    while not stop.is_set():
+        x = (x * 31 + 7) % 1_000_003
+
+async def busy_coroutine(stop: asyncio.Event, work_ms: float):
+    # Sync work on the loop, like encoding telemetry or handling other websocket messages
+    while not stop.is_set():
+        end = time.perf_counter() + work_ms / 1000
+        while time.perf_counter() < end:
+            pass
+        await asyncio.sleep(0.002)
+
+def match_latencies(received, sends: dict[int, list[float]]) -> list[float]:
+    latencies = []
+    matched = set()
+    for frame in received:
+        if frame.slave != 1 or frame.speed not in sends:
+            continue
+        times = sends[frame.speed]
+        index = bisect.bisect_right(times, frame.arrival) - 1
+        if index < 0 or (frame.speed, index) in matched:
+            continue
+        matched.add((frame.speed, index))
+        latencies.append(frame.arrival - times[index])
+    return sorted(latencies)
+
+async def run_backend(name: str, backend, args) -> None:
+    with ESCSimulator() as esc:
+        motors = backend(port=esc.port, baudrate=args.baud, event_driven=True) if backend is Motor else backend(port=esc.port, baudrate=args.baud)
+        if isinstance(motors, AsyncMotor):
+            motors.start()
+
+        stop_load = asyncio.Event()
+        stop_thread = threading.Event()
+        load = [asyncio.create_task(busy_coroutine(stop_load, args.loop_work_ms)) for _ in range(args.busy_coroutines)]
+        thread = threading.Thread(target=busy_thread, args=(stop_thread,), daemon=True)
+        thread.start()
+
+        sends: dict[int, list[float]] = {}
+        start = time.perf_counter()
+        i = 0
+        while time.perf_counter() - start < args.duration:
+            value = i % VALUES + 1
+            sends.setdefault(value, []).append(time.perf_counter())
+            motors.set_motor(MotorCommand(left=value, right=value))
+            i += 1
+            await asyncio.sleep(1 / args.rate)
+
+        # Hold the last command for 1.5 s (inside the 2 s deadman) to see keep-alive jitter
+        idle_start = time.perf_counter()
+        await asyncio.sleep(1.5)
+
+        stop_load.set()
+        stop_thread.set()
+        await asyncio.gather(*load)
+        motors.cleanup()
+
+    latencies = match_latencies(esc.received, sends)
+    # Skip the stop frames sent by cleanup()
+    keepalive = [f.arrival for f in esc.received if f.slave == 1 and f.speed != 0 and f.arrival > idle_start + 0.2]
+    intervals = [b - a for a, b in zip(keepalive, keepalive[1:])]
+
+    if latencies:
+        print(
+            f"{name:<8} latency ms p50 {latencies[len(latencies) // 2] * 1000:6.2f} | "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} | "
+            f"stdev {statistics.pstdev(latencies) * 1000:6.2f} | n {len(latencies)}"
+        )
+    if len(intervals) > 1:
+        print(
+            f"{name:<8} keep-alive ms mean {statistics.mean(intervals) * 1000:6.2f} | "
+            f"jitter (stdev) {statistics.pstdev(intervals) * 1000:5.2f} | max {max(intervals) * 1000:6.2f}"
+        )
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=50)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--busy-coroutines", type=int, default=2)
+    parser.add_argument("--loop-work-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    await run_backend("thread", Motor, args)
+    await run_backend("asyncio", AsyncMotor, args)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the motor path against the pty ESC stand-in (sim/esc.py).
+Drives Motor.set_motor at a fixed rate and reports set_motor -> ESC latency
+percentiles, commands that never reached the wire and CPU per frame. A command
+replaced by a newer one before it went out is timed until the newer one's frame.
+
+Usage: python3 bench_motor_path.py --rate 200 --duration 10 --event-driven
+"""
+import argparse
+import bisect
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from core.types import MotorCommand
+from drivers.motor import Motor
+from sim.esc import ESCSimulator
+
+VALUES = 999  # command values cycle through 1..999 so each one can be found on the wire
+
+def percentile(samples: list[float], pct: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=100, help="set_motor calls per second")
+    parser.add_argument("--duration", type=float, default=5, help="seconds")
+    parser.add_argument("--baud", type=int, default=4800)
+    parser.add_argument("--send-interval", type=float, default=0.1)
+    parser.add_argument("--event-driven", action="store_true")
+    parser.add_argument("--feedback-rate", type=float, default=None, help="Hz per slave, default answers every frame")
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--truncate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with ESCSimulator(feedback_rate=args.feedback_rate, noise=args.noise, truncate=args.truncate, seed=1) as esc:
+        motors = Motor(port=esc.port, baudrate=args.baud, send_interval=args.send_interval, event_driven=args.event_driven)
+
+        commands: list[float] = []  # send time of every command, in order
+        sends: dict[int, tuple[list[float], list[int]]] = {}  # value -> send times and command indices
+        sent_count = 0
+        period = 1 / args.rate
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        next_send = start
+        while time.perf_counter() - start < args.duration:
+            value = sent_count % VALUES + 1
+            times, indices = sends.setdefault(value, ([], []))
+            times.append(time.perf_counter())
+            indices.append(sent_count)
+            commands.append(times[-1])
+            motors.set_motor(MotorCommand(left=value, right=value))
+            sent_count += 1
+
+            next_send += period
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        time.sleep(max(0.5, 3 * args.send_interval))  # let the last frames arrive
+        motors.cleanup()
+        cpu_used = time.process_time() - cpu_start
+
+    # Each command is timed to the first right-side frame carrying its value or a later command's value,
+    # so commands replaced before they reached the wire count with the wait for their replacement
+    latencies: list[float] = []
+    untimed = 0  # index of the oldest command no frame has covered yet
+    for frame in esc.received:
+        if frame.slave != 1 or frame.speed not in sends:
+            continue
+        times, indices = sends[frame.speed]
+        position = bisect.bisect_right(times, frame.arrival) - 1
+        if position < 0 or indices[position] < untimed:
+            continue  # keep-alive repeat
+        for index in range(untimed, indices[position] + 1):
+            latencies.append(frame.arrival - commands[index])
+        untimed = indices[position] + 1
+
+    latencies.sort()
+    frames_on_wire = len(esc.received)
+    parser_stats = motors._feedback_parser
+
+    mode = "event-driven" if args.event_driven else "periodic"
+    print(f"mode               {mode} @ {args.baud} baud, {args.rate:.0f} cmd/s for {args.duration:.0f} s")
+    print(f"commands           {sent_count} sent, {len(latencies)} reached the ESC (or were replaced by one that did), {sent_count - len(latencies)} never did")
+    if latencies:
+        print(
+            "latency ms         "
+            f"p50 {percentile(latencies, 50) * 1000:.2f} | p90 {percentile(latencies, 90) * 1000:.2f} | "
+            f"p99 {percentile(latencies, 99) * 1000:.2f} | max {latencies[-1] * 1000:.2f}"
+        )
+    print(f"control frames     {frames_on_wire} received by ESC, {esc.crc_errors} bad CRC, {motors.frames_coalesced} coalesced")
+    print(
+        f"feedback frames    {esc.feedback_sent} sent ({esc.feedback_corrupted} corrupted), "
+        f"{parser_stats.frames_ok} decoded, {parser_stats.crc_errors} bad CRC"
+    )
+    if frames_on_wire:
+        print(f"CPU per frame      {(cpu_used - esc.cpu_time) / frames_on_wire * 1e6:.1f} us (simulator excluded)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Throughput report for the motor link: control frames/s and feedback frames/s,
+with the baud rate negotiated by Motor's startup probe.
+
+Runs against the pty ESC stand-in (sim/esc.py). A pty has no real line rate: control
+frames are bounded by Motor's own wire-time pacing for the negotiated baud rate, and
+the simulator paces its feedback to --esc-baud (skipping what the line can't carry),
+unless --unpaced.
+Set --esc-baud to something other than --high-baud to see the 4800 fallback.
+
+Usage: python3 bench_motor_throughput.py --high-baud 115200 --esc-baud 115200
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from core.types import MotorCommand
+from drivers.hover_protocol import CONTROL_FRAME_SIZE, FEEDBACK_FRAME
+from drivers.motor import Motor
+from sim.esc import ESCSimulator
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--high-baud", type=int, default=115200, help="rate Motor probes first")
+    parser.add_argument("--esc-baud", type=int, default=115200, help="rate the simulated ESC firmware runs at")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--rate", type=float, default=1000, help="set_motor calls per second")
+    parser.add_argument("--unpaced", action="store_true", help="let the simulator answer every frame at pty speed")
+    args = parser.parse_args()
+
+    with ESCSimulator(baudrate=args.esc_baud, pace=not args.unpaced) as esc:
+        motors = Motor(port=esc.port, high_baudrate=args.high_baud, event_driven=True)
+        print(f"negotiated baud    {motors.BAUDRATE}")
+
+        received_before = len(esc.received)
+        feedback_before = motors._feedback_parser.frames_ok
+        start = time.perf_counter()
+        i = 0
+        while time.perf_counter() - start < args.duration:
+            value = i % 1000
+            motors.set_motor(MotorCommand(left=value, right=value))
+            i += 1
+            time.sleep(1 / args.rate)
+        elapsed = time.perf_counter() - start
+        motors.cleanup()
+
+    control = len(esc.received) - received_before
+    feedback = motors._feedback_parser.frames_ok - feedback_before
+    bytes_per_second = motors.BAUDRATE / 10  # 8N1
+
+    print(f"set_motor calls    {i / elapsed:8.1f} /s")
+    print(f"control frames     {control / elapsed:8.1f} /s")
+    print(f"feedback frames    {feedback / elapsed:8.1f} /s{' (unpaced, not limited by the line)' if args.unpaced else ''}, "
+          f"{esc.feedback_skipped} skipped by the ESC while its line was busy")
+    print(f"link limit TX      {bytes_per_second / CONTROL_FRAME_SIZE:8.1f} control frames/s at {motors.BAUDRATE} baud")
+    print(f"link limit RX      {bytes_per_second / FEEDBACK_FRAME.size:8.1f} feedback frames/s at {motors.BAUDRATE} baud")
+
+if __name__ == "__main__":
+    main()
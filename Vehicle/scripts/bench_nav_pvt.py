@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Compares full pyubx2 parsing with the fast NAV-PVT path in drivers/ubx.py on a
+synthetic ZED-F9P stream (NAV-PVT + NAV-STATUS + NMEA GGA per epoch).
+
+Usage: python3 bench_nav_pvt.py [epochs]
+"""
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+from pyubx2 import UBXMessage, UBXReader # type: ignore
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.ubx import FastGNSSReader
+
+GGA = b"$GNGGA,123519.00,4221.66870,N,07103.42500,W,4,22,0.6,12.3,M,-33.1,M,1.0,0000*51\r\n"
+
+class ByteStream(io.BytesIO):
+    """Serial stand-in, `FastGNSSReader` reads `in_waiting` bytes at a time."""
+    in_waiting = 4096
+
+def make_stream(epochs: int) -> bytes:
+    chunks = []
+    for i in range(epochs):
+        pvt = UBXMessage(
+            "NAV", "NAV-PVT", 0, iTOW=i * 100, fixType=3, gnssFixOk=1, diffSoln=1, carrSoln=2, numSV=22,
+            lon=-71.0570831 + i * 1e-7, lat=42.3611452, hMSL=12300, hAcc=14, vAcc=20, gSpeed=500,
+        )
+        status = UBXMessage("NAV", "NAV-STATUS", 0, iTOW=i * 100, gpsFix=3)
+        chunks += [pvt.serialize(), status.serialize(), GGA]
+    return b"".join(chunks)
+
+def run(name: str, reader, epochs: int) -> float:
+    pvts = 0
+    start = time.process_time()
+    while True:
+        raw, parsed = reader.read()
+        if raw is None:
+            break
+        if parsed is not None and getattr(parsed, "identity", None) == "NAV-PVT":
+            pvts += 1
+    elapsed = time.process_time() - start
+    assert pvts == epochs, f"{name}: decoded {pvts} of {epochs} NAV-PVT"
+    print(f"{name:<10} {epochs / elapsed:>10,.0f} epochs/s  ({elapsed * 1e6 / epochs:.1f} us CPU per epoch)")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("epochs", type=int, nargs="?", default=5000, help="NAV-PVT + NAV-STATUS + GGA per epoch")
+    epochs = parser.parse_args().epochs
+    data = make_stream(epochs)
+
+    before = run("pyubx2", UBXReader(ByteStream(data)), epochs)
+    after = run("fast path", FastGNSSReader(ByteStream(data)), epochs)
+    print(f"speedup    {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
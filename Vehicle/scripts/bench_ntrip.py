@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Time-to-fix benchmark for the GPS driver's NTRIP path. Runs N trials of the driver
+against the local caster stand-in (sim/ntrip.py) and a simulated ZED-F9P whose RTK
+solution follows the corrections it gets (sim/gnss.py), or a replayed receiver.
+
+Reports per trial and overall: time to first correction, time to RTK fixed,
+correction throughput, and how often and how fast the client reconnected.
+
+Usage: python3 bench_ntrip.py --trials 5 --duration 60 --latency 0.2 --dropout-interval 20
+       python3 bench_ntrip.py --rtcm gnss.rec      (serve corrections from a GPS recording)
+       python3 bench_ntrip.py --replay gnss.rec    (receiver from a recording, fix times are the recorded ones)
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.gps import GPS
+from drivers.ntrip import Caster
+from sim.gnss import GNSSSimulator
+from sim.ntrip import NTRIPCaster, recorded_rtcm
+
+def run_trial(trial: int, args) -> dict:
+    source = recorded_rtcm(args.rtcm) if args.rtcm else None
+    rx = None if args.replay else GNSSSimulator(rate=args.nav_rate, process=True, fix_after=args.fix_after).start()
+    caster = NTRIPCaster(source, latency=args.latency, bandwidth=args.bandwidth,
+                         dropout_interval=args.dropout_interval, seed=trial).start()
+    try:
+        gps = GPS(port=rx.port if rx else "", nav_rate=args.nav_rate, replay=args.replay,
+                  casters=[Caster("127.0.0.1", caster.port, caster.mountpoint)])
+
+        def run():
+            with gps.ntrip_client():
+                gps.read_gnss_loop()
+
+        gps.start_time = time.time()
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        time.sleep(args.duration)
+        end = time.time()
+        gps.stop()
+        thread.join(timeout=3)
+        gps.cleanup()
+    finally:
+        caster.stop()
+        if rx:
+            rx.stop()
+    time.sleep(0.2)  # let the caster threads record their connections
+
+    connections = sorted(caster.connections, key=lambda c: c.opened)
+    gaps = [b.opened - a.closed for a, b in zip(connections, connections[1:])]
+    first = gps.first_rtcm_time
+    return {
+        "ttfc": first - gps.start_time if first else None,
+        "ttf": gps.time_to_fix,
+        "throughput": gps.rtcm_bytes / (end - first) if first else 0.0,
+        "connections": len(connections),
+        "dropouts": sum(c.dropped for c in connections),
+        "reconnect_gap": max(gaps) if gaps else None,
+        "served": caster.bytes_sent,
+        "written": gps.rtcm_bytes,
+    }
+
+def fmt(value, unit="s") -> str:
+    return f"{value:7.2f} {unit}" if value is not None else "      - " + " " * len(unit)
+
+def summary(name: str, values: list, unit: str = "s"):
+    present = [v for v in values if v is not None]
+    if not present:
+        print(f"{name:<22} never ({len(values)} trials)")
+        return
+    missing = f" ({len(values) - len(present)} trials never)" if len(present) < len(values) else ""
+    print(f"{name:<22} median {statistics.median(present):7.2f} | min {min(present):7.2f} | max {max(present):7.2f} {unit}{missing}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=30, help="s per trial")
+    parser.add_argument("--latency", type=float, default=0.0, help="caster latency in s")
+    parser.add_argument("--bandwidth", type=float, default=None, help="caster link bytes/s")
+    parser.add_argument("--dropout-interval", type=float, default=None, help="mean s between caster disconnects")
+    parser.add_argument("--fix-after", type=float, default=5.0, help="s of corrections the simulated receiver needs for RTK fixed")
+    parser.add_argument("--nav-rate", type=int, default=5)
+    parser.add_argument("--rtcm", help="serve the corrections from this GPS recording instead of synthetic RTCM")
+    parser.add_argument("--replay", help="replay the receiver from this GPS recording instead of simulating it")
+    args = parser.parse_args()
+
+    results = []
+    print("trial |    first corr |   RTK fixed |     throughput | conns | drops | max reconnect gap")
+    for trial in range(args.trials):
+        r = run_trial(trial, args)
+        results.append(r)
+        print(f"{trial:5d} | {fmt(r['ttfc']):>13} | {fmt(r['ttf']):>11} | {r['throughput']:8.1f} B/s | "
+              f"{r['connections']:5d} | {r['dropouts']:5d} | {fmt(r['reconnect_gap'])}")
+
+    print()
+    summary("time to 1st correction", [r["ttfc"] for r in results])
+    summary("time to RTK fixed", [r["ttf"] for r in results])
+    summary("throughput", [r["throughput"] for r in results], "B/s")
+    summary("reconnects", [r["connections"] - 1 for r in results], "")
+    summary("max reconnect gap", [r["reconnect_gap"] for r in results])
+    lost = sum(r["served"] - r["written"] for r in results)
+    print(f"{'served, not written':<22} {lost} B (first chunk after each connect, and in flight at disconnect)")
+
+if __name__ == "__main__":
+    main()
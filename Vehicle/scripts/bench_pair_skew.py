@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Measures how far apart the left (slave 0) and right (slave 1) frames of one command
+arrive at the pty ESC stand-in, comparing two writes per pair (old `_send_pair`)
+with the single batched write Motor uses now.
+
+Busy threads stand in for the websocket/GPS/compass threads competing for the GIL.
+
+Usage: python3 bench_pair_skew.py --pairs 2000 --busy-threads 3
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+import serial  # type: ignore
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.hover_protocol import FrameEncoder
+from sim.esc import ESCSimulator
+
+def busy(stop: threading.Event):
+    x = 0
+    while not stop.is_set():
+        x = (x * 31 + 7) % 1_000_003
+
+def measure(name: str, send_pair, pairs: int, interval: float, busy_threads: int):
+    with ESCSimulator(slaves=()) as esc:  # no feedback, only record arrivals
+        ser = serial.Serial(esc.port, baudrate=4800, timeout=1)
+        encoder = FrameEncoder()
+        stop = threading.Event()
+        workers = [threading.Thread(target=busy, args=(stop,), daemon=True) for _ in range(busy_threads)]
+        for worker in workers:
+            worker.start()
+
+        for i in range(pairs):
+            send_pair(ser, encoder, i % 1000, -(i % 1000))
+            time.sleep(interval)
+
+        stop.set()
+        time.sleep(0.2)
+        ser.close()
+
+    gaps = []
+    pending_left = None
+    for frame in esc.received:
+        if frame.slave == 0:
+            pending_left = frame
+        elif pending_left is not None:
+            gaps.append(frame.arrival - pending_left.arrival)
+            pending_left = None
+
+    gaps.sort()
+    split = sum(1 for gap in gaps if gap > 0)
+    print(
+        f"{name:<13} pairs {len(gaps):>5} | split across reads {split:>5} | "
+        f"gap p50 {gaps[len(gaps) // 2] * 1e6:7.1f} us | p99 {gaps[int(len(gaps) * 0.99)] * 1e6:8.1f} us | "
+        f"max {gaps[-1] * 1e6:8.1f} us"
+    )
+
+def two_writes(ser, encoder: FrameEncoder, left: int, right: int):
+    ser.write(encoder.encode(0, left))
+    ser.write(encoder.encode(1, right))
+
+def one_write(ser, encoder: FrameEncoder, left: int, right: int):
+    ser.write(encoder.encode_pair(left, right))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=2000)
+    parser.add_argument("--interval", type=float, default=0.002, help="seconds between pairs")
+    parser.add_argument("--busy-threads", type=int, default=2)
+    args = parser.parse_args()
+
+    measure("two writes", two_writes, args.pairs, args.interval, args.busy_threads)
+    measure("single write", one_write, args.pairs, args.interval, args.busy_threads)
+    print("On the real 4800 baud link one frame is 8 bytes = 16.7 ms of wire time on top of any gap above.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Cost per step and accuracy of the pose estimator (self_driving/pose_estimator.py).
+
+Drives a simulated tank around a circle and feeds PoseEstimator.step the way the
+server does: NAV-PVT at the GNSS rate, compass at 20 Hz, ESC feedback at 50 Hz, a
+step every control tick. Partway through, RTK drops from Fixed to Float for a while
+(hAcc goes up and the position jumps by --float-offset).
+
+Reports the step cost (predict only, and with each kind of update), and position and
+heading error of the fused pose against what navigation used before: the last GNSS fix
+held until the next one, and the last compass reading.
+
+Usage: python3 bench_pose_estimator.py --duration 60 --rate 100 --gnss-rate 10
+"""
+import argparse
+import math
+import random
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from core import states
+from drivers.gps import REFLAT, REFLON
+from drivers.hover_protocol import HoverFeedback
+from self_driving.pose_estimator import PoseEKF, PoseEstimator
+
+METERS_PER_DEG = math.radians(1) * 6_378_137
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def angle_error(a: float, b: float) -> float:
+    return abs((a - b + 180) % 360 - 180)
+
+def microbench():
+    ekf = PoseEKF()
+    ekf.initialize(0, 0, 0.02, 0.5)
+    ekf.x[3] = 1.0
+    runs = 20000
+    for name, call in (
+        ("predict", lambda: ekf.predict(0.01)),
+        ("position update", lambda: ekf.update_position(0.01, 0.02, 0.02)),
+        ("velocity update", lambda: ekf.update_velocity(0.5, 0.8, 0.1)),
+        ("heading update", lambda: ekf.update_heading(0.5, 0.09)),
+        ("odometry update", lambda: ekf.update_odometry(1.0, 0.1, 0.2, 0.35)),
+    ):
+        per_call = timeit.timeit(call, number=runs) / runs
+        print(f"{name:<18} {per_call * 1e6:6.1f} us")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=60, help="simulated s")
+    parser.add_argument("--rate", type=float, default=100, help="control rate in Hz")
+    parser.add_argument("--gnss-rate", type=float, default=10)
+    parser.add_argument("--speed", type=float, default=1.0, help="m/s")
+    parser.add_argument("--radius", type=float, default=10.0, help="m")
+    parser.add_argument("--float-start", type=float, default=20, help="s, RTK Float from here")
+    parser.add_argument("--float-duration", type=float, default=10)
+    parser.add_argument("--float-offset", type=float, default=0.4, help="m, position jump in Float")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    gps = SimpleNamespace(last_pvt=None)
+    motors = SimpleNamespace(feedback={})
+    estimator = PoseEstimator(gps=gps, motors=motors, rate=args.rate)
+    yaw_rate = args.speed / args.radius  # rad/s, clockwise
+
+    costs: dict[str, list[float]] = {"predict only": [], "+ gnss": [], "+ compass": [], "+ wheels": []}
+    fused_errors, gnss_errors, fused_heading_errors, compass_errors = [], [], [], []
+    float_errors = []
+    t0 = 1_700_000_000.0
+    dt = 1 / args.rate
+    gnss_offset = (0.0, 0.0)
+    fix = compass = None
+    truth_east = truth_north = 0.0
+    for i in range(int(args.duration * args.rate)):
+        t = i * dt
+        now = t0 + t
+        psi = yaw_rate * t
+        # Circle through the origin, heading clockwise from north
+        truth_east = args.radius * (1 - math.cos(psi))
+        truth_north = args.radius * math.sin(psi)
+        in_float = args.float_start <= t < args.float_start + args.float_duration
+        new = "predict only"
+
+        if i % round(args.rate / args.gnss_rate) == 0:
+            h_acc = 0.4 if in_float else 0.014
+            if in_float and gnss_offset == (0.0, 0.0):
+                gnss_offset = (args.float_offset, 0.0)
+            elif not in_float:
+                gnss_offset = (0.0, 0.0)
+            east = truth_east + gnss_offset[0] + rng.gauss(0, h_acc / 2)
+            north = truth_north + gnss_offset[1] + rng.gauss(0, h_acc / 2)
+            fix = (east, north)
+            vel_east, vel_north = args.speed * math.sin(psi), args.speed * math.cos(psi)
+            gps.last_pvt = (now - 0.03, SimpleNamespace(  # 30 ms receiver latency
+                fixType=3, gnssFixOk=1, hAcc=h_acc * 1000, sAcc=50,
+                lat=REFLAT + north / METERS_PER_DEG, lon=REFLON + east / (METERS_PER_DEG * math.cos(math.radians(REFLAT))),
+                velN=(vel_north + rng.gauss(0, 0.03)) * 1000, velE=(vel_east + rng.gauss(0, 0.03)) * 1000,
+            ))
+            new = "+ gnss"
+        elif i % round(args.rate / 20) == 0:
+            compass = (math.degrees(psi) + rng.gauss(0, 5)) % 360
+            states.heading = compass
+            states.heading_time = now
+            new = "+ compass"
+        elif i % round(args.rate / 50) == 0:
+            # Left track outside the turn, both with slip noise, the left ESC reports negated speed
+            left = (args.speed + yaw_rate * estimator.track_width / 2) * (1 + rng.gauss(0, 0.05))
+            right = (args.speed - yaw_rate * estimator.track_width / 2) * (1 + rng.gauss(0, 0.05))
+            motors.feedback = {
+                0: HoverFeedback(now, 0, -left * 3.6, 36.0, 1.0, i),
+                1: HoverFeedback(now, 1, right * 3.6, 36.0, 1.0, i),
+            }
+            new = "+ wheels"
+
+        start = time.perf_counter()
+        pose = estimator.step(now)
+        costs[new].append(time.perf_counter() - start)
+        if pose and t > 2:  # after the filter settled
+            gnss_errors.append(math.hypot(fix[0] - truth_east, fix[1] - truth_north))
+            compass_errors.append(angle_error(compass, math.degrees(psi)))
+            east, north = estimator.to_local(pose.lat, pose.lon)
+            error = math.hypot(east - truth_east, north - truth_north)
+            fused_errors.append(error)
+            if in_float:
+                float_errors.append(error)
+            fused_heading_errors.append(angle_error(pose.heading, math.degrees(psi)))
+
+    budget = 1e6 / args.rate
+    print(f"step cost at {args.rate:.0f} Hz ({budget:.0f} us budget)")
+    for name, values in costs.items():
+        if values:
+            print(f"  {name:<14} p50 {statistics.median(values) * 1e6:6.1f} us | p99 {percentile(values, 0.99) * 1e6:6.1f} us | {len(values)} steps")
+    all_costs = [c for values in costs.values() for c in values]
+    print(f"  {'mean':<14} {statistics.mean(all_costs) * 1e6:6.1f} us ({statistics.mean(all_costs) * 1e6 / budget:.1%} of the budget)")
+    print()
+    print("filter calls")
+    microbench()
+    print()
+    print(f"position error  fused p50 {statistics.median(fused_errors) * 100:5.1f} cm | p99 {percentile(fused_errors, 0.99) * 100:5.1f} cm"
+          f" | last fix p50 {statistics.median(gnss_errors) * 100:5.1f} cm | p99 {percentile(gnss_errors, 0.99) * 100:5.1f} cm")
+    if float_errors:
+        print(f"  during Float  fused p50 {statistics.median(float_errors) * 100:5.1f} cm | max {max(float_errors) * 100:5.1f} cm (jump {args.float_offset * 100:.0f} cm)")
+    print(f"heading error   fused p50 {statistics.median(fused_heading_errors):5.2f} deg | p99 {percentile(fused_heading_errors, 0.99):5.2f} deg"
+          f" | last compass p50 {statistics.median(compass_errors):5.2f} deg | p99 {percentile(compass_errors, 0.99):5.2f} deg")
+
+if __name__ == "__main__":
+    main()
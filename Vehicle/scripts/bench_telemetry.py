@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Telemetry benchmark on a simulated clock: the old loop (full JSON blob every second)
+against the change driven TelemetryPublisher (api/telemetry_publisher.py), parked and
+while driving a course with turns.
+
+Reports bytes/s and messages/s on the websocket and how far the client's view is from
+the truth, sampled every 10 ms: heading error and position error, mean and p99.
+
+Usage: python3 bench_telemetry.py --duration 120
+"""
+import argparse
+import json
+import math
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from api.telemetry_publisher import EARTH_RADIUS, FIELD_RULES, TelemetryPublisher
+
+STEP = 0.01  # s, simulation and sampling step
+
+class Tank:
+    """Heading from the compass at 100 Hz, GNSS at 10 Hz, voltage and NTRIP status."""
+
+    def __init__(self, driving: bool, rng: random.Random):
+        self.driving = driving
+        self.rng = rng
+        self.t = 0.0
+        self.heading = 40.0
+        self.east = self.north = 0.0
+        self.turn_rate = 0.0
+        self.state = {}
+        self.truth = (self.heading, self.east, self.north)
+        self.next_fix = 0.0
+
+    def step(self):
+        self.t += STEP
+        if self.driving:
+            if self.rng.random() < STEP / 4:  # new turn every ~4 s
+                self.turn_rate = self.rng.choice((0, 0, 30, -30, 90, -90))
+            self.heading = (self.heading + self.turn_rate * STEP) % 360
+            self.east += 1.5 * math.sin(math.radians(self.heading)) * STEP
+            self.north += 1.5 * math.cos(math.radians(self.heading)) * STEP
+        self.truth = (self.heading, self.east, self.north)
+        self.state["heading"] = (self.heading + self.rng.gauss(0, 0.15)) % 360  # after HeadingFilter
+        self.state["voltage"] = 38.4 - self.t * 1e-3 + self.rng.gauss(0, 0.02)
+        if self.t >= self.next_fix:
+            self.next_fix += 0.1
+            self.fix_time = self.t
+            self.state["gps"] = {"lat": 42.36 + math.degrees((self.north + self.rng.gauss(0, 0.01)) / EARTH_RADIUS),
+                                 "lon": -71.06 + math.degrees((self.east + self.rng.gauss(0, 0.01)) / EARTH_RADIUS / math.cos(math.radians(42.36))),
+                                 "alt": 12.3}
+            self.state["ntrip_status"] = {"fix_type": 3, "rtk": "Fixed", "diff_soln": 1, "corr_age": 2, "h_acc": 14, "sats": 27,
+                                          "rtcm_age": round(self.rng.uniform(0, 1), 2), "rtcm_bytes": int(self.t * 600)}
+        self.state["position_age"] = self.t - self.fix_time
+        self.state["lights"] = {"requests": 3, "composed": 3, "transmitted": 3, "skipped": 0}
+
+    def read(self) -> dict:
+        return dict(self.state)
+
+def position(gps: dict) -> tuple[float, float]:
+    north = math.radians(gps["lat"] - 42.36) * EARTH_RADIUS
+    east = math.radians(gps["lon"] + 71.06) * EARTH_RADIUS * math.cos(math.radians(42.36))
+    return east, north
+
+def run(driving: bool, publisher: bool, duration: float, seed: int) -> dict:
+    tank = Tank(driving, random.Random(seed))
+    tank.step()
+    client = {}
+    sent_bytes = messages = 0
+    heading_errors, position_errors = [], []
+    source = TelemetryPublisher(tank.read) if publisher else None
+    next_send = 0.0
+    while tank.t < duration:
+        tank.step()
+        if tank.t >= next_send:
+            if source:
+                next_send += source.tick
+                update = source.poll(tank.t)
+                if update:
+                    keyframe, fields, _ = update
+                    message = json.dumps({"type": "telemetry" if keyframe else "telemetry_delta", "data": fields})
+                    client.update(fields)
+                    sent_bytes += len(message)
+                    messages += 1
+            else:
+                next_send += 1.0
+                message = json.dumps({"type": "telemetry", "data": tank.read()})
+                client = tank.read()
+                sent_bytes += len(message)
+                messages += 1
+        heading, east, north = tank.truth
+        heading_errors.append(abs((client["heading"] - heading + 180) % 360 - 180))
+        client_east, client_north = position(client["gps"])
+        position_errors.append(math.hypot(client_east - east, client_north - north))
+    heading_errors.sort()
+    position_errors.sort()
+    return {
+        "bytes": sent_bytes / duration,
+        "messages": messages / duration,
+        "heading mean": sum(heading_errors) / len(heading_errors),
+        "heading p99": heading_errors[int(len(heading_errors) * 0.99)],
+        "position mean": sum(position_errors) / len(position_errors),
+        "position p99": position_errors[int(len(position_errors) * 0.99)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=120, help="simulated s per run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rates = ", ".join(f"{name} {rule.max_rate:g} Hz" for name, rule in FIELD_RULES.items())
+    print(f"publisher rates: {rates}")
+    print(f"{'':<24} | bytes/s | msgs/s | heading error mean / p99 | position error mean / p99")
+    for driving in (False, True):
+        for publisher in (False, True):
+            r = run(driving, publisher, args.duration, args.seed)
+            name = f"{'driving' if driving else 'parked'}, {'publisher' if publisher else 'old 1 s loop'}"
+            print(f"{name:<24} | {r['bytes']:7.0f} | {r['messages']:6.1f} | {r['heading mean']:8.2f} / {r['heading p99']:6.2f} deg | "
+                  f"{r['position mean']:9.2f} / {r['position p99']:5.2f} m")
+
+if __name__ == "__main__":
+    main()
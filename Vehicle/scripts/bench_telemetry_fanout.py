@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Telemetry fan-out load test: 50 simulated websocket clients on one event loop, with
+the old per-connection send_telemetry loop (every client polls, serializes and sends
+on its own) against the shared TelemetryHub (api/telemetry_hub.py).
+
+Clients: the driver (a good link, it's the one we care about), viewers on a good link
+and a few slow tabs on a bad link. Links are modelled like a websocket transport: sends
+go into a write buffer that drains at the link's rate and block above the high water
+mark. The state changes like it does while driving (compass at 100 Hz, GNSS at 10 Hz)
+and carries the time it was read, so the driver can see how old what it gets is.
+
+Reports event loop CPU, messages serialized/s, the driver's telemetry age and event
+loop lag (a motor command waits that long) and what the slow tabs buffer and skip.
+
+Usage: python3 bench_telemetry_fanout.py --clients 50 --slow 10 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from api.protocol import encode_telemetry
+from api.telemetry_hub import TelemetryHub, encode_json
+from api.telemetry_publisher import FIELD_RULES, FieldRule, TelemetryPublisher
+from core.types import Location
+
+RULES = FIELD_RULES | {"read_at": FieldRule(20)}  # so every message says when it was read
+HIGH_WATER = 32 * 1024  # B, the write buffer a websocket send blocks above
+
+
+class Tank:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.location = Location(lat=42.36, lon=-71.06, alt=12.3)
+        self.heading = 40.0
+        self.voltage = 38.4
+        self.ntrip_status = {"fix_type": 3, "rtk": "Fixed", "diff_soln": 1, "corr_age": 2, "h_acc": 14, "sats": 27,
+                             "rtcm_age": 0.4, "rtcm_bytes": 0}
+        self.fix_time = time.time()
+
+    async def drive(self):
+        step = 0
+        while True:
+            await asyncio.sleep(0.01)
+            step += 1
+            self.heading = (self.heading + 0.6 + self.rng.gauss(0, 0.15)) % 360
+            self.voltage = 38.4 + self.rng.gauss(0, 0.02)
+            if step % 10 == 0:
+                self.fix_time = time.time()
+                self.location = Location(lat=self.location.lat + 1e-6 * math.cos(math.radians(self.heading)),
+                                         lon=self.location.lon + 1e-6 * math.sin(math.radians(self.heading)), alt=12.3)
+                self.ntrip_status = dict(self.ntrip_status, rtcm_age=round(self.rng.uniform(0, 1), 2),
+                                         rtcm_bytes=self.ntrip_status["rtcm_bytes"] + 60)
+
+    def read(self) -> dict:
+        """Like read_telemetry in api/telemetry.py."""
+        now = time.time()
+        return {
+            "gps": self.location.model_dump(),
+            "ntrip_status": self.ntrip_status,
+            "position_age": now - self.fix_time,
+            "heading": self.heading,
+            "voltage": self.voltage,
+            "lights": {"requests": 3, "composed": 3, "transmitted": 3, "skipped": 0},
+            "read_at": now,
+        }
+
+
+class Link:
+    """Fake WebSocket: send_text/send_bytes into a write buffer drained at rate B/s (None for a fast LAN)."""
+
+    def __init__(self, rate: float | None, driver: bool = False):
+        self.rate = rate
+        self.driver = driver
+        self.buffered = 0.0
+        self.max_buffered = 0.0
+        self.last = time.perf_counter()
+        self.messages = 0
+        self.ages: list[float] = []
+
+    def _drain(self):
+        now = time.perf_counter()
+        self.buffered = max(0.0, self.buffered - (now - self.last) * self.rate)
+        self.last = now
+
+    async def send_text(self, text: str):
+        if self.driver:
+            message = json.loads(text)
+            if "read_at" in message["data"]:
+                self.ages.append(time.time() - message["data"]["read_at"])
+        await self._send(len(text.encode()))
+
+    async def send_bytes(self, data: bytes):
+        await self._send(len(data))
+
+    async def _send(self, size: int):
+        self.messages += 1
+        if self.rate is None:
+            await asyncio.sleep(0)  # a real send yields to the loop at least once
+            return
+        self._drain()
+        while self.buffered + size > HIGH_WATER:
+            await asyncio.sleep((self.buffered + size - HIGH_WATER) / self.rate)
+            self._drain()
+        self.buffered += size
+        self.max_buffered = max(self.max_buffered, self.buffered)
+
+
+async def per_connection(ws: Link, read, counter: list, binary: bool = False):
+    """The send_telemetry loop before the hub, one of these per websocket."""
+    publisher = TelemetryPublisher(read, RULES)
+    sequence = 0
+    while True:
+        update = publisher.poll(time.time())
+        if update:
+            keyframe, fields, snapshot = update
+            counter[0] += 1
+            if binary:
+                await ws.send_bytes(encode_telemetry(sequence, snapshot))
+                sequence += 1
+            else:
+                await ws.send_text(encode_json(keyframe, fields))
+        await asyncio.sleep(publisher.tick)
+
+
+async def hub_connection(ws: Link, hub: TelemetryHub, binary: bool = False):
+    """The send_telemetry loop with the hub."""
+    subscriber = hub.subscribe(binary)
+    send = ws.send_bytes if binary else ws.send_text
+    try:
+        while True:
+            await send(await subscriber.get())
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+async def lag_probe(lags: list):
+    """How late a 10 ms sleep wakes up, what any other handler (a motor command) waits too."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - start - 0.01)
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else math.nan
+
+
+async def run(hub_mode: bool, args) -> dict:
+    tank = Tank(random.Random(args.seed))
+    links = [Link(None, driver=True)]
+    links += [Link(None) for _ in range(args.clients - 1 - args.slow)]
+    links += [Link(args.slow_rate) for _ in range(args.slow)]
+    binary = [i % 2 == 1 and i < args.clients - args.slow for i in range(args.clients)]  # half the fast viewers binary
+
+    counter = [0]
+    hub = TelemetryHub(TelemetryPublisher(tank.read, RULES), encode_telemetry) if hub_mode else None
+    lags = []
+    tasks = [asyncio.create_task(tank.drive()), asyncio.create_task(lag_probe(lags))]
+    for link, is_binary in zip(links, binary):
+        if hub:
+            tasks.append(asyncio.create_task(hub_connection(link, hub, is_binary)))
+        else:
+            tasks.append(asyncio.create_task(per_connection(link, tank.read, counter, is_binary)))
+            await asyncio.sleep(0.05 / args.clients)  # connections don't all arrive in the same tick
+
+    cpu = time.process_time()
+    await asyncio.sleep(args.duration)
+    cpu = time.process_time() - cpu
+    stats = hub.stats() if hub else {}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    driver, slow = links[0], links[-args.slow:] if args.slow else []
+    return {
+        "cpu": cpu / args.duration,
+        "serialized": (stats.get("serialized", 0) if hub else counter[0]) / args.duration,
+        "sent": sum(link.messages for link in links) / args.duration,
+        "age p50": percentile(driver.ages, 0.5),
+        "age p99": percentile(driver.ages, 0.99),
+        "lag p99": percentile(lags, 0.99),
+        "slow buffered": max((link.max_buffered for link in slow), default=0),
+        "dropped": stats.get("dropped", 0),
+        "resyncs": stats.get("resyncs", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50, help="including the driver")
+    parser.add_argument("--slow", type=int, default=10, help="clients on a bad link")
+    parser.add_argument("--slow-rate", type=float, default=500, help="B/s a bad link drains")
+    parser.add_argument("--duration", type=float, default=10, help="s per run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients ({args.slow} on a {args.slow_rate:.0f} B/s link), {args.duration:g} s per run")
+    print(f"{'':<15} | loop CPU | serialized/s | sent/s | driver age p50 / p99 | loop lag p99 | slow tab buffer | dropped | resyncs")
+    for hub_mode in (False, True):
+        r = asyncio.run(run(hub_mode, args))
+        name = "hub" if hub_mode else "per connection"
+        print(f"{name:<15} | {r['cpu']:7.0%} | {r['serialized']:12.0f} | {r['sent']:6.0f} | "
+              f"{r['age p50'] * 1e3:7.1f} / {r['age p99'] * 1e3:6.1f} ms | {r['lag p99'] * 1e3:9.1f} ms | "
+              f"{r['slow buffered'] / 1024:12.1f} kB | {r['dropped']:7d} | {r['resyncs']:7d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Websocket protocol benchmark: bytes per message and server side cost per motor command
+for the JSON messages the web UI sends today against the binary subprotocol
+(api/protocol.py).
+
+Sizes are the websocket payload plus the websocket frame header (client frames are
+masked, 4 more bytes), the part that changes between the two; TLS and TCP/IP
+overhead come on top of both. The JSON motor path does what api/ws.py does per
+command: json.loads, the type split, MotorCommand(**data) and the debug f-string
+(logged to a file handler, like tank.log). The binary path does decode and
+MotorCommand(left=, right=).
+
+Usage: python3 bench_ws_protocol.py --commands 50000
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from api.protocol import KIND_MOTOR, decode, encode_lights, encode_motor, encode_telemetry
+from core.types import MotorCommand
+
+def ws_frame(payload: int, masked: bool) -> int:
+    header = 2 if payload < 126 else 4 if payload < 65536 else 10
+    return payload + header + (4 if masked else 0)
+
+def json_motor(rng: random.Random) -> str:
+    """What WebSocketHandler.send('motor', ...) produces: gamepad axes times 1000 in JS."""
+    return json.dumps({"id": str(uuid.uuid4()), "type": "motor",
+                       "data": {"left": rng.uniform(-1, 1) * 1000, "right": rng.uniform(-1, 1) * 1000}}, separators=(",", ":"))
+
+def telemetry(rng: random.Random) -> dict:
+    """The telemetry "data" api/telemetry.py sends with an RTK fix and an NTRIP session."""
+    return {
+        "gps": {"lat": 42.36 + rng.random() * 1e-3, "lon": -71.06 + rng.random() * 1e-3, "alt": 12.3},
+        "ntrip_status": {
+            "fix_type": 3, "rtk": "Fixed", "diff_soln": 1, "corr_age": 2, "h_acc": 14, "sats": 27,
+            "rtcm_queue_ms_p50": 0.4, "rtcm_queue_ms_max": 3.1, "rtcm_age": 0.6, "rtcm_bytes": 1834221,
+            "nav_rate": 10, "nav_rate_achieved": 9.98, "pvt_latency_ms_p50": 21.3, "pvt_latency_ms_max": 48.9, "pvt_missed": 0,
+            "caster": "rtk2go.com:2101/BOSTON", "ntrip_state": "streaming", "ntrip_sessions": 1, "ntrip_uptime": 812.4,
+            "ntrip_rate": 612.0, "ntrip_error": None,
+        },
+        "position_age": 0.08,
+        "heading": rng.uniform(0, 360),
+        "voltage": 38.4,
+        "lights": {"requests": 12, "composed": 9, "transmitted": 9, "skipped": 3},
+    }
+
+def json_handler(logger: logging.Logger, motors: list):
+    def handle(text: str):
+        msg = json.loads(text)
+        msg_type = msg.get("type")
+        logger.debug(f"{msg_type.upper()}: {msg['data']}")
+        if len(msg_type.split(":")) > 1:
+            return
+        msg_type = msg_type.split(":")[0]
+        if msg_type == "motor":
+            motors.append(MotorCommand(**msg["data"]))
+    return handle
+
+def binary_handler(motors: list):
+    def handle(data: bytes):
+        frame = decode(data)
+        if frame.kind == KIND_MOTOR:
+            left, right = frame.data
+            motors.append(MotorCommand(left=left, right=right))
+    return handle
+
+def per_message(handle, messages: list) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        handle(message)
+    return (time.perf_counter() - start) / len(messages)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commands", type=int, default=50000)
+    parser.add_argument("--rate", type=float, default=50, help="motor commands/s the UI sends, for the bandwidth column")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    logger = logging.getLogger("bench_websocket")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(logging.FileHandler(os.devnull))
+
+    json_motors = [json_motor(rng) for _ in range(args.commands)]
+    binary_motors = [encode_motor(i, *(v * 1000 for v in (rng.uniform(-1, 1), rng.uniform(-1, 1)))) for i in range(args.commands)]
+    sizes = {
+        "motor": (len(json_motors[0].encode()), len(binary_motors[0]), True),
+        "lights": (len(json.dumps({"id": str(uuid.uuid4()), "type": "lights", "data": 100}, separators=(",", ":"))),
+                   len(encode_lights(0, 100)), True),
+        "telemetry": (len(json.dumps({"type": "telemetry", "data": telemetry(rng)}, separators=(",", ":"))),
+                      len(encode_telemetry(0, telemetry(rng))), False),
+    }
+
+    print(f"{'':<10} | JSON payload | on the wire | binary payload | on the wire | saved")
+    for name, (text, binary, masked) in sizes.items():
+        wire_text, wire_binary = ws_frame(text, masked), ws_frame(binary, masked)
+        print(f"{name:<10} | {text:10d} B | {wire_text:9d} B | {binary:12d} B | {wire_binary:9d} B | {1 - wire_binary / wire_text:5.0%}")
+    motor_text, motor_binary = (ws_frame(size, True) for size in sizes["motor"][:2])
+    print(f"motor commands at {args.rate:.0f}/s: {motor_text * args.rate / 1000:.1f} kB/s JSON, {motor_binary * args.rate / 1000:.2f} kB/s binary")
+    print()
+
+    results = []
+    for name, handle, messages in (
+        ("JSON", json_handler(logger, []), json_motors),
+        ("binary", binary_handler([]), binary_motors),
+    ):
+        per_message(handle, messages[:1000])  # warm up
+        results.append((name, min(per_message(handle, messages) for _ in range(3))))
+    print(f"{'':<10} | per motor command | commands/s")
+    for name, seconds in results:
+        print(f"{name:<10} | {seconds * 1e6:14.2f} us | {1 / seconds:10.0f}")
+    print(f"binary parses {results[0][1] / results[1][1]:.1f}x faster")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Compass calibration mode: spins the tank in place (or asks you to turn it by hand)
+while collecting QMC5883P samples, fits hard and soft iron, and writes the
+calibration file the server loads at startup (Vehicle/config/compass_calibration.json).
+
+Turning by hand and tilting it around as well gets the full 3D ellipsoid fit, spinning
+in place gets the x/y ellipse.
+
+Usage: python3 calibrate_compass.py --duration 30 --speed 200
+       python3 calibrate_compass.py --by-hand --duration 60
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.compass import Compass
+from drivers.compass_calibration import CALIBRATION_FILE, save_calibration
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=30, help="s, at least two full turns")
+    parser.add_argument("--speed", type=int, default=200, help="track speed for spinning in place, -1000 to 1000")
+    parser.add_argument("--by-hand", action="store_true", help="don't drive, turn the tank (or the compass) by hand")
+    parser.add_argument("--heading-offset", type=float, default=None, help="deg, declination + mounting, keeps the current one by default")
+    parser.add_argument("--output", default=str(CALIBRATION_FILE))
+    parser.add_argument("--dry-run", action="store_true", help="fit and print, don't write the file")
+    args = parser.parse_args()
+
+    compass = Compass()
+    motors = None
+    if not args.by_hand:
+        from drivers.motor import Motor
+        motors = Motor()
+
+    print(f"Current calibration: {compass.calibration.method}, residual {compass.calibration.residual}")
+    print("Spinning in place..." if motors else "Turn the tank slowly through every heading...")
+    try:
+        calibration = compass.calibrate(args.duration, motors=motors, speed=args.speed)
+    finally:
+        if motors:
+            motors.cleanup()
+    if args.heading_offset is not None:
+        calibration = calibration._replace(heading_offset=args.heading_offset)
+
+    print(f"{calibration.method} fit from {calibration.samples} samples, residual {calibration.residual:.4f}")
+    print(f"hard iron  {', '.join(f'{v:+.4f}' for v in calibration.offset)} G")
+    for row in calibration.matrix:
+        print(f"soft iron  {'  '.join(f'{v:+.4f}' for v in row)}")
+    if not args.dry_run:
+        save_calibration(calibration, args.output)
+        print(f"Saved to {args.output}, restart the server to use it")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Checks the compass calibration fits (drivers/compass_calibration.py) on the QMC5883P
+stand-in (sim/compass.py) with known hard and soft iron distortion:
+
+- spinning in place -> x/y ellipse fit
+- turned and tilted by hand -> 3D ellipsoid fit
+- normal driving -> OnlineCalibrator, starting from the old hand tuned values
+
+Reports heading error with the old hand tuned calibration and with each fit, after
+removing the constant offset that heading_offset (declination + mounting) takes care
+of, the fit time, and that the file round trips. Fails (exit code 1) if any fit
+leaves more than --max-error degrees.
+
+Usage: python3 check_compass_calibration.py --noise 0.005
+"""
+import argparse
+import math
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.compass_calibration import (
+    DEFAULT_CALIBRATION, Calibration, OnlineCalibrator, fit_calibration, load_calibration, save_calibration,
+)
+from sim.compass import QMC5883PSimulator
+
+def heading_errors(calibration: Calibration, sensor: QMC5883PSimulator) -> list[float]:
+    """Level headings all the way around, after taking out the mean offset."""
+    calibration = calibration._replace(heading_offset=0.0)
+    raw = [calibration.heading(*sensor.field_at(h)) - h for h in range(0, 360, 2)]
+    offset = math.degrees(math.atan2(sum(math.sin(math.radians(e)) for e in raw), sum(math.cos(math.radians(e)) for e in raw)))
+    return [abs((e - offset + 180) % 360 - 180) for e in raw]
+
+def noisy(sensor: QMC5883PSimulator, rng: random.Random, noise: float, heading: float, pitch: float = 0.0, roll: float = 0.0):
+    return tuple(v + rng.gauss(0, noise) for v in sensor.field_at(heading, pitch, roll))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--noise", type=float, default=0.005, help="gauss per axis")
+    parser.add_argument("--max-error", type=float, default=2.0, help="deg, max heading error allowed after a fit")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    sensor = QMC5883PSimulator(hard_iron=(-0.21, 0.04, 0.12), soft_iron=((1.15, 0.12, 0.03), (0.12, 0.82, -0.05), (0.03, -0.05, 1.0)))
+    results: dict[str, Calibration] = {"old hand tuned": DEFAULT_CALIBRATION}
+
+    spin = np.array([noisy(sensor, rng, args.noise, h) for h in np.linspace(0, 720, 1000)])
+    start = time.perf_counter()
+    results["spin in place"] = fit_calibration(spin)
+    spin_time = time.perf_counter() - start
+
+    by_hand = np.array([noisy(sensor, rng, args.noise, rng.uniform(0, 360), rng.uniform(-60, 60), rng.uniform(-60, 60)) for _ in range(1000)])
+    start = time.perf_counter()
+    results["turned and tilted"] = fit_calibration(by_hand)
+    hand_time = time.perf_counter() - start
+
+    updates = []
+    online = OnlineCalibrator(DEFAULT_CALIBRATION, updates.append, min_interval=0.0)
+    heading = 0.0
+    for _ in range(20000):  # about 3 minutes of driving loops at 100 Hz, slowly and unevenly turning
+        heading += rng.gauss(0.05, 0.8)
+        online.add(*noisy(sensor, rng, args.noise, heading, rng.gauss(0, 3), rng.gauss(0, 3)))
+    time.sleep(0.5)  # last fit thread
+    if updates:
+        results["online, driving"] = updates[-1]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "compass_calibration.json"
+        save_calibration(results["spin in place"], path)
+        round_trip = load_calibration(path) == results["spin in place"]
+
+    failures = []
+    print(f"{'':<18} | method    | residual | heading error p50 | max")
+    for name, calibration in results.items():
+        errors = heading_errors(calibration, sensor)
+        residual = f"{calibration.residual:.4f}" if calibration.residual is not None else "     -"
+        print(f"{name:<18} | {calibration.method:<9} | {residual:>8} | {statistics.median(errors):13.2f} deg | {max(errors):6.2f} deg")
+        if name != "old hand tuned" and max(errors) > args.max_error:
+            failures.append(f"{name} above --max-error")
+    print()
+    print(f"fit time           ellipse {spin_time * 1000:.2f} ms | ellipsoid {hand_time * 1000:.2f} ms (1000 samples)")
+    print(f"online refiner     {online.fits} fits, {online.updates} accepted")
+    print(f"file round trip    {'ok' if round_trip else 'FAILED'}")
+
+    if results["spin in place"].method != "ellipse" or results["turned and tilted"].method != "ellipsoid":
+        failures.append("wrong fit chosen for the samples")
+    if not updates:
+        failures.append("online refiner never updated")
+    if not round_trip:
+        failures.append("calibration file doesn't round trip")
+    print("FAIL: " + ", ".join(failures) if failures else "PASS")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Checks the motor interference fit end to end on a synthetic --compass-record log: the
+QMC5883P stand-in (sim/compass.py) on a stand at a slowly drifting heading, tracks
+driven through the fitting protocol with ESC currents lagging the commands, and a
+known field offset per unit of command and current added to every sample.
+
+Runs the same steps as fit_compass_interference.py and reports the recovered
+coefficients and the held out heading error before and after compensation. Fails
+(exit code 1) if compensation doesn't bring the held out RMS error under --max-error
+degrees, or if the file doesn't round trip.
+
+Usage: python3 check_compass_interference.py --noise 0.002
+"""
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.compass_calibration import (
+    MOTOR_FEATURES, RECORD_COLUMNS, Calibration, fit_interference, load_interference, save_interference,
+)
+from sim.compass import QMC5883PSimulator
+from fit_compass_interference import compensated, heading_errors, load_log, quiet_baseline, summary
+
+# gauss per unit of MOTOR_FEATURES (command -1000..1000, current in A), columns x, y, z
+COUPLING = np.array((
+    (4e-6, -2e-6, 0.009, 0.004),
+    (-3e-6, 1e-6, -0.006, 0.007),
+    (0.0, 0.0, 0.003, 0.003),
+))
+
+def protocol(rng: random.Random, repeats: int) -> list[tuple[float, float, float]]:
+    """(left, right, seconds) steps: one side, the other, both and spinning, 2 s stopped in between."""
+    steps = []
+    for _ in range(repeats):
+        for left, right in ((1, 0), (0, 1), (1, 1), (1, -1), (-1, 0), (0, -1), (-1, -1)):
+            throttle = rng.choice((150, 300, 500, 800, 1000))
+            steps.append((left * throttle, right * throttle, rng.uniform(2, 4)))
+            steps.append((0, 0, 2))
+    return steps
+
+def record(path: Path, args, rng: random.Random):
+    sensor = QMC5883PSimulator(field=0.2)  # horizontal component, about what Boston has
+    rate = 100
+    current = [0.0, 0.0]
+    t = 0.0
+    heading = 40.0
+    with open(path, "w") as log:
+        log.write(",".join(RECORD_COLUMNS) + "\n")
+        for left, right, duration in protocol(rng, args.repeats):
+            for _ in range(int(duration * rate)):
+                t += 1 / rate
+                heading += rng.gauss(0, 0.01)  # stand creeping, temperature drift
+                for side, command in enumerate((left, right)):
+                    target = 8.0 * command / 1000 * (1 + 0.2 * abs(command) / 1000)  # A, a bit more than linear
+                    current[side] += (target - current[side]) / (args.current_lag * rate)
+                features = np.array((left, right, current[0], current[1]))
+                field = np.array(sensor.field_at(heading)) + COUPLING @ features
+                x, y, z = (v + rng.gauss(0, args.noise) for v in field)
+                log.write(f"{t:.4f},{x:.5f},{y:.5f},{z:.5f},{','.join(str(f) for f in features)}\n")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--noise", type=float, default=0.002, help="gauss per axis")
+    parser.add_argument("--current-lag", type=float, default=0.3, help="s, ESC current time constant")
+    parser.add_argument("--repeats", type=int, default=6, help="times through the protocol")
+    parser.add_argument("--max-error", type=float, default=1.0, help="deg, held out RMS heading error allowed after compensation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    calibration = Calibration(offset=(0.0, 0.0, 0.0), matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1)), heading_offset=0.0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "compass.csv"
+        record(path, args, rng)
+        time, raw, features = load_log(path)
+        baseline = quiet_baseline(time, raw, features)
+        train = time < time[0] + (time[-1] - time[0]) * 0.7
+
+        model = fit_interference(raw[train], features[train], baseline[train])
+        before = heading_errors(calibration, raw[~train], baseline[~train])
+        after = heading_errors(calibration, compensated(model, raw[~train], features[~train]), baseline[~train])
+        model = model._replace(heading_error_before=float(np.sqrt(np.mean(before ** 2))),
+                               heading_error_after=float(np.sqrt(np.mean(after ** 2))))
+
+        save_interference(model, Path(directory) / "compass_interference.json")
+        round_trip = load_interference(Path(directory) / "compass_interference.json") == model
+
+    sample = 123
+    python_offset = model.offset(features[sample])  # what Compass.compensate does per sample
+    numpy_offset = raw[sample] - compensated(model, raw[sample:sample + 1], features[sample:sample + 1])[0]
+    consistent = np.allclose(python_offset, numpy_offset)
+
+    print(f"{len(time)} samples ({time[-1] - time[0]:.0f} s), {train.sum()} fitted, {(~train).sum()} held out")
+    print(f"{'gauss per':<14} | {'x true':>9} | {'x fit':>9} | {'y true':>9} | {'y fit':>9} | {'z true':>9} | {'z fit':>9}")
+    for name, truth, fit in zip(MOTOR_FEATURES, COUPLING.T, np.asarray(model.coefficients).T):
+        print(f"{name:<14} | " + " | ".join(f"{t:+9.2e} | {f:+9.2e}" for t, f in zip(truth, fit)))
+    print()
+    print(f"held out   uncompensated  {summary(before)}")
+    print(f"           compensated    {summary(after)}")
+    print(f"file round trip    {'ok' if round_trip else 'FAILED'}")
+    print(f"Compass.compensate {'matches' if consistent else 'does NOT match'} the fit")
+
+    failures = []
+    if model.heading_error_after > args.max_error:
+        failures.append("compensated error above --max-error")
+    if model.heading_error_after >= model.heading_error_before:
+        failures.append("compensation doesn't help")
+    if not round_trip:
+        failures.append("interference file doesn't round trip")
+    if not consistent:
+        failures.append("InterferenceModel.offset disagrees with the fit")
+    print("FAIL: " + ", ".join(failures) if failures else "PASS")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
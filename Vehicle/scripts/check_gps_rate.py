@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Checks that the GPS driver keeps up with the receiver at a high navigation rate.
+Runs GPS.read_gnss_loop (no NTRIP) against the pty ZED-F9P stand-in (sim/gnss.py),
+with busy threads standing in for the motor/compass/server load.
+
+Fails (exit code 1) if the configured CFG-RATE wasn't sent, the achieved rate is
+more than 5% below the navigation rate, any epoch was missed, or the driver takes
+longer than --max-delay to get a NAV-PVT into states (so positions are never more
+than one epoch + receiver latency + max-delay old).
+
+Usage: python3 check_gps_rate.py --rate 20 --duration 10
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+from pyubx2 import SET, UBXReader # type: ignore
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from core import states
+from drivers.gps import GPS, NAV_RATES
+from sim.gnss import GNSSSimulator
+
+def busy_thread(stop: threading.Event):
+    x = 0
+    while not stop.is_set():
+        x = (x * 31 + 7) % 1_000_003
+
+def configured_rate(host_bytes: bytes) -> int | None:
+    """Measurement period from the CFG-VALSET the driver wrote, as Hz."""
+    for i in range(len(host_bytes) - 1):
+        if host_bytes[i:i + 2] == b"\xb5\x62":
+            length = int.from_bytes(host_bytes[i + 4:i + 6], "little")
+            msg = UBXReader.parse(host_bytes[i:i + 8 + length], msgmode=SET)
+            if hasattr(msg, "CFG_RATE_MEAS"):
+                return round(1000 / msg.CFG_RATE_MEAS)
+    return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=int, choices=NAV_RATES, default=20)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated receiver solution time in s")
+    parser.add_argument("--max-delay", type=float, default=0.025, help="allowed NAV-PVT written -> states time in s, a few GIL switch intervals")
+    parser.add_argument("--busy-threads", type=int, default=1)
+    parser.add_argument("--pyubx2", action="store_true", help="use the full pyubx2 reader instead of drivers/ubx.py")
+    args = parser.parse_args()
+
+    with GNSSSimulator(rate=args.rate, latency=args.latency, process=True) as rx:
+        gps = GPS(port=rx.port, nav_rate=args.rate, fast_decoder=not args.pyubx2)
+        reader = threading.Thread(target=gps.read_gnss_loop, daemon=True)
+        reader.start()
+
+        stop = threading.Event()
+        for _ in range(args.busy_threads):
+            threading.Thread(target=busy_thread, args=(stop,), daemon=True).start()
+
+        # Sample position age the way telemetry and navigation see it
+        ages = []
+        rates = []
+        end = time.time() + args.duration
+        while time.time() < end:
+            time.sleep(0.013)
+            if states.gps_fix_time:
+                ages.append(time.time() - states.gps_fix_time)
+            rate = gps.nav_stats()["nav_rate_achieved"]
+            if rate:
+                rates.append(rate)
+        stop.set()
+        gps.stop()  # before the simulator closes its pty under the reader
+        reader.join(timeout=2)
+        gps.cleanup()
+    sent = rx.epochs_sent
+    host_bytes = bytes(rx.received)
+
+    stats = gps.nav_stats()
+    ages.sort()
+    period = 1 / args.rate
+    print(f"configured rate     {configured_rate(host_bytes)} Hz")
+    print(f"epochs sent         {sent}")
+    print(f"achieved rate       min {min(rates):.2f} Hz | last {stats['nav_rate_achieved']:.2f} Hz")
+    print(f"epoch -> states     p50 {stats['pvt_latency_ms_p50']:.2f} ms | max {stats['pvt_latency_ms_max']:.2f} ms")
+    print(f"position age        p50 {ages[len(ages) // 2] * 1000:.1f} ms | max {ages[-1] * 1000:.1f} ms")
+    print(f"missed epochs       {stats['pvt_missed']}")
+
+    failures = []
+    if configured_rate(host_bytes) != args.rate:
+        failures.append("CFG-RATE not configured")
+    if min(rates[len(rates) // 4:]) < args.rate * 0.95:  # ignore the first samples while the window fills
+        failures.append("achieved rate below 95% of the navigation rate")
+    if stats["pvt_missed"]:
+        failures.append("missed epochs")
+    if stats["pvt_latency_ms_max"] / 1000 > args.latency + args.max_delay:
+        failures.append("NAV-PVT took longer than --max-delay to parse")
+    if ages[-1] > period + args.latency + args.max_delay:
+        failures.append("position older than one epoch")
+    print("FAIL: " + ", ".join(failures) if failures else "PASS")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
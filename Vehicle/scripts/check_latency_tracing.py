@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Checks the control latency tracing (core/latency.py) end to end: the real /ws
+endpoint (api/ws.py, through Starlette's TestClient) and the real Motor on the pty
+ESC stand-in (sim/esc.py), driven by a client whose clock is --skew s off.
+
+The client syncs its clock over two_way_message:ping like WebSocketHandler.syncClock,
+then sends binary motor commands stamped with its own clock. Fails (exit code 1) if
+the server's clock offset is off by more than half the round trip, if the "network"
+segment isn't small and positive (the skew wasn't taken out), if the "io" histogram
+doesn't agree with Motor.latency_stats() (measured separately, with perf_counter),
+or if the histograms don't come back over the websocket and GET /latency.
+
+Usage: python3 check_latency_tracing.py --skew 3.2 --duration 3
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from api import ws as ws_api
+from api.protocol import SUBPROTOCOL_BINARY, encode_motor
+from core import services
+from drivers.motor import Motor
+from sim.esc import ESCSimulator
+
+
+def two_way(ws, kind: str, data, reply: str) -> dict:
+    ws.send_json({"id": kind, "type": f"two_way_message:{kind}", "data": data})
+    while True:
+        message = ws.receive()
+        if message.get("text") and f'"two_way_message:{reply}"' in message["text"]:
+            return json.loads(message["text"])["data"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skew", type=float, default=3.2, help="s the client's clock is behind the server's")
+    parser.add_argument("--duration", type=float, default=3.0, help="s of motor commands")
+    parser.add_argument("--command-rate", type=float, default=50, help="motor commands/s")
+    parser.add_argument("--baud", type=int, default=115200)
+    args = parser.parse_args()
+
+    def client_time() -> float:
+        return time.time() - args.skew
+
+    failures = []
+    with ESCSimulator() as esc:
+        motors = Motor(port=esc.port, baudrate=args.baud, event_driven=True)
+        services.motors = motors
+        services.gps = SimpleNamespace()  # telemetry only checks there is one
+        services.webrtc = services.lights = None
+
+        app = FastAPI()
+        app.include_router(ws_api.router)
+        # api/ws.py re-raises the disconnect when the test client closes, uvicorn would swallow it
+        with contextlib.suppress(WebSocketDisconnect), TestClient(app) as client, \
+                client.websocket_connect("/ws", subprotocols=[SUBPROTOCOL_BINARY]) as ws:
+            offset = rtt = None
+            for _ in range(5):
+                sent = client_time()
+                reply = two_way(ws, "ping", {"sent": sent, "offset": offset, "rtt": rtt}, "pong")
+                received = client_time()
+                rtt = received - sent - (reply["server_sent"] - reply["server_received"])
+                offset = (reply["server_received"] - sent + (reply["server_sent"] - received)) / 2
+            two_way(ws, "ping", {"sent": client_time(), "offset": offset, "rtt": rtt}, "pong")  # report the last one
+
+            start = time.perf_counter()
+            sequence = 0
+            while time.perf_counter() - start < args.duration:
+                sequence += 1
+                ws.send_bytes(encode_motor(sequence, sequence % 1000, -(sequence % 1000), timestamp=client_time()))
+                time.sleep(1 / args.command_rate)
+            time.sleep(0.2)
+
+            over_ws = two_way(ws, "latency", {"buckets": True}, "latency_response")
+            over_http = client.get("/latency").json()
+        motors_p99 = motors.latency_stats().get("p99", float("nan"))
+        motors.cleanup()
+
+    clock = over_ws["clock"]
+    segments = over_http["segments"]
+    print(f"clock offset {clock['offset_ms'] / 1000:+.4f} s (true {args.skew:+.4f} s), rtt {clock['rtt_ms']:.2f} ms, "
+          f"{over_http['finished']} of {over_http['started']} commands traced to the wire")
+    print(f"{'segment':<10} | count | p50 ms  | p90 ms  | p99 ms  | max ms")
+    for name, stats in segments.items():
+        if stats["count"]:
+            print(f"{name:<10} | {stats['count']:5d} | {stats['p50']:7.3f} | {stats['p90']:7.3f} | {stats['p99']:7.3f} | {stats['max']:7.3f}")
+        else:
+            print(f"{name:<10} | {0:5d} |")
+
+    if abs(clock["offset_ms"] / 1000 - args.skew) * 1000 > clock["rtt_ms"] / 2 + 0.5:
+        failures.append(f"clock offset {clock['offset_ms']:.2f} ms, should be {args.skew * 1000:.2f} ms")
+    network = segments["network"]
+    if not network["count"] or network["p99"] > 50 or network["clamped"] > network["count"] * 0.05:
+        failures.append(f"network segment off: {network}")
+    for name in ("dispatch", "set_motor", "io", "server", "total"):
+        if not segments[name]["count"]:
+            failures.append(f"no samples for {name}")
+    io_p99 = segments["io"].get("p99", float("nan"))
+    if not abs(io_p99 - motors_p99) <= max(1.0, 0.1 * motors_p99):
+        failures.append(f"io p99 {io_p99:.2f} ms, Motor.latency_stats p99 {motors_p99:.2f} ms")
+    if not over_ws["segments"]["total"].get("buckets"):
+        failures.append("no histogram buckets over the websocket")
+
+    print("PASS" if not failures else "FAIL: " + "; ".join(failures))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
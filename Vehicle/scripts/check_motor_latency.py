@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Checks that motor commands don't wait behind a WebRTC negotiation. Drives the real
+/ws endpoint (api/ws.py) through Starlette's TestClient with a stand-in WebRTCManager
+whose offer() takes --negotiation s (ICE gathering), sends motor commands at
+--command-rate the whole time and requests an offer in the middle.
+
+Latency is from the client sending a command to Motor.set_motor getting it. Fails
+(exit code 1) if the p99 while the offer is being negotiated is above --max-latency
+or more than 3x (+10 ms) the p99 outside of it, if the offer never comes back, or if the
+dispatcher applies a stale command (or drops a stale stop) it's sent at the end.
+
+Usage: python3 check_motor_latency.py --negotiation 2 --duration 5
+"""
+import argparse
+import asyncio
+import contextlib
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from api import ws as ws_api
+from api.protocol import SUBPROTOCOL_BINARY, STOP_SPEED, encode_motor
+from core import services
+
+
+class SlowWebRTC:
+    """WebRTCManager.offer that takes as long as ICE gathering on a bad network."""
+
+    def __init__(self, negotiation: float):
+        self.negotiation = negotiation
+
+    async def offer(self, params: dict) -> dict:
+        await asyncio.sleep(self.negotiation)
+        return {"sdp": params["sdp"], "type": "answer"}
+
+
+class RecordingMotors:
+    voltage = 36.0
+
+    def __init__(self):
+        self.received: dict[int, float] = {}  # left speed (the sequence number here) -> time.perf_counter()
+        self.commands: list[tuple[float, float]] = []
+
+    def set_motor(self, command, trace=None):
+        self.received[int(command.left)] = time.perf_counter()
+        self.commands.append((command.left, command.right))
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--negotiation", type=float, default=2.0, help="s offer() takes")
+    parser.add_argument("--command-rate", type=float, default=50, help="motor commands/s")
+    parser.add_argument("--duration", type=float, default=5.0, help="s of commands, the offer is requested after 1 s")
+    parser.add_argument("--max-latency", type=float, default=0.02, help="s, p99 allowed while negotiating")
+    args = parser.parse_args()
+
+    motors = RecordingMotors()
+    services.motors = motors
+    services.webrtc = SlowWebRTC(args.negotiation)
+    services.gps = SimpleNamespace()  # telemetry only checks there is one
+    services.lights = None
+
+    app = FastAPI()
+    app.include_router(ws_api.router)
+    sent: dict[int, float] = {}
+    offer = {}
+
+    # api/ws.py re-raises the disconnect when the test client closes, uvicorn would swallow it
+    with contextlib.suppress(WebSocketDisconnect), TestClient(app) as client, \
+            client.websocket_connect("/ws", subprotocols=[SUBPROTOCOL_BINARY]) as ws:
+        def receive():
+            while "answered" not in offer:
+                message = ws.receive()
+                if message.get("text") and "webrtc_offer_response" in message["text"]:
+                    offer["answered"] = time.perf_counter()
+
+        receiver = threading.Thread(target=receive, daemon=True)
+        receiver.start()
+
+        start = time.perf_counter()
+        sequence = 0
+        while time.perf_counter() - start < args.duration:
+            if "requested" not in offer and time.perf_counter() - start >= 1.0:
+                offer["requested"] = time.perf_counter()
+                ws.send_json({"id": "offer", "type": "two_way_message:webrtc_offer_request", "data": {"sdp": "v=0", "type": "offer"}})
+            sequence += 1
+            sent[sequence] = time.perf_counter()
+            ws.send_bytes(encode_motor(sequence, sequence, 0))  # left carries the sequence number
+            time.sleep(1 / args.command_rate)
+
+        # Out of order at the end: a stale command has to be dropped, a stale stop applied
+        ws.send_bytes(encode_motor(sequence - 5, 999, 999))
+        ws.send_bytes(encode_motor(sequence - 4, STOP_SPEED, STOP_SPEED))
+        time.sleep(0.2)
+        receiver.join(timeout=args.negotiation + 1)
+
+    failures = []
+    if "answered" not in offer:
+        failures.append("no webrtc_offer_response")
+        offer["answered"] = float("inf")
+    during, outside = [], []
+    for n, sent_at in sent.items():
+        if n not in motors.received:
+            failures.append(f"command {n} never reached set_motor")
+            continue
+        latency = motors.received[n] - sent_at
+        (during if offer["requested"] <= sent_at <= offer["answered"] else outside).append(latency)
+
+    print(f"offer answered after {offer['answered'] - offer['requested']:.2f} s, {len(during)} commands sent meanwhile")
+    print(f"{'':<18} | commands | p50      | p99      | max")
+    for name, latencies in (("while negotiating", during), ("otherwise", outside)):
+        print(f"{name:<18} | {len(latencies):8d} | {percentile(latencies, 0.5) * 1e3:5.2f} ms | "
+              f"{percentile(latencies, 0.99) * 1e3:5.2f} ms | {max(latencies, default=float('nan')) * 1e3:5.2f} ms")
+
+    p99_during, p99_outside = percentile(during, 0.99), percentile(outside, 0.99)
+    if not during:
+        failures.append("no commands were sent during the negotiation")
+    elif p99_during > args.max_latency:
+        failures.append(f"p99 while negotiating {p99_during * 1e3:.1f} ms > {args.max_latency * 1e3:.0f} ms")
+    elif p99_during > 3 * p99_outside + 0.01:  # ~100 samples, p99 is about the max and jumps with scheduling
+        failures.append(f"p99 while negotiating {p99_during * 1e3:.1f} ms is over 3x (+10 ms) the {p99_outside * 1e3:.1f} ms otherwise")
+    if (999, 999) in motors.commands:
+        failures.append("stale command was applied")
+    if motors.commands[-1] != (0, 0):
+        failures.append(f"stale stop wasn't applied, last command {motors.commands[-1]}")
+
+    print("PASS" if not failures else "FAIL: " + "; ".join(failures))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Checks that the NTRIP session manager (drivers/ntrip.py) recovers from a caster that
+drops or stalls. Runs the GPS driver against two local casters (sim/ntrip.py) and the
+pty ZED-F9P stand-in (sim/gnss.py). The first caster drops the connection, then
+answers 503 to every reconnect, so the session has to rotate to the second one.
+
+Fails (exit code 1) if corrections were ever older than --max-age, the session didn't
+end up streaming from the second caster, or the stats never reached states.ntrip_status.
+
+Usage: python3 check_ntrip_session.py --mode stall --duration 30
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from core import states
+from drivers.gps import GPS
+from drivers.ntrip import Caster
+from sim.gnss import GNSSSimulator
+from sim.ntrip import NTRIPCaster
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("close", "stall"), default="stall", help="how the first caster drops")
+    parser.add_argument("--dropout-interval", type=float, default=5.0, help="mean s until the first caster drops")
+    parser.add_argument("--stall-timeout", type=float, default=3.0)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--max-age", type=float, default=None, help="allowed correction age in s, default stall timeout + 7 s")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    # Stall timeout after the last 1 Hz correction, up to 1 + 2 s of backoff around the
+    # 503, and the client dropping the first chunk after it reconnects
+    max_age = args.max_age or args.stall_timeout + 7.0
+
+    primary = NTRIPCaster(mountpoint="PRIMARY", dropout_interval=args.dropout_interval, dropout_mode=args.mode, seed=args.seed).start()
+    backup = NTRIPCaster(mountpoint="BACKUP", seed=args.seed).start()
+    casters = [Caster("127.0.0.1", primary.port, primary.mountpoint), Caster("127.0.0.1", backup.port, backup.mountpoint)]
+    rx = GNSSSimulator(rate=5, process=True).start()
+    try:
+        gps = GPS(port=rx.port, nav_rate=5, casters=casters)
+
+        def run():
+            with gps.ntrip_client(stall_timeout=args.stall_timeout, seed=args.seed):
+                gps.read_gnss_loop()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        ages = []
+        states_seen = []
+        end = time.time() + args.duration
+        while time.time() < end:
+            time.sleep(0.1)
+            session = gps.ntrip_session
+            if session and session.state == "streaming" and not primary.down:
+                primary.down = True  # the current connection keeps going until it drops
+            status = states.ntrip_status
+            if status.get("rtcm_age") is not None:
+                ages.append(status["rtcm_age"])
+            if status.get("ntrip_state") and status["ntrip_state"] not in states_seen[-1:]:
+                states_seen.append(status["ntrip_state"])
+        status = dict(states.ntrip_status)
+        session = gps.ntrip_session
+        gps.stop()
+        thread.join(timeout=3)
+        gps.cleanup()
+    finally:
+        primary.stop()
+        backup.stop()
+        rx.stop()
+
+    print(f"sessions            {session.sessions} (last error: {session.last_error})")
+    print(f"state transitions   {' -> '.join(states_seen)}")
+    print(f"final caster        {status.get('caster')} {status.get('ntrip_state')} at {status.get('ntrip_rate')} B/s")
+    print(f"connections         primary {len(primary.connections)} ({sum(c.dropped for c in primary.connections)} dropped) | backup {len(backup.connections)}")
+    if ages:
+        print(f"correction age      max {max(ages):.2f} s (allowed {max_age:.2f} s)")
+
+    failures = []
+    if not ages:
+        failures.append("no corrections reached the receiver")
+    elif max(ages) > max_age:
+        failures.append("corrections older than --max-age")
+    if not any(c.dropped for c in primary.connections):
+        failures.append("primary never dropped, raise --duration")
+    if status.get("caster") != str(casters[1]) or status.get("ntrip_state") != "streaming":
+        failures.append("not streaming from the backup caster")
+    if "ntrip_sessions" not in status:
+        failures.append("session stats missing from states.ntrip_status")
+    print("FAIL: " + ", ".join(failures) if failures else "PASS")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
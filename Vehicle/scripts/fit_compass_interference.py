@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Fits the compass motor interference model (drivers/compass_calibration.py) from a log
+recorded with `main.py --compass-record compass.csv`, and writes the file the server
+loads at startup (Vehicle/config/compass_interference.json).
+
+Record with the tank on a stand so the heading doesn't change: drive both tracks
+through a range of throttles forwards and backwards, one side at a time and together,
+with a few seconds stopped in between. The stopped parts (commands and currents near
+zero) give the undisturbed field, interpolated over time so slow drift doesn't end up
+in the model. The first --train part of the log is fitted, the rest is held out, and
+the heading error with and without compensation is reported for both.
+
+Usage: python3 fit_compass_interference.py compass.csv
+       python3 fit_compass_interference.py compass.csv --dry-run
+"""
+import argparse
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.compass_calibration import (
+    CALIBRATION_FILE, DEFAULT_CALIBRATION, INTERFERENCE_FILE, MOTOR_FEATURES, RECORD_COLUMNS, Calibration,
+    InterferenceModel, fit_interference, load_calibration, save_interference,
+)
+
+def load_log(path: Path | str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """time (N,), raw field (N, 3) gauss, motor features (N, len(MOTOR_FEATURES))."""
+    log = np.genfromtxt(path, delimiter=",", names=True)
+    missing = set(RECORD_COLUMNS) - set(log.dtype.names or ())
+    if missing:
+        raise ValueError(f"{path} is missing columns {sorted(missing)}")
+    raw = np.column_stack([log[c] for c in ("x", "y", "z")])
+    features = np.column_stack([log[c] for c in MOTOR_FEATURES])
+    return log["time"], raw, features
+
+def quiet_baseline(time: np.ndarray, raw: np.ndarray, features: np.ndarray,
+                   max_command: float = 1.0, max_current: float = 0.05) -> np.ndarray:
+    """
+    Field with the motors off at every sample: the median of each stopped stretch,
+    linearly interpolated between them (and held before the first / after the last).
+    """
+    commands, currents = features[:, :2], features[:, 2:]
+    quiet = (np.abs(commands) <= max_command).all(axis=1) & (np.abs(currents) <= max_current).all(axis=1)
+    if not quiet.any():
+        raise ValueError("no samples with the motors stopped, can't tell what the undisturbed field is")
+    edges = np.flatnonzero(np.diff(quiet.astype(int))) + 1
+    runs = [run for run in np.split(np.arange(len(time)), edges) if quiet[run[0]]]
+    centers = np.array([np.median(time[run]) for run in runs])
+    medians = np.array([np.median(raw[run], axis=0) for run in runs])
+    return np.column_stack([np.interp(time, centers, medians[:, axis]) for axis in range(3)])
+
+def heading_errors(calibration: Calibration, field: np.ndarray, baseline: np.ndarray) -> np.ndarray:
+    """deg, |heading(field) - heading(baseline)| per sample."""
+    headings = np.array([calibration.heading(*sample) for sample in field])
+    truth = np.array([calibration.heading(*sample) for sample in baseline])
+    return np.abs((headings - truth + 180) % 360 - 180)
+
+def compensated(model: InterferenceModel, raw: np.ndarray, features: np.ndarray) -> np.ndarray:
+    return raw - features @ np.asarray(model.coefficients).T
+
+def summary(errors: np.ndarray) -> str:
+    return (f"p50 {np.percentile(errors, 50):5.2f} | p99 {np.percentile(errors, 99):5.2f} | "
+            f"max {errors.max():5.2f} | RMS {np.sqrt(np.mean(errors ** 2)):5.2f} deg")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", nargs="+", help="CSV(s) from --compass-record")
+    parser.add_argument("--train", type=float, default=0.7, help="fraction of each log, from the start, to fit on")
+    parser.add_argument("--max-command", type=float, default=1.0, help="|command| still counted as stopped")
+    parser.add_argument("--max-current", type=float, default=0.05, help="A, |current| still counted as stopped")
+    parser.add_argument("--calibration", default=str(CALIBRATION_FILE), help="hard/soft-iron calibration the headings are computed with")
+    parser.add_argument("--output", default=str(INTERFERENCE_FILE))
+    parser.add_argument("--dry-run", action="store_true", help="fit and print, don't write the file")
+    args = parser.parse_args()
+
+    calibration = load_calibration(args.calibration) or DEFAULT_CALIBRATION
+    train, test = [], []
+    for path in args.log:
+        time, raw, features = load_log(path)
+        baseline = quiet_baseline(time, raw, features, args.max_command, args.max_current)
+        split = time[0] + (time[-1] - time[0]) * args.train  # by time, neighbouring samples are correlated
+        train.append((raw[time < split], features[time < split], baseline[time < split]))
+        test.append((raw[time >= split], features[time >= split], baseline[time >= split]))
+    train_raw, train_features, train_baseline = (np.concatenate(parts) for parts in zip(*train))
+    test_raw, test_features, test_baseline = (np.concatenate(parts) for parts in zip(*test))
+
+    model = fit_interference(train_raw, train_features, train_baseline)
+    before = heading_errors(calibration, test_raw, test_baseline)
+    after = heading_errors(calibration, compensated(model, test_raw, test_features), test_baseline)
+    model = model._replace(heading_error_before=float(np.sqrt(np.mean(before ** 2))),
+                           heading_error_after=float(np.sqrt(np.mean(after ** 2))))
+
+    print(f"{len(train_raw)} samples fitted, {len(test_raw)} held out, calibration: {calibration.method}")
+    print(f"{'gauss per':<14} | {'x':>9} | {'y':>9} | {'z':>9}")
+    for name, column in zip(MOTOR_FEATURES, np.asarray(model.coefficients).T):
+        print(f"{name:<14} | {' | '.join(f'{v:+9.2e}' for v in column)}")
+    print()
+    print(f"fitted     uncompensated  {summary(heading_errors(calibration, train_raw, train_baseline))}")
+    print(f"           compensated    {summary(heading_errors(calibration, compensated(model, train_raw, train_features), train_baseline))}")
+    print(f"held out   uncompensated  {summary(before)}")
+    print(f"           compensated    {summary(after)}")
+
+    if not args.dry_run:
+        save_interference(model, args.output)
+        print(f"Saved to {args.output}, restart the server to use it")
+
+if __name__ == "__main__":
+    main()
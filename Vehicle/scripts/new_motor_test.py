@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
-import struct
-import serial  # type: ignore
+import sys
 import time
+from pathlib import Path
+import serial  # type: ignore
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.hover_protocol import FrameEncoder
 
 # ----------------------
 # Hoverboard Configuration
 # ----------------------
 PORT = "/dev/serial0"  # Adjust depending on your hardware setup
 BAUDRATE = 4800  # Matches default configuration in hoverboard firmware
+# BAUDRATE = 115200  # High-baud mode, needs REMOTE_BAUD 115200 in the firmware config.h
 SEND_INTERVAL = 0.1  # 100ms interval between transmissions
 MAX_SPEED = 1000  # Maximum absolute motor speed
 PERIOD = 6  # Zigzag period in seconds (speed changes every 3)
@@ -20,37 +25,7 @@ ser = None  # Serial interface for communication
 # ----------------------
 # Utilities
 # ----------------------
-def calc_crc(data: bytes) -> int:
-    crc = 0
-    for byte in data:
-        crc ^= (byte << 8)
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = (crc << 1) ^ 0x1021
-            else:
-                crc <<= 1
-    return crc & 0xFFFF  # Ensure a 16-bit CRC
-
-def build_packet(iSlave: int, iSpeed: int, wState: int) -> bytes:
-    """
-    Build UART packet in `SerialServer2Hover` format:
-    Start Byte (1B) + Data Type (1B) + Slave ID (1B) + Speed (2B LE) + State (1B) + CRC (2B LE)
-    """
-    START_BYTE = b'\x2F'  # Start byte, `/` in ASCII
-    DATA_TYPE = b'\x00'  # Data type (`0x00` for SerialServer2Hover)
-
-    # Encode fields
-    slave_byte = struct.pack("<B", iSlave)  # Slave ID, 1 byte
-    speed_bytes = struct.pack("<h", iSpeed)  # Speed (signed 16-bit, little-endian)
-    state_byte = struct.pack("<B", wState)  # State byte
-
-    # Combine fields for CRC calculation
-    payload_without_crc = START_BYTE + DATA_TYPE + slave_byte + speed_bytes + state_byte
-    checksum = calc_crc(payload_without_crc)  # Calculate checksum
-    crc_bytes = struct.pack("<H", checksum)  # CRC (16-bit, little-endian)
-
-    # Final packet: Append checksum
-    return payload_without_crc + crc_bytes
+encoder = FrameEncoder()  # Same frame codec as drivers/motor.py
 
 def send_packet(iSlave: int, iSpeed: int, wState: int):
     """Send the constructed hoverboard control packet."""
@@ -58,7 +33,7 @@ def send_packet(iSlave: int, iSpeed: int, wState: int):
     if ser is None:
         raise RuntimeError("Serial port is not opened. Initialize it before sending packets.")
 
-    packet = build_packet(iSlave, iSpeed, wState)
+    packet = encoder.encode(iSlave, iSpeed, wState)
     ser.write(packet)
     ser.flush()
 
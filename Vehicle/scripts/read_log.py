@@ -1,9 +1,36 @@
-start_time: float = 0
-end_time: float = 0
+"""
+Time to first correction and time to RTK fixed for every server session in tank.log.
 
-with open("./tank.log", "r") as f:
+Usage: python3 read_log.py [path/to/tank.log]
+"""
+import argparse
+import statistics
+
+parser = argparse.ArgumentParser(description="Time to first correction and time to RTK fixed per session in tank.log")
+parser.add_argument("path", nargs="?", default="./tank.log", help="log file (default ./tank.log)")
+path = parser.parse_args().path
+
+sessions: list[dict[str, float]] = []
+
+with open(path, "r") as f:
   for line in f:
+    if "Software started at" in line or not sessions:
+      sessions.append({})
+    if "Time to first correction" in line:
+      sessions[-1].setdefault("correction", float(line.split(" ")[-1]))
     if "Time to fix" in line:
-      split_line = line.split(" ")
-      print(split_line[-1]) # last line
-    
+      sessions[-1].setdefault("fix", float(line.split(" ")[-1]))
+
+sessions = [s for s in sessions if s]
+
+def show(value):
+  return f"{value:8.2f} s" if value is not None else "   never  "
+
+print("session | first correction | RTK fixed")
+for i, session in enumerate(sessions):
+  print(f"{i:7d} | {show(session.get('correction')):>16} | {show(session.get('fix'))}")
+
+for key, name in (("correction", "first correction"), ("fix", "RTK fixed")):
+  values = [s[key] for s in sessions if key in s]
+  if values:
+    print(f"{name:<17} median {statistics.median(values):.2f} s | min {min(values):.2f} s | max {max(values):.2f} s | {len(values)}/{len(sessions)} sessions")
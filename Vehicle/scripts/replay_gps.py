@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Replays a GNSS recording (made with `--gps-record` or GPS(record=...)) through the
+GPS driver offline, and reports what the receiver did: RTK fix changes, fix drops,
+correction traffic and how much CPU the GPS path used.
+
+Usage: python3 replay_gps.py gnss.rec [--speed 1] [--pyubx2] [--profile]
+--speed 0 (default) replays as fast as possible.
+"""
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from drivers.gps import GPS, RX, TX, read_recording
+from drivers.ubx import epoch_time
+
+RTK = {0: "None", 1: "Float", 2: "Fixed"}
+
+def summarize(path: str):
+    counts = {RX: 0, TX: 0}
+    first = last = None
+    for timestamp, direction, data in read_recording(path):
+        counts[direction] += len(data)
+        first = timestamp if first is None else first
+        last = timestamp
+    if first is None:
+        print("empty recording")
+        sys.exit(1)
+    print(f"recorded           {last - first:.1f} s from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first))}")
+    print(f"receiver bytes     {counts[RX]}")
+    print(f"RTCM/config bytes  {counts[TX]}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=0, help="1 = recorded timing, 0 = as fast as possible")
+    parser.add_argument("--pyubx2", action="store_true", help="use the full pyubx2 reader instead of drivers/ubx.py")
+    parser.add_argument("--profile", action="store_true", help="print the top functions by cumulative time")
+    args = parser.parse_args()
+
+    summarize(args.recording)
+
+    gps = GPS(replay=args.recording, replay_speed=args.speed or None, fast_decoder=not args.pyubx2)
+    transitions = []  # (epoch time, rtk status)
+    pvts = 0
+    handle_nav_pvt = gps.handle_nav_pvt
+
+    def tracking(pvt, received=None):
+        nonlocal pvts
+        pvts += 1
+        handle_nav_pvt(pvt, received)
+        status = RTK.get(pvt.carrSoln, "Unknown")
+        if not transitions or transitions[-1][1] != status:
+            transitions.append((epoch_time(pvt) or time.time(), status))
+
+    gps.handle_nav_pvt = tracking
+
+    profiler = cProfile.Profile() if args.profile else None
+    start, cpu_start = time.perf_counter(), time.process_time()
+    if profiler:
+        profiler.enable()
+    gps.read_gnss_loop()
+    if profiler:
+        profiler.disable()
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+
+    print(f"NAV-PVT            {pvts}")
+    print(f"replay             {elapsed:.2f} s wall, {cpu:.2f} s CPU ({cpu * 1e6 / max(pvts, 1):.1f} us CPU per NAV-PVT)")
+    if transitions:
+        t0 = transitions[0][0]
+        print("RTK status changes:")
+        for timestamp, status in transitions:
+            print(f"  +{timestamp - t0:8.2f} s  {status}")
+        drops = sum(1 for (_, a), (_, b) in zip(transitions, transitions[1:]) if a == "Fixed" and b != "Fixed")
+        print(f"fix drops          {drops}")
+
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+if __name__ == "__main__":
+    main()
@@ -1,144 +1,68 @@
-import os
+#!/usr/bin/env python3
+"""
+Live RTK test with the real receiver and caster, through the same GPS driver the server
+uses. Prints the RTK status once a second and, at the end, time to first correction,
+time to RTK fixed, correction throughput and correction age.
+
+Usage: python3 rtk_gps_test.py --duration 120 [--record gnss.rec]
+       python3 rtk_gps_test.py --server macorsrtk.massdot.state.ma.us --port 10000 --mount RTCM3MSM_IMAX
+Credentials come from NTRIP_USER / NTRIP_PWD in .env, like the server.
+"""
+import argparse
+import sys
+import threading
 import time
-from queue import Queue, Empty
-from dotenv import load_dotenv
-from serial import Serial
-
-from pygnssutils import GNSSNTRIPClient, GNSSReader
-from pyubx2 import UBXMessage
-
-load_dotenv()
-
-PORT = "/dev/ttyACM0"
-BAUD = 38400
-
-# MaCORS
-# NTRIP_SERVER = "macorsrtk.massdot.state.ma.us"
-# NTRIP_PORT = 10000
-# NTRIP_MOUNT = "RTCM3MSM_IMAX"
-
-# Free trial
-NTRIP_SERVER = "rtk.rtkdata.com"
-NTRIP_PORT = 2101
-NTRIP_MOUNT = "AUTO"
-
-REFLAT = 42.361145
-REFLON = -71.057083
-REFALT = 0.0
-REFSEP = 0.0
-
-
-class RoverContext:
-    def __init__(self):
-        # Default starting position (optional, prevents sending 0,0 initially)
-        self.lat = REFLAT
-        self.lon = REFLON
-        self.alt = REFALT
-        self.sep = REFSEP
-        self.sats = 15
-
-    def get_coordinates(self):
-        """GNSSNTRIPClient calls this method every `ggainterval` seconds."""
-        # pygnssutils expects a dict for PyGPSClient >= 1.4.20 compatibility
-        return {
-            "lat": self.lat,
-            "lon": self.lon,
-            "alt": self.alt,
-            "sep": self.sep,
-            "sip": self.sats,
-            "fix": "3D"
-        }
-
-
-def configure_zedf9p_usb(stream: Serial):
-    """
-    Configure ZED-F9P via UBX-CFG-VALSET (Generation 9 compatible)
-    Ensures RTCM3 is accepted on USB, and NMEA/UBX are output on USB.
-    """
-    layers = 1  # 1 = RAM
-    transaction = 0
-    
-    # Configure USB Port Protocol In/Out Masks
-    cfg_data = [
-        ("CFG_USBINPROT_UBX", 1),
-        ("CFG_USBINPROT_NMEA", 1),
-        ("CFG_USBINPROT_RTCM3X", 1),    # VERY IMPORTANT: Accept RTCM3 on USB
-        ("CFG_USBOUTPROT_UBX", 1),
-        ("CFG_USBOUTPROT_NMEA", 1),     # Enabled so NTRIP Client can fetch GGA if needed
-        ("CFG_USBOUTPROT_RTCM3X", 0),
-        
-        # Ensure standard messages are output over USB
-        ("CFG_MSGOUT_UBX_NAV_PVT_USB", 1),
-        ("CFG_MSGOUT_NMEA_ID_GGA_USB", 1),
-    ]
-
-    msg = UBXMessage.config_set(layers, transaction, cfg_data) # type: ignore
-    stream.write(msg.serialize()) # type: ignore
-    stream.flush()
-    time.sleep(0.5)
+from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "RC-Tank"))
+from core import states
+from drivers.gps import BAUD, CASTERS, NAV_RATE, NAV_RATES, PORT, GPS
+from drivers.ntrip import Caster
 
 def main():
-    stream = Serial(PORT, BAUD, timeout=1)
-
-    # 1) Configure receiver to accept RTCM3 on USB and output UBX/NMEA
-    configure_zedf9p_usb(stream)
-
-    out_queue = Queue()
-    gnr = GNSSReader(stream)
-
-    # 2) Instantiate the context to hold live coordinates
-    rover = RoverContext()
-
-    # 3) Pass the context to GNSSNTRIPClient instead of None
-    with GNSSNTRIPClient(rover) as gnc:
-        gnc.run(
-            server=NTRIP_SERVER,
-            port=NTRIP_PORT,
-            mountpoint=NTRIP_MOUNT,
-            datatype="RTCM",
-            ntripuser=os.getenv("NTRIP_USER", "anon"),
-            ntrippassword=os.getenv("NTRIP_PWD", "password"),
-            ggainterval=10,
-            ggamode=0, # use live location from gps
-            output=out_queue,
-        )
-
-        while True:
-            # inject corrections + print what arrives
-            try:
-                while True:
-                    raw, parsed = out_queue.get_nowait()
-                    ident = getattr(parsed, "identity", type(parsed).__name__)
-                    # print(f"NTRIP: {ident} ({len(raw)} bytes)")
-                    if raw:
-                        stream.write(raw)
-                    out_queue.task_done()
-            except Empty:
-                pass
-
-            # show rover status
-            raw_gnss, parsed_gnss = gnr.read()
-            if parsed_gnss is not None and getattr(parsed_gnss, "identity", None) == "NAV-PVT":
-                
-                # 4) Update the live coordinates so the NTRIP client can use them!
-                rover.lat = parsed_gnss.lat
-                rover.lon = parsed_gnss.lon
-                rover.sats = parsed_gnss.numSV
-                # hMSL is in mm, convert to meters
-                rover.alt = getattr(parsed_gnss, "hMSL", 0.0) / 1000.0
-                
-                rtk_status = {0: "None", 1: "Float", 2: "Fixed"}.get(parsed_gnss.carrSoln, "Unknown")
-                # print( # print statement with lots of detail
-                #     f"Fix: {parsed_gnss.fixType}D | RTK: {rtk_status} | "
-                #     f"diffSoln: {parsed_gnss.diffSoln} | corrAge: {parsed_gnss.lastCorrectionAge}s | "
-                #     f"hAcc: {parsed_gnss.hAcc}mm | Sats: {parsed_gnss.numSV} | "
-                #     f"Lat: {parsed_gnss.lat}, Lon: {parsed_gnss.lon}"
-                # )
-                
-                # print statement to debug heading not updating
-                print(f"{parsed_gnss.lat}, {parsed_gnss.lon}, {time.time()}")
-
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serial", default=PORT)
+    parser.add_argument("--baud", type=int, default=BAUD)
+    parser.add_argument("--server", help="only use this caster, instead of rotating through CASTERS")
+    parser.add_argument("--port", type=int, default=2101)
+    parser.add_argument("--mount", default="AUTO")
+    parser.add_argument("--nav-rate", type=int, choices=NAV_RATES, default=NAV_RATE)
+    parser.add_argument("--duration", type=float, default=120)
+    parser.add_argument("--record", help="also record the session for replay_gps.py / bench_ntrip.py")
+    args = parser.parse_args()
+
+    gps = GPS(port=args.serial, baud=args.baud, nav_rate=args.nav_rate, record=args.record,
+              casters=[Caster(args.server, args.port, args.mount)] if args.server else CASTERS)
+    threading.Thread(target=gps.update_gps_thread, daemon=True).start()
+
+    ages = []
+    start = time.time()
+    try:
+        while time.time() - start < args.duration:
+            time.sleep(1)
+            status = states.ntrip_status
+            if status.get("rtcm_age") is not None:
+                ages.append(status["rtcm_age"])
+            print(
+                f"+{time.time() - start:6.1f} s | RTK: {status.get('rtk', '-'):<7} | hAcc: {status.get('h_acc', '-')} mm | "
+                f"sats: {status.get('sats', '-')} | corrections: {gps.rtcm_bytes} B | "
+                f"{status.get('caster', '-')} {status.get('ntrip_state', '')}"
+            )
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.time() - start
+    gps.cleanup()
+
+    first = gps.first_rtcm_time
+    print()
+    print(f"time to first correction  {first - gps.start_time:.2f} s" if first else "time to first correction  never")
+    print(f"time to RTK fixed         {gps.time_to_fix:.2f} s" if gps.time_to_fix else "time to RTK fixed         never")
+    print(f"correction throughput     {gps.rtcm_bytes / (time.time() - first):.1f} B/s" if first else "correction throughput     0 B/s")
+    if ages:
+        print(f"correction age            mean {sum(ages) / len(ages):.2f} s | max {max(ages):.2f} s")
+    print(f"session                   {elapsed:.1f} s")
+    if gps.ntrip_session:
+        print(f"NTRIP sessions            {gps.ntrip_session.sessions} (last error: {gps.ntrip_session.last_error})")
 
 if __name__ == "__main__":
     main()
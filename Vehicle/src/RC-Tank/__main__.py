@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+from core.config import build_parser
 from core.lifecycle import lifespan
 from api import ws
 
@@ -21,6 +22,7 @@ app.add_middleware(
 app.include_router(ws.router)
 
 if __name__ == "__main__":
+    build_parser(add_help=True).parse_args() # --help, and unknown flags stop the server, core.config already read the known ones
     import uvicorn
     uvicorn.run(
         app,
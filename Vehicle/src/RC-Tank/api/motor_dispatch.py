@@ -0,0 +1,59 @@
+"""
+Fast path for motor commands from a websocket. The receive loop hands every motor
+command straight to a MotorDispatcher, never behind anything slow (WebRTC
+negotiation runs as its own task in api/ws.py), and the dispatcher
+drops commands that are older than one it already applied, by the sequence number the
+client put on them.
+
+Stops always go through: stopping is never the wrong thing to do, however late.
+
+Kept free of hardware imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import time
+from typing import Callable
+
+from api.protocol import STOP_SPEED
+from core.latency import CommandTrace
+from core.types import MotorCommand
+
+
+def is_stop(command: MotorCommand) -> bool:
+    return STOP_SPEED in (command.left, command.right) or command.left == command.right == 0
+
+
+def newer(sequence: int, last: int) -> bool:
+    """Serial number comparison for 32 bit sequence numbers, so wrapping around 2^32 isn't stale."""
+    return 0 < (sequence - last) & 0xFFFFFFFF < 0x80000000
+
+
+class MotorDispatcher:
+    """
+    One per websocket, sequence numbers are per sender.
+
+    Args:
+    set_motor: applies a command (and finishes its trace), must not block (Motor.set_motor only hands it to the io worker)
+    """
+
+    def __init__(self, set_motor: Callable[[MotorCommand, CommandTrace | None], None]):
+        self.set_motor = set_motor
+        self.last_sequence: int | None = None
+
+        self.applied = 0
+        self.stale = 0
+
+    def submit(self, command: MotorCommand, sequence: int | None = None, trace: CommandTrace | None = None) -> bool:
+        """True if applied. Commands without a sequence number (older clients) are always applied."""
+        if sequence is not None:
+            if self.last_sequence is not None and not newer(sequence, self.last_sequence) and not is_stop(command):
+                self.stale += 1
+                return False
+            if self.last_sequence is None or newer(sequence, self.last_sequence):
+                self.last_sequence = sequence
+        if trace is not None:
+            trace.dispatched = time.time()
+        self.set_motor(command, trace)
+        self.applied += 1
+        return True
+
+    def stats(self) -> dict[str, int]:
+        return {"applied": self.applied, "stale": self.stale}
@@ -0,0 +1,128 @@
+"""
+Binary websocket subprotocol (`rctank.binary.v1`): fixed layout little-endian frames
+for the messages that are sent many times a second, instead of JSON text. Everything
+else (waypoints, self driving mode, two way messages) stays JSON text on the same
+socket. Clients that don't offer the subprotocol get JSON for everything.
+
+Every frame starts with HEADER: kind, sequence number (per sender and direction,
+wraps at 2^32) and time.time() at the sender. The layouts are mirrored in
+Website/src/lib/components/binaryProtocol.ts, change both together.
+
+Kept free of `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import math
+import struct
+import time
+from typing import Any, NamedTuple
+
+SUBPROTOCOL_BINARY = "rctank.binary.v1"
+SUBPROTOCOL_JSON = "rctank.json"
+
+KIND_MOTOR = 1  # client -> server
+KIND_LIGHTS = 2  # client -> server
+KIND_TELEMETRY = 3  # server -> client
+
+HEADER_FORMAT = "<BId"  # kind, sequence, timestamp
+HEADER = struct.Struct(HEADER_FORMAT)
+# left, right: -1000 to 1000, a stop (STOP_SPEED) goes as 0, 0
+MOTOR_FRAME = struct.Struct(HEADER_FORMAT + "hh")
+# level: 0 to 100
+LIGHTS_FRAME = struct.Struct(HEADER_FORMAT + "B")
+# lat, lon, alt, heading, voltage, position_age, h_acc (mm), corr_age, fix_type, rtk, diff_soln, sats
+TELEMETRY_FRAME = struct.Struct(HEADER_FORMAT + "ddffffIBBBBB")
+
+RTK = ("None", "Float", "Fixed", "Unknown")  # ntrip_status["rtk"] by index
+NO_INT = 0xFF  # for a missing 1 byte field, floats use NaN
+NO_H_ACC = 0xFFFFFFFF
+STOP_SPEED = 1234_0000  # what the web UI sends for a stop in JSON, Motor.set_motor treats it as 0
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+class Frame(NamedTuple):
+    kind: int
+    sequence: int
+    timestamp: float  # time.time() at the sender
+    data: Any  # (left, right) for motor, level for lights, the telemetry dict for telemetry
+
+
+def choose_subprotocol(offered: list[str]) -> str | None:
+    """Binary if the client speaks it, else JSON if it asked for that by name (browsers fail the handshake if none is picked)."""
+    if SUBPROTOCOL_BINARY in offered:
+        return SUBPROTOCOL_BINARY
+    if SUBPROTOCOL_JSON in offered:
+        return SUBPROTOCOL_JSON
+    return None
+
+
+def _clamp(value: float, low: int, high: int) -> int:
+    return max(low, min(high, int(round(value))))
+
+
+def encode_motor(sequence: int, left: float, right: float, timestamp: float | None = None) -> bytes:
+    if STOP_SPEED in (left, right):  # would clamp to full speed
+        left = right = 0
+    return MOTOR_FRAME.pack(KIND_MOTOR, sequence & 0xFFFFFFFF, time.time() if timestamp is None else timestamp,
+                            _clamp(left, -1000, 1000), _clamp(right, -1000, 1000))
+
+
+def encode_lights(sequence: int, level: float, timestamp: float | None = None) -> bytes:
+    return LIGHTS_FRAME.pack(KIND_LIGHTS, sequence & 0xFFFFFFFF, time.time() if timestamp is None else timestamp,
+                             _clamp(level, 0, 100))
+
+
+def _float(value) -> float:
+    return math.nan if value is None else value
+
+
+def _int(value, missing: int = NO_INT) -> int:
+    return missing if value is None else value
+
+
+def encode_telemetry(sequence: int, telemetry: dict, timestamp: float | None = None) -> bytes:
+    """telemetry: the "data" of the JSON telemetry message. Fields the web UI doesn't show stay JSON only."""
+    gps = telemetry["gps"]
+    ntrip = telemetry.get("ntrip_status") or {}
+    rtk = ntrip.get("rtk")
+    return TELEMETRY_FRAME.pack(
+        KIND_TELEMETRY, sequence & 0xFFFFFFFF, time.time() if timestamp is None else timestamp,
+        gps["lat"], gps["lon"], gps["alt"],
+        _float(telemetry.get("heading")), _float(telemetry.get("voltage")), _float(telemetry.get("position_age")),
+        _int(ntrip.get("h_acc"), NO_H_ACC), _int(ntrip.get("corr_age")), _int(ntrip.get("fix_type")),
+        RTK.index(rtk) if rtk in RTK else NO_INT, _int(ntrip.get("diff_soln")), _int(ntrip.get("sats")),
+    )
+
+
+def _none(value, missing: int = NO_INT):
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    return None if value == missing else value
+
+
+def decode(buffer: bytes) -> Frame:
+    """ProtocolError for unknown kinds or a length that doesn't match the kind."""
+    if len(buffer) < HEADER.size:
+        raise ProtocolError(f"{len(buffer)} byte frame is shorter than the header")
+    kind = buffer[0]
+    if kind == KIND_MOTOR and len(buffer) == MOTOR_FRAME.size:
+        _, sequence, timestamp, left, right = MOTOR_FRAME.unpack(buffer)
+        return Frame(kind, sequence, timestamp, (left, right))
+    if kind == KIND_LIGHTS and len(buffer) == LIGHTS_FRAME.size:
+        _, sequence, timestamp, level = LIGHTS_FRAME.unpack(buffer)
+        return Frame(kind, sequence, timestamp, level)
+    if kind == KIND_TELEMETRY and len(buffer) == TELEMETRY_FRAME.size:
+        (_, sequence, timestamp, lat, lon, alt, heading, voltage, position_age,
+         h_acc, corr_age, fix_type, rtk, diff_soln, sats) = TELEMETRY_FRAME.unpack(buffer)
+        return Frame(kind, sequence, timestamp, {
+            "gps": {"lat": lat, "lon": lon, "alt": alt},
+            "ntrip_status": {
+                "fix_type": _none(fix_type), "rtk": RTK[rtk] if rtk < len(RTK) else None, "diff_soln": _none(diff_soln),
+                "corr_age": _none(corr_age), "h_acc": _none(h_acc, NO_H_ACC), "sats": _none(sats),
+            },
+            "position_age": _none(position_age),
+            "heading": _none(heading),
+            "voltage": _none(voltage),
+        })
+    raise ProtocolError(f"unknown frame kind {kind} with {len(buffer)} bytes")
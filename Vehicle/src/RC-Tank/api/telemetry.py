@@ -1,8 +1,43 @@
 from core import services, states
+from core.config import get_logger, telemetry_rates, telemetry_keyframe
 from fastapi import WebSocket, WebSocketException
-import asyncio
+from api.protocol import encode_telemetry
+from api.telemetry_hub import TelemetryHub
+from api.telemetry_publisher import FIELD_RULES, TelemetryPublisher
+import time
 
-async def send_telemetry(ws: WebSocket, websocket_logger):
+# --telemetry-rate overrides the defaults in api/telemetry_publisher.py
+RULES = {name: rule._replace(max_rate=telemetry_rates.get(name, rule.max_rate)) for name, rule in FIELD_RULES.items()}
+
+def read_telemetry():
+  gps_data = states.gps_location
+  
+  if hasattr(gps_data, "model_dump"):
+    gps_value = gps_data.model_dump()
+  elif hasattr(gps_data, "dict"):
+    gps_value = gps_data.dict()
+  else:
+    gps_value = gps_data
+
+  return {
+    "gps": gps_value,
+    "ntrip_status": states.ntrip_status,
+    "position_age": time.time() - states.gps_fix_time if states.gps_fix_time else None, # s since the epoch of gps
+    "heading": states.heading,
+    "voltage": services.motors.voltage if services.motors else None,
+    "lights": services.lights.stats() if services.lights else None # frames composed/transmitted/skipped
+  }
+
+# One producer for every connected client, see api/telemetry_hub.py
+hub = TelemetryHub(TelemetryPublisher(read_telemetry, RULES, telemetry_keyframe), encode_telemetry, get_logger("websocket"))
+
+async def send_telemetry(ws: WebSocket, websocket_logger, binary: bool = False):
+  """
+  Full "telemetry" keyframe every --telemetry-keyframe s, "telemetry_delta" with just
+  the fields that changed in between. Binary clients get the whole (fixed layout)
+  frame whenever anything changed. Built once for every client by the hub, this only
+  sends the newest message whenever the socket is ready for it.
+  """
   websocket_logger.debug("Starting telemetry")
   if services.gps is None:
     websocket_logger.error("GPS unavailable")
@@ -10,27 +45,10 @@ async def send_telemetry(ws: WebSocket, websocket_logger):
   if services.motors is None:
     websocket_logger.error("Motors unavailable")
     raise WebSocketException(1011, "Motors unavailable")
-  while True:
-    gps_data = states.gps_location
-    
-    if hasattr(gps_data, "model_dump"):
-      gps_value = gps_data.model_dump()
-    elif hasattr(gps_data, "dict"):
-      gps_value = gps_data.dict()
-    else:
-      gps_value = gps_data
-
-    data = {
-      "type": "telemetry", 
-      "data": {
-        "gps": gps_value,
-        "ntrip_status": states.ntrip_status,
-        "heading": states.heading,
-        "voltage": services.motors.voltage
-      }
-    }
-
-    await ws.send_json(data)
-    websocket_logger.debug(f"Sending telemetry: {data}")
-
-    await asyncio.sleep(1)
\ No newline at end of file
+  subscriber = hub.subscribe(binary)
+  send = ws.send_bytes if binary else ws.send_text
+  try:
+    while True:
+      await send(await subscriber.get())
+  finally:
+    hub.unsubscribe(subscriber)
@@ -0,0 +1,157 @@
+"""
+One telemetry producer for every websocket: the TelemetryPublisher is polled once per
+tick, each update is serialized once (JSON text for JSON clients, the binary frame for
+binary ones) and the same encoded message is handed to every subscriber.
+
+Each subscriber has a mailbox that only holds the newest message. A client that can't
+keep up (a browser tab on a bad link) skips the messages it didn't get around to
+sending instead of queueing them, so it never adds latency or memory for the driver's
+session. Deltas only make sense on top of everything before them, so a JSON subscriber
+that skipped one gets a keyframe of the current snapshot in place of the next delta
+(serialized once per update for all of them).
+
+    hub = TelemetryHub(TelemetryPublisher(read), encode_binary=encode_telemetry)
+    subscriber = hub.subscribe(binary=False)  # starts the producer on first use
+    while True:
+        await ws.send_text(await subscriber.get())
+
+Kept free of `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable
+
+from api.telemetry_publisher import TelemetryPublisher
+
+
+def encode_json(keyframe: bool, fields: dict[str, Any]) -> str:
+    """Same text WebSocket.send_json produces."""
+    return json.dumps({"type": "telemetry" if keyframe else "telemetry_delta", "data": fields},
+                      separators=(",", ":"), ensure_ascii=False)
+
+
+class Subscriber:
+    """Newest only mailbox, filled by TelemetryHub and drained by one websocket sender."""
+
+    def __init__(self, binary: bool):
+        self.binary = binary
+        self._message: str | bytes | None = None
+        self._ready = asyncio.Event()
+
+        self.delivered = 0
+        self.dropped = 0  # replaced before the sender got to them
+
+    @property
+    def pending(self) -> bool:
+        return self._message is not None
+
+    def offer(self, message: str | bytes):
+        if self._message is not None:
+            self.dropped += 1
+        self._message = message
+        self._ready.set()
+
+    async def get(self) -> str | bytes:
+        while self._message is None:
+            self._ready.clear()
+            await self._ready.wait()
+        message, self._message = self._message, None
+        self.delivered += 1
+        return message
+
+
+class TelemetryHub:
+    """
+    Args:
+    publisher: polled once per tick for everyone
+    encode_binary: (sequence, snapshot) -> bytes, for binary subscribers
+    logger: keyframes are logged at debug (deltas come at up to 20 Hz, too many for a log)
+    """
+
+    def __init__(self, publisher: TelemetryPublisher, encode_binary: Callable[[int, dict[str, Any]], bytes],
+                 logger: logging.Logger | None = None):
+        self.publisher = publisher
+        self.encode_binary = encode_binary
+        self.logger = logger
+        self._subscribers: set[Subscriber] = set()
+        self._task: asyncio.Task | None = None
+        self._sequence = 0
+
+        self.updates = 0
+        self.serialized = 0  # messages encoded, however many subscribers got each
+        self.resyncs = 0  # keyframes sent in place of a delta to subscribers that skipped one
+
+    def subscribe(self, binary: bool = False) -> Subscriber:
+        """Starts the subscriber off with a keyframe of the current state, call from the event loop."""
+        self.start()
+        subscriber = Subscriber(binary)
+        snapshot = self.publisher.read()
+        subscriber.offer(self._encode_binary(snapshot) if binary else self._encode_json(True, snapshot))
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self.run())
+
+    async def run(self):
+        while True:
+            if self._subscribers:
+                try:
+                    self.publish(time.time())
+                except Exception as e:  # a bad read shouldn't stop telemetry for good
+                    if self.logger:
+                        self.logger.error(f"Telemetry update failed: {e}")
+            await asyncio.sleep(self.publisher.tick)
+
+    def publish(self, now: float):
+        """Poll the publisher once and hand the result to every subscriber."""
+        update = self.publisher.poll(now)
+        if update is None:
+            return
+        keyframe, fields, snapshot = update
+        self.updates += 1
+        if keyframe and self.logger:
+            self.logger.debug(f"Sending telemetry: {snapshot}")
+
+        text = resync = binary = None
+        for subscriber in tuple(self._subscribers):
+            if subscriber.binary:  # every frame is the whole snapshot, skipping some is harmless
+                if binary is None:
+                    binary = self._encode_binary(snapshot)
+                subscriber.offer(binary)
+            elif keyframe or not subscriber.pending:
+                if text is None:
+                    text = self._encode_json(keyframe, fields)
+                subscriber.offer(text)
+            else:  # the delta it hasn't sent yet would be lost, resync it instead
+                if resync is None:
+                    resync = self._encode_json(True, snapshot)
+                subscriber.offer(resync)
+                self.resyncs += 1
+
+    def _encode_json(self, keyframe: bool, fields: dict[str, Any]) -> str:
+        self.serialized += 1
+        return encode_json(keyframe, fields)
+
+    def _encode_binary(self, snapshot: dict[str, Any]) -> bytes:
+        self.serialized += 1
+        message = self.encode_binary(self._sequence, snapshot)
+        self._sequence += 1
+        return message
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "updates": self.updates,
+            "serialized": self.serialized,
+            "resyncs": self.resyncs,
+            "delivered": sum(subscriber.delivered for subscriber in self._subscribers),
+            "dropped": sum(subscriber.dropped for subscriber in self._subscribers),
+        }
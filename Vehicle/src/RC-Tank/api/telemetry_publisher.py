@@ -0,0 +1,106 @@
+"""
+Change driven telemetry: every field has a max rate and a deadband, and a field is only
+sent when it moved past its deadband since it was last sent and its rate allows.
+Everything goes out in a periodic keyframe so clients can resync (and late joiners
+start from one).
+
+    publisher = TelemetryPublisher(read)  # read() -> {"heading": ..., "voltage": ..., ...}
+    update = publisher.poll(time.time())  # None, or (keyframe, fields to send, full snapshot)
+
+Kept free of `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import math
+from typing import Any, Callable, NamedTuple
+
+EARTH_RADIUS = 6_378_137  # m
+
+
+class FieldRule(NamedTuple):
+    max_rate: float  # Hz
+    deadband: float | None = None  # in the field's unit, None sends any change
+
+
+# Keep in sync with what api/telemetry.py reads
+FIELD_RULES = {
+    "gps": FieldRule(10, 0.05),  # m, the receiver's nav rate tops out at 10 Hz anyway
+    "heading": FieldRule(20, 0.5),  # deg
+    "position_age": FieldRule(1, 0.5),  # s, only worth sending when fixes stop coming
+    "voltage": FieldRule(1, 0.05),  # V
+    "ntrip_status": FieldRule(1),
+    "lights": FieldRule(1),
+}
+KEYFRAME_INTERVAL = 5.0  # s
+
+
+def _distance(a: dict, b: dict) -> float:
+    """m between two {"lat", "lon", "alt"}, flat earth is plenty for a deadband."""
+    north = math.radians(b["lat"] - a["lat"]) * EARTH_RADIUS
+    east = math.radians(b["lon"] - a["lon"]) * EARTH_RADIUS * math.cos(math.radians(a["lat"]))
+    return math.hypot(north, east, b.get("alt", 0) - a.get("alt", 0))
+
+
+def changed(name: str, old: Any, new: Any, deadband: float | None) -> bool:
+    if deadband is None or old is None or new is None:
+        return old != new
+    if name == "gps":
+        return _distance(old, new) > deadband
+    if name == "heading":
+        return abs((new - old + 180) % 360 - 180) > deadband
+    return abs(new - old) > deadband
+
+
+class TelemetryPublisher:
+    """
+    One per subscriber (or one for all of them, if they all get the same messages),
+    it remembers what was last sent.
+
+    Args:
+    read: returns the current value of every field
+    rules: FieldRule per field name, fields without one are only sent in keyframes
+    """
+
+    def __init__(self, read: Callable[[], dict[str, Any]], rules: dict[str, FieldRule] = FIELD_RULES,
+                 keyframe_interval: float = KEYFRAME_INTERVAL):
+        self.read = read
+        self.rules = rules
+        self.keyframe_interval = keyframe_interval
+        self.tick = 1 / max(rule.max_rate for rule in rules.values())  # s, how often poll() is worth calling
+        self._sent: dict[str, Any] = {}
+        self._sent_time: dict[str, float] = {}
+        self._last_keyframe: float | None = None
+
+        self.keyframes = 0
+        self.deltas = 0
+        self.fields_sent = 0
+
+    def request_keyframe(self):
+        self._last_keyframe = None
+
+    def poll(self, now: float) -> tuple[bool, dict[str, Any], dict[str, Any]] | None:
+        """(keyframe, fields to send, full snapshot), or None if nothing is due."""
+        snapshot = self.read()
+        if self._last_keyframe is None or now - self._last_keyframe >= self.keyframe_interval:
+            self._last_keyframe = now
+            self._sent = dict(snapshot)
+            self._sent_time = dict.fromkeys(snapshot, now)
+            self.keyframes += 1
+            self.fields_sent += len(snapshot)
+            return True, snapshot, snapshot
+
+        delta = {}
+        for name, value in snapshot.items():
+            rule = self.rules.get(name)
+            if rule is None or now - self._sent_time.get(name, 0) < 1 / rule.max_rate:
+                continue
+            if changed(name, self._sent.get(name), value, rule.deadband):
+                delta[name] = value
+                self._sent[name] = value
+                self._sent_time[name] = now
+        if not delta:
+            return None
+        self.deltas += 1
+        self.fields_sent += len(delta)
+        return False, delta, snapshot
+
+    def stats(self) -> dict[str, int]:
+        return {"keyframes": self.keyframes, "deltas": self.deltas, "fields_sent": self.fields_sent}
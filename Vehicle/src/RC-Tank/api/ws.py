@@ -1,9 +1,14 @@
 import asyncio
-from fastapi import APIRouter, WebSocket
+import json
+import time
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from core.types import MotorCommand, RTCOffer, Location
 from core import services, states
+from core.latency import ClockOffset
 from api.telemetry import send_telemetry
+from api.protocol import KIND_LIGHTS, KIND_MOTOR, SUBPROTOCOL_BINARY, ProtocolError, choose_subprotocol, decode
+from api.motor_dispatch import MotorDispatcher
 from core.config import get_logger
 
 router = APIRouter()
@@ -39,13 +44,74 @@ async def allow_insecure_page():
         """
     )
 
+def set_motor(cmd: MotorCommand, trace=None):
+    if services.motors:
+        services.motors.set_motor(cmd, trace)
+    else:
+        pass # need to raise an error here
+
+def run_in_background(tasks: set[asyncio.Task], coro, name: str):
+    """Slow requests get their own task so the receive loop is always free for motor commands"""
+    task = asyncio.create_task(coro, name=name)
+    tasks.add(task)
+    task.add_done_callback(lambda task: background_done(tasks, task))
+
+def background_done(tasks: set[asyncio.Task], task: asyncio.Task):
+    tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        websocket_logger.error(f"{task.get_name()} failed: {task.exception()!r}")
+
+async def webrtc_offer(ws: WebSocket, msg: dict):
+    params = RTCOffer(**msg["data"])
+
+    if services.webrtc: # ICE gathering can take a couple of seconds
+        await ws.send_json({"id": msg["id"], "type": "two_way_message:webrtc_offer_response", "data": await services.webrtc.offer(params.model_dump())})
+    else:
+        pass # need to raise an error here
+
+def handle_binary(data: bytes, dispatcher: MotorDispatcher, clock: ClockOffset, received: float):
+    """Motor and lights frames from the binary subprotocol, see api/protocol.py"""
+    try:
+        frame = decode(data)
+    except ProtocolError as e:
+        websocket_logger.warning(f"Dropping binary frame: {e}")
+        return
+
+    if frame.kind == KIND_MOTOR:
+        left, right = frame.data
+        trace = services.latency_tracer.start(clock.to_server(frame.timestamp), received)
+        dispatcher.submit(MotorCommand(left=left, right=right), frame.sequence, trace)
+    elif frame.kind == KIND_LIGHTS:
+        if services.lights:
+            services.lights.set_headlights(frame.data)
+    else:
+        websocket_logger.warning(f"Unexpected binary frame kind {frame.kind} from client")
+
+@router.get("/latency")
+async def latency(buckets: bool = True):
+    """Motor command latency histograms, see core/latency.py"""
+    return services.latency_tracer.stats(buckets)
+
 @router.websocket("/ws")
 async def ws(ws: WebSocket):
-    await ws.accept()
-    telemetry_sender = asyncio.create_task(send_telemetry(ws, websocket_logger))
+    subprotocol = choose_subprotocol(ws.scope.get("subprotocols", []))
+    await ws.accept(subprotocol=subprotocol)
+    binary = subprotocol == SUBPROTOCOL_BINARY
+    websocket_logger.debug(f"Client connected, {'binary' if binary else 'JSON'} protocol")
+    telemetry_sender = asyncio.create_task(send_telemetry(ws, websocket_logger, binary=binary))
+    dispatcher = MotorDispatcher(set_motor) # motor commands are handled right here, never behind anything slow
+    background: set[asyncio.Task] = set() # WebRTC offers, ICE gathering can take seconds
+    clock = ClockOffset() # this client's clock, for latency tracing
     try:
         while True:
-            msg = await ws.receive_json()
+            message = await ws.receive()
+            received = time.time()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+            if message.get("bytes") is not None: # binary subprotocol, everything else is still JSON text
+                handle_binary(message["bytes"], dispatcher, clock, received)
+                continue
+            msg = json.loads(message["text"])
             msg_type = msg.get("type")
 
             websocket_logger.debug(f"{msg_type.upper()}: {msg['data']}")
@@ -54,31 +120,32 @@ async def ws(ws: WebSocket):
                 msg_type = msg_type.split(":")[1] # now set type to the minor type. we can now treat all these messages as two way
 
                 if msg_type == "ping":
-                    await ws.send_json({"id": msg["id"], "type": "two_way_message:pong", "data": msg["data"]})
+                    data = msg["data"]
+                    if isinstance(data, dict): # newer clients sync their clock with it, see WebSocketHandler.syncClock
+                        if data.get("offset") is not None and data.get("rtt") is not None:
+                            clock.add(data["offset"], data["rtt"])
+                        data = {**data, "server_received": received, "server_sent": time.time()}
+                    await ws.send_json({"id": msg["id"], "type": "two_way_message:pong", "data": data})
+                elif msg_type == "latency":
+                    buckets = isinstance(msg["data"], dict) and bool(msg["data"].get("buckets"))
+                    await ws.send_json({"id": msg["id"], "type": "two_way_message:latency_response",
+                                        "data": {**services.latency_tracer.stats(buckets), "clock": clock.stats()}})
                 elif msg_type == "webrtc_offer_request":
-                    params = RTCOffer(**msg["data"])
-
-                    if services.webrtc:
-                        await ws.send_json({"id": msg["id"], "type": "two_way_message:webrtc_offer_response", "data": await services.webrtc.offer(params.model_dump())})
-                    else:
-                        pass # need to raise an error here
+                    run_in_background(background, webrtc_offer(ws, msg), "WebRTC offer")
 
             else:
                 msg_type = msg_type.split(":")[0]
 
                 if msg_type == "motor":
                     cmd = MotorCommand(**msg["data"]) # ** makes it unpack a dict into a typed object
-
-                    if services.motors:
-                        services.motors.set_motor(cmd)
-                    else:
-                        pass # need to raise an error here
+                    trace = services.latency_tracer.start(clock.to_server(msg.get("timestamp")), received)
+                    dispatcher.submit(cmd, msg.get("sequence"), trace) # older clients don't send either
                 elif msg_type == "lights":
                     if services.lights:
                         services.lights.set_headlights(msg["data"])
                     else:
                         pass # need to raise an error here
-                elif msg_type == "waypoint_data":
+                elif msg_type == "waypoint_data": # inline, a self_driving_mode right after it has to see the new waypoints
                     locations_new_type: list[Location] = []
                     for item in msg["data"]:
                         locations_new_type.append(Location.from_waypoint(item))
@@ -93,3 +160,6 @@ async def ws(ws: WebSocket):
     finally:
         if telemetry_sender: 
             telemetry_sender.cancel()
+        for task in background:
+            task.cancel()
+        websocket_logger.debug(f"Client disconnected, motor commands: {dispatcher.stats()}")
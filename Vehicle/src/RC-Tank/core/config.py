@@ -1,8 +1,22 @@
 import argparse
 import logging
+from api.telemetry_publisher import FIELD_RULES
 
-def _parse_flags():
-    parser = argparse.ArgumentParser()
+def _field_rate(value: str) -> tuple[str, float]:
+    """FIELD=HZ for --telemetry-rate, FIELD one of the publisher's FIELD_RULES"""
+    name, sep, rate = value.partition('=')
+    try:
+        if not name or not sep or float(rate) <= 0:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected FIELD=HZ with HZ > 0, e.g. heading=20, got {value!r}")
+    if name not in FIELD_RULES:
+        raise argparse.ArgumentTypeError(f"unknown telemetry field {name!r}, one of {', '.join(FIELD_RULES)}")
+    return name, float(rate)
+
+def build_parser(add_help: bool = False) -> argparse.ArgumentParser:
+    """The server's flags. No --help unless asked for, the scripts that import core have their own."""
+    parser = argparse.ArgumentParser(add_help=add_help)
     parser.add_argument('--motor-debug', action='store_true', help='Show motor debug logs')
     parser.add_argument('--compass-debug', action='store_true', help='Show compass debug logs')
     parser.add_argument('--gps-debug', action='store_true', help='Show gps debug logs')
@@ -10,10 +24,37 @@ def _parse_flags():
     parser.add_argument('--self_driving-debug', action='store_true', help='Show self_driving debug logs')
     parser.add_argument('--websocket-debug', action='store_true', help='Show websocket debug logs')
     parser.add_argument('--lifecycle-debug', action='store_true', help='Show lifecycle debug logs')
-    
-    return parser.parse_args()
+    parser.add_argument('--lights-debug', action='store_true', help='Show lights debug logs')
+    parser.add_argument('--motor-backend', choices=['thread', 'asyncio'], default='thread', help='Run motor I/O in its own thread or on the server event loop')
+    parser.add_argument('--motor-event-driven', action='store_true', help='Send motor frames as soon as a command changes instead of every 100 ms (always on with --motor-backend asyncio)')
+    parser.add_argument('--motor-high-baudrate', type=int, metavar='BAUD', help='Try this motor link rate first and fall back to 4800 if the ESCs do not answer (needs REMOTE_BAUD in the firmware)')
+    parser.add_argument('--gps-rate', type=int, choices=[1, 5, 10, 20], default=10, help='GNSS navigation rate in Hz')
+    parser.add_argument('--gps-record', metavar='PATH', help='Append raw receiver and RTCM bytes to this file')
+    parser.add_argument('--gps-replay', metavar='PATH', help='Replay a --gps-record file instead of using the receiver')
+    parser.add_argument('--compass-rate', type=int, choices=[10, 50, 100, 200], default=100, help='QMC5883P output data rate in Hz')
+    parser.add_argument('--compass-filter', choices=['mean', 'median'], default='mean', help='Circular filter over the last --compass-window headings')
+    parser.add_argument('--compass-window', type=int, default=5, help='Compass samples per filtered heading')
+    parser.add_argument('--compass-record', metavar='PATH', help='Append raw compass samples and motor commands/currents to this CSV')
+    parser.add_argument('--compass-online-calibration', action='store_true', help='Keep refining the compass calibration while driving')
+    parser.add_argument('--telemetry-rate', metavar='FIELD=HZ', type=_field_rate, action='append', default=[], help='Max telemetry rate for a field, e.g. heading=20, can be repeated')
+    parser.add_argument('--telemetry-keyframe', type=float, default=5.0, help='Seconds between full telemetry keyframes')
+    return parser
+
+args = build_parser().parse_known_args()[0]  # scripts and benchmarks that import drivers have their own flags
 
-args = _parse_flags()
+motor_backend = args.motor_backend
+motor_event_driven = args.motor_event_driven
+motor_high_baudrate = args.motor_high_baudrate
+gps_rate = args.gps_rate
+gps_record = args.gps_record
+gps_replay = args.gps_replay
+compass_rate = args.compass_rate
+compass_filter = args.compass_filter
+compass_window = args.compass_window
+compass_online_calibration = args.compass_online_calibration
+compass_record = args.compass_record
+telemetry_rates = dict(args.telemetry_rate)
+telemetry_keyframe = args.telemetry_keyframe
 
 debug_flags = {
     'motor': args.motor_debug,
@@ -22,7 +63,8 @@ debug_flags = {
     'webrtc': args.webrtc_debug,
     'self_driving': args.self_driving_debug,
     'websocket': args.websocket_debug,
-    'lifecycle': args.lifecycle_debug
+    'lifecycle': args.lifecycle_debug,
+    'lights': args.lights_debug
 }
 
 class ConsoleFlagFilter(logging.Filter):
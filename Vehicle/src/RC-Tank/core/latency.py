@@ -0,0 +1,186 @@
+"""
+Control latency tracing, browser input to the motor frame on the wire. Every motor
+command gets a CommandTrace stamped along the way (all time.time() on the server's
+clock):
+
+    client      the client's timestamp on the command, moved onto our clock with the
+                connection's ClockOffset (None until the client has synced)
+    received    api/ws.py got the websocket message
+    dispatched  MotorDispatcher let it through
+    set_motor   Motor.set_motor handed it to the io worker
+    written     the io worker's ser.write with it (or a newer command) returned
+
+and LatencyTracer keeps an HDR style histogram for each segment in between.
+
+Kept free of `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import threading
+import time
+from collections import deque
+
+SUB_BUCKET_BITS = 7  # 128 sub buckets per power of two, values are within 1/128 (0.8%)
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE = 60_000_000  # us, anything longer is counted as this
+
+# name: (from, to) stamp
+SEGMENTS = {
+    "network": ("client", "received"),  # one way, as good as the clock offset (+-rtt/2)
+    "dispatch": ("received", "dispatched"),  # decode, validation, stale check
+    "set_motor": ("dispatched", "set_motor"),
+    "io": ("set_motor", "written"),  # waiting for the io worker, pacing, the write itself
+    "server": ("received", "written"),
+    "total": ("client", "written"),
+}
+
+
+def _index(value: int) -> int:
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def _upper(index: int) -> int:
+    """Largest value that lands in bucket index."""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index - shift * SUB_BUCKETS + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    Log-linear buckets like HdrHistogram: exact below 256 us, 2 significant digits above,
+    fixed memory however many samples, up to a minute. Thread safe, the io worker
+    records while the event loop reads.
+    """
+
+    def __init__(self):
+        self._counts = [0] * (_index(MAX_VALUE) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0  # us
+        self.min = MAX_VALUE
+        self.max = 0
+        self.clamped = 0  # below 0 (clock offset error on "network") or above MAX_VALUE
+
+    def record(self, seconds: float):
+        value = int(seconds * 1e6)
+        with self._lock:
+            if not 0 <= value <= MAX_VALUE:
+                self.clamped += 1
+                value = min(max(value, 0), MAX_VALUE)
+            self._counts[_index(value)] += 1
+            self.count += 1
+            self.total += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        """ms, the upper end of the bucket the p-th (0 to 100) percentile sample is in."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, round(p / 100 * self.count))
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= rank:
+                    return min(_upper(index), self.max) / 1000
+        return self.max / 1000
+
+    def buckets(self) -> list[tuple[float, int]]:
+        """(upper end in ms, count) of every bucket with samples in it."""
+        with self._lock:
+            return [(_upper(index) / 1000, count) for index, count in enumerate(self._counts) if count]
+
+    def stats(self, buckets: bool = False) -> dict:
+        """In ms."""
+        if not self.count:
+            return {"count": 0}
+        stats = {
+            "count": self.count,
+            "min": self.min / 1000,
+            "mean": self.total / self.count / 1000,
+            **{f"p{p:g}": self.percentile(p) for p in (50, 90, 99, 99.9)},
+            "max": self.max / 1000,
+            "clamped": self.clamped,
+        }
+        if buckets:
+            stats["buckets"] = self.buckets()
+        return stats
+
+
+class ClockOffset:
+    """
+    Server clock minus client clock, from the offsets and round trips the client
+    measured over `two_way_message:ping` (NTP style, see WebSocketHandler.syncClock).
+    Of the last `window` samples the one with the shortest round trip wins, its error
+    is at most half of it.
+    """
+
+    def __init__(self, window: int = 8):
+        self._samples: deque[tuple[float, float]] = deque(maxlen=window)  # (rtt, offset), s
+
+    def add(self, offset: float, rtt: float):
+        if rtt >= 0:
+            self._samples.append((rtt, offset))
+
+    @property
+    def rtt(self) -> float | None:
+        return min(self._samples)[0] if self._samples else None
+
+    @property
+    def offset(self) -> float | None:
+        return min(self._samples)[1] if self._samples else None
+
+    def to_server(self, client_time: float | None) -> float | None:
+        offset = self.offset
+        return None if offset is None or client_time is None else client_time + offset
+
+    def stats(self) -> dict:
+        return {"offset_ms": None if self.offset is None else self.offset * 1000,
+                "rtt_ms": None if self.rtt is None else self.rtt * 1000,
+                "samples": len(self._samples)}
+
+
+class CommandTrace:
+    __slots__ = ("tracer", "client", "received", "dispatched", "set_motor")
+
+    def __init__(self, tracer: "LatencyTracer", client: float | None, received: float):
+        self.tracer = tracer
+        self.client = client
+        self.received = received
+        self.dispatched: float | None = None
+        self.set_motor: float | None = None
+
+    def finish(self, written: float):
+        self.tracer.record(self, written)
+
+
+class LatencyTracer:
+    def __init__(self):
+        self.histograms = {name: LatencyHistogram() for name in SEGMENTS}
+        self.started = 0
+        self.finished = 0
+
+    def start(self, client: float | None, received: float | None = None) -> CommandTrace:
+        """client: the command's timestamp already on the server's clock, or None."""
+        self.started += 1
+        return CommandTrace(self, client, time.time() if received is None else received)
+
+    def record(self, trace: CommandTrace, written: float):
+        self.finished += 1
+        stamps = {"client": trace.client, "received": trace.received, "dispatched": trace.dispatched,
+                  "set_motor": trace.set_motor, "written": written}
+        for name, (start, end) in SEGMENTS.items():
+            if stamps[start] is not None and stamps[end] is not None:
+                self.histograms[name].record(stamps[end] - stamps[start])
+
+    def stats(self, buckets: bool = False) -> dict:
+        """Per segment latency in ms. Commands that were superseded before the io worker wrote them finish with the write of the newer one."""
+        return {
+            "started": self.started,
+            "finished": self.finished,
+            "segments": {name: histogram.stats(buckets) for name, histogram in self.histograms.items()},
+        }
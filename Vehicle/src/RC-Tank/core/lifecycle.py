@@ -4,12 +4,14 @@ from fastapi import FastAPI
 from .services import motors, webrtc, lights, gps
 from . import services
 from drivers.motor import Motor
+from drivers.async_motor import AsyncMotor
 from drivers.lights import Lights
 from drivers.gps import GPS
 from drivers.webrtc import WebRTCManager
 from drivers.compass import Compass
 from self_driving.self_driving import SelfDrivingManager
-from core.config import get_logger
+from self_driving.pose_estimator import PoseEstimator
+from core.config import get_logger, motor_backend, motor_event_driven, motor_high_baudrate, gps_rate, gps_record, gps_replay, compass_rate, compass_filter, compass_window, compass_online_calibration, compass_record
 from time import time
 
 lifecycle_logger = get_logger("lifecycle")
@@ -21,8 +23,9 @@ def initialize_components():
 
     lifecycle_logger.warning("Initializing Motor...")
     try:
-        services.motors = Motor()
-        lifecycle_logger.warning("Motor initialized")
+        motor_options = {"event_driven": motor_event_driven, "high_baudrate": motor_high_baudrate}
+        services.motors = AsyncMotor(**motor_options) if motor_backend == "asyncio" else Motor(**motor_options)
+        lifecycle_logger.warning(f"Motor initialized ({motor_backend} backend, {services.motors.BAUDRATE} baud{', event driven' if services.motors.EVENT_DRIVEN else ''})")
     except Exception as e:
         services.motors = None
         lifecycle_logger.warning(f"Motor init failed: {e}")
@@ -48,8 +51,8 @@ def initialize_components():
 
     lifecycle_logger.warning("Initializing GPS...")
     try:
-        services.gps = GPS()
-        lifecycle_logger.warning("GPS initialized")
+        services.gps = GPS(nav_rate=gps_rate, record=gps_record, replay=gps_replay)
+        lifecycle_logger.warning(f"GPS initialized ({gps_rate} Hz{', replaying ' + gps_replay if gps_replay else ''})")
     except Exception as e:
         services.gps = None
         lifecycle_logger.warning(f"GPS init failed: {e}")
@@ -57,13 +60,23 @@ def initialize_components():
     
     lifecycle_logger.warning("Initializing Compass...")
     try:
-        services.compass = Compass()
-        lifecycle_logger.warning("Compass initialized")
+        services.compass = Compass(odr=compass_rate, filter_method=compass_filter, filter_window=compass_window,
+                                   online_calibration=compass_online_calibration, motors=services.motors, record=compass_record)
+        lifecycle_logger.warning(f"Compass initialized ({compass_rate} Hz, {compass_filter} of {compass_window})")
     except Exception as e:
         services.compass = None
         lifecycle_logger.warning(f"Compass init failed: {e}")
         traceback.print_exc()
     
+    lifecycle_logger.warning("Initializing PoseEstimator...")
+    try:
+        services.pose_estimator = PoseEstimator(gps=services.gps, motors=services.motors)
+        lifecycle_logger.warning("PoseEstimator initialized")
+    except Exception as e:
+        services.pose_estimator = None
+        lifecycle_logger.warning(f"PoseEstimator init failed: {e}")
+        traceback.print_exc()
+
     lifecycle_logger.warning("Initializing SelfDrivingManager...")
     try:
         services.self_driving_manager = SelfDrivingManager()
@@ -76,14 +89,22 @@ def initialize_components():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     initialize_components()
+    if isinstance(services.motors, AsyncMotor): services.motors.start()
     if services.lights: services.lights.side_on()
     if services.gps:
         threading.Thread(target=services.gps.update_gps_thread, daemon=True).start()
     if services.compass:
         threading.Thread(target=services.compass.update_compass_thread, daemon=True).start()
+    if services.pose_estimator:
+        threading.Thread(target=services.pose_estimator.update_pose_thread, daemon=True).start()
     if services.self_driving_manager: services.self_driving_manager.start()
     yield # shutdown
     if services.self_driving_manager: services.self_driving_manager.stop()
+    if services.pose_estimator: services.pose_estimator.stop()
     if services.webrtc: await services.webrtc.cleanup()
     if services.motors: services.motors.cleanup()
-    if services.lights: services.lights.off()
\ No newline at end of file
+    if services.gps: services.gps.cleanup()
+    if services.compass: services.compass.stop()
+    if services.lights:
+        services.lights.stop()
+        services.lights.off()
\ No newline at end of file
@@ -4,10 +4,14 @@ from drivers.gps import GPS
 from drivers.webrtc import WebRTCManager
 from drivers.compass import Compass
 from self_driving.self_driving import SelfDrivingManager
+from self_driving.pose_estimator import PoseEstimator
+from core.latency import LatencyTracer
 
 motors: Motor | None = None
 webrtc: WebRTCManager | None = None
 lights: Lights | None = None
 gps: GPS | None = None
 compass: Compass | None = None
-self_driving_manager: SelfDrivingManager | None = None
\ No newline at end of file
+self_driving_manager: SelfDrivingManager | None = None
+pose_estimator: PoseEstimator | None = None
+latency_tracer: LatencyTracer = LatencyTracer() # motor command latency, browser to serial write
@@ -1,4 +1,4 @@
-from core.types import WaypointLocation, Location
+from core.types import WaypointLocation, Location, Pose
 from typing import Any
 
 waypoint_locations: list[Location] = []
@@ -6,8 +6,20 @@ waypoint_locations: list[Location] = []
 gps_location: Location = Location(lat=0, lon=0, alt=0) 
 """alt should be in meters"""
 
+gps_fix_time: float = 0
+"""time.time() of the navigation epoch gps_location was measured at, 0 before the first fix"""
+
 ntrip_status: dict[str, Any] = {}
 
 heading: float = 0
 
+heading_time: float = 0
+"""time.time() heading was read at, 0 before the first compass reading"""
+
+heading_variance: float = 0
+"""deg^2, spread of the compass samples heading was filtered from"""
+
+pose: Pose | None = None
+"""fused position and heading from the pose estimator, None until the first GNSS fix"""
+
 self_driving_mode: int = 0 # 0 = off, 1 = waypoint mode, 2 = ML testing
\ No newline at end of file
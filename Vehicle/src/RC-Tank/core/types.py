@@ -12,6 +12,16 @@ class MotorCommand(BaseModel):
     left: float
     right: float
 
+class Pose(BaseModel):
+    timestamp: float  # time.time() the pose was predicted to
+    lat: float
+    lon: float
+    heading: float  # deg, clockwise from north like states.heading
+    speed: float  # m/s
+    yaw_rate: float  # deg/s
+    covariance: list[list[float]]  # of east m, north m, heading rad, speed m/s, yaw rate rad/s
+    gnss_time: float | None = None  # fix time of the last GNSS fix fused, dead reckoning since
+
 class Location(BaseModel):
     lat: float
     lon: float
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+import serial  # type: ignore
+from core.config import get_logger
+from core.latency import CommandTrace
+from core.types import MotorCommand
+from drivers.motor import Motor
+
+motor = get_logger("motor")
+
+
+class AsyncMotor(Motor):
+    """
+    Motor backend that runs as a task on the FastAPI event loop instead of its own thread.
+    Feedback is read through `add_reader` on the serial fd. The task waits on a bare
+    future that `set_motor` resolves, or a `call_later` keep-alive after SEND_INTERVAL,
+    so no thread has to be woken up.
+
+    The motor state is only touched on the event loop: `set_motor` on the loop (the
+    websocket) applies the command directly, without the state lock, and `set_motor`
+    from another thread (WaypointNavigation) is handed over with `call_soon_threadsafe`.
+
+    Same frames, pacing and 2 s deadman as `Motor`. Always event driven.
+    Call `start()` from inside the running loop (see `lifespan`).
+    """
+
+    def __init__(self, **kwargs):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._wake_future: asyncio.Future | None = None  # resolved by set_motor or the keep-alive timer
+        kwargs["event_driven"] = True
+        super().__init__(**kwargs)
+        self.ser.timeout = 0  # only read what add_reader says is there
+
+    def _start_io(self):
+        pass  # the loop isn't running yet, `start()` creates the task
+
+    def start(self) -> asyncio.Task:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._task = self._loop.create_task(self.run())
+        return self._task
+
+    def _wake_up(self):
+        if self._wake_future is not None and not self._wake_future.done():
+            self._wake_future.set_result(None)
+
+    def _notify_io(self):
+        if self._loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._wake_up()
+        else:
+            # stop() from another thread
+            self._loop.call_soon_threadsafe(self._wake_up)
+
+    def set_motor(self, command: MotorCommand, trace: CommandTrace | None = None):
+        left_speed, right_speed = self._speeds(command)
+        if self._loop is not None and threading.get_ident() != self._loop_thread:
+            self._loop.call_soon_threadsafe(self._apply, left_speed, right_speed, trace)
+            return {"status": "ok", "left": self.applied_left, "right": self.applied_right, 'voltage': self.voltage}
+        return self._apply(left_speed, right_speed, trace)
+
+    def _on_readable(self):
+        try:
+            feedback = self.read_feedback()
+            if feedback:
+                self.handle_feedback(feedback)
+        except serial.SerialException:
+            self._set_safe_stopped_state()
+
+    async def run(self):
+        assert self._loop is not None
+        fd = self.ser.fileno()
+        self._loop.add_reader(fd, self._on_readable)
+        try:
+            while not self._stop_event.is_set():
+                self._io_step()
+
+                # A bare future plus call_later wakes in one loop iteration, wait_for() would add a task per pass
+                self._wake_future = self._loop.create_future()
+                if self._pending_command_time is None:
+                    keep_alive = self._loop.call_later(self.SEND_INTERVAL, self._wake_up)  # keep-alive if nothing changes
+                    await self._wake_future
+                    keep_alive.cancel()
+                self._wake_future = None
+
+                # Same pacing as the threaded backend: never queue frames faster than the link
+                gap = self._pair_wire_time - (time.time() - self._last_send_time)
+                if gap > 0:
+                    await asyncio.sleep(gap)
+        finally:
+            if self.ser.is_open:
+                self._loop.remove_reader(fd)
+                self._send_stop()
+            self._set_safe_stopped_state()
+
+    def stop(self):
+        """Request the I/O task to exit. It sends the stop frames on its way out."""
+        self._stop_event.set()
+        with self._state_lock:
+            self._notify_io()
+
+    def cleanup(self):
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+        if self.ser and self.ser.is_open:
+            if self._loop:
+                self._loop.remove_reader(self.ser.fileno())
+            self._send_stop()
+            self._set_safe_stopped_state()
+            self.ser.close()
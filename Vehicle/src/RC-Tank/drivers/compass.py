@@ -1,46 +1,147 @@
 import board #type:ignore
 import adafruit_qmc5883p #type:ignore
-import math
+import threading
+import time
 from core import states
-from time import sleep
 from core.config import get_logger
+from core.types import MotorCommand
+from drivers.compass_calibration import (
+    CALIBRATION_FILE, DEFAULT_CALIBRATION, INTERFERENCE_FILE, RECORD_COLUMNS, Calibration, OnlineCalibrator,
+    fit_calibration, load_calibration, load_interference,
+)
+from drivers.qmc5883p import BurstSampler, HeadingFilter
 
 compass = get_logger("compass")
 
 class Compass:
-    def __init__(self):
+    def __init__(self, odr: int = 100, filter_method: str = "mean", filter_window: int = 5,
+                 calibration_path=CALIBRATION_FILE, online_calibration: bool = False,
+                 motors=None, interference_path=INTERFERENCE_FILE, record: str | None = None):
+        """
+        odr: QMC5883P output data rate in Hz, update_compass_thread publishes every sample
+        filter_method: "mean" or "median", circular, over the last `filter_window` samples
+        calibration_path: written by scripts/calibrate_compass.py, the old hand tuned values if missing
+        online_calibration: keep refining the hard/soft-iron fit from normal driving
+        motors: Motor to read commands and currents from for the interference compensation
+        interference_path: written by scripts/fit_compass_interference.py, no compensation if missing
+        record: append raw samples and motor features to this CSV, for fitting the interference model
+        """
         self.i2c = board.I2C()
         self.sensor = adafruit_qmc5883p.QMC5883P(self.i2c)
-        self.OFFSET_X = -0.198
-        self.OFFSET_Y = 0.013
-        self.SCALE_X = 0.84
-        self.SCALE_Y = 0.73
+
+        try:
+            self.calibration = load_calibration(calibration_path) or DEFAULT_CALIBRATION
+        except (ValueError, KeyError, TypeError) as e:
+            compass.warning(f"Ignoring compass calibration: {e}")
+            self.calibration = DEFAULT_CALIBRATION
+        compass.debug(f"Compass calibration: {self.calibration.method}, residual {self.calibration.residual}")
+        self.online_calibrator = OnlineCalibrator(self.calibration, self._set_calibration) if online_calibration else None
+
+        self.motors = motors
+        try:
+            self.interference = load_interference(interference_path)
+        except (ValueError, KeyError, TypeError) as e:
+            compass.warning(f"Ignoring compass interference model: {e}")
+            self.interference = None
+        if self.interference and not motors:
+            compass.warning("Compass interference model needs the motors, not compensating")
+
+        self._record = None
+        if record:
+            self._record = open(record, "a", buffering=1)  # line buffered, a crash loses at most the last sample
+            if self._record.tell() == 0:
+                self._record.write(",".join(RECORD_COLUMNS) + "\n")
+
+        self.sampler = BurstSampler(self.sensor.i2c_device, odr=odr)
+        self.heading_filter = HeadingFilter(window=filter_window, method=filter_method)
+        self._stop_event = threading.Event()
         compass.debug("Compass initialized")
-    
+
+    def stop(self):
+        """Ask update_compass_thread to return, it closes the recording on its way out."""
+        self._stop_event.set()
+
+    def _set_calibration(self, calibration: Calibration):
+        self.calibration = calibration  # one assignment, the compass thread picks it up on the next sample
+        compass.debug(f"Online compass calibration updated, offset {calibration.offset[:2]}, residual {calibration.residual:.4f}")
+
+    def motor_features(self) -> tuple[float, float, float, float]:
+        """compass_calibration.MOTOR_FEATURES: commands as sent to the ESCs and feedback current in A, per side."""
+        motors = self.motors
+        left = motors.feedback.get(0)
+        right = motors.feedback.get(1)
+        return (motors.applied_left, motors.applied_right,
+                left.current if left else 0.0, right.current if right else 0.0)
+
+    def compensate(self, x: float, y: float, z: float) -> tuple[float, float, float]:
+        """Take out the field the motors add right now, if there is an interference model."""
+        if not self.interference or not self.motors:
+            return x, y, z
+        dx, dy, dz = self.interference.offset(self.motor_features())
+        return x - dx, y - dy, z - dz
+
+    def heading_from_field(self, raw_x: float, raw_y: float, raw_z: float = 0.0) -> float:
+        return self.calibration.heading(raw_x, raw_y, raw_z)
+
     def read_compass(self):
-        raw_x, raw_y, raw_z = self.sensor.magnetic
-    
-        # Apply calibration
-        cal_x = (raw_x - self.OFFSET_X) * self.SCALE_X
-        cal_y = (raw_y - self.OFFSET_Y) * self.SCALE_Y
-        
-        # Calculate angle in radians, then convert to degrees
-        heading = math.atan2(cal_x, cal_y) * (180 / math.pi)
-        
-        heading = heading-26.75-93  # that is the magnetic difference for boston and offset of how the compass is placed
-
-        # Ensure heading is 0-360
-        if heading < 0:
-            heading += 360
-        elif heading > 360:
-            heading -= 360
+        raw_x, raw_y, raw_z = self.compensate(*self.sensor.magnetic)
+        heading = self.heading_from_field(raw_x, raw_y, raw_z)
 
         compass.debug(f"Read compass: {heading}°")
 
         return heading
 
     def update_compass_thread(self):
-        while True:
-            states.heading = self.read_compass()
+        """Publish every new sample, filtered, as soon as the chip has it."""
+        self.sampler.configure()
+        try:
+            self._read_samples()
+        finally:
+            if self._record:
+                self._record.close()
+                self._record = None
+
+    def _read_samples(self):
+        while not self._stop_event.is_set():
+            sample = self.sampler.read()
+            if sample is None:
+                compass.warning("Compass data not ready, reconfiguring")
+                self.sampler.configure()
+                time.sleep(.05)
+                continue
+
+            if self._record and self.motors:
+                self._record.write(f"{sample.timestamp:.4f},{sample.x:.5f},{sample.y:.5f},{sample.z:.5f},"
+                                   f"{','.join(str(f) for f in self.motor_features())}\n")
+            x, y, z = self.compensate(sample.x, sample.y, sample.z)
+            if self.online_calibrator:
+                self.online_calibrator.add(x, y, z)
+            heading, variance = self.heading_filter.add(self.heading_from_field(x, y, z))
+            states.heading = heading
+            states.heading_variance = variance
+            states.heading_time = sample.timestamp
 
-            sleep(.05)
\ No newline at end of file
+    def calibrate(self, duration: float = 30.0, motors=None, speed: int = 200) -> Calibration:
+        """
+        Collect samples for `duration` s while the tank spins in place (or while
+        someone turns it by hand if `motors` is None) and fit a new calibration.
+        Don't run it while update_compass_thread is running.
+        """
+        self.sampler.configure()
+        samples = []
+        last_command = 0.0
+        try:
+            end = time.time() + duration
+            while time.time() < end:
+                if motors and time.time() - last_command > 0.2:  # keep refreshing it like the joystick does
+                    motors.set_motor(MotorCommand(left=speed, right=-speed))
+                    last_command = time.time()
+                sample = self.sampler.read()
+                if sample:
+                    samples.append((sample.x, sample.y, sample.z))
+        finally:
+            if motors:
+                motors.set_motor(MotorCommand(left=1234_0000, right=1234_0000))
+        calibration = fit_calibration(samples, heading_offset=self.calibration.heading_offset)
+        compass.debug(f"Compass calibrated from {len(samples)} samples ({calibration.method}), residual {calibration.residual:.4f}")
+        return calibration
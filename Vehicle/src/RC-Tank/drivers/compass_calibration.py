@@ -0,0 +1,277 @@
+"""
+Hard/soft-iron calibration for the compass: least squares ellipse (spinning in place)
+or ellipsoid (tilted around as well) fits, the versioned calibration file, and an
+online refiner that refits from normal driving. Also the motor interference model,
+the field offset the motors and battery leads add as a linear function of the
+applied commands and ESC currents.
+
+    calibration = fit_calibration(samples)  # (N, 3) gauss
+    save_calibration(calibration)
+    x, y, z = calibration.apply(raw)
+
+Kept free of `board` and `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import json
+import math
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+import numpy as np
+
+CALIBRATION_VERSION = 1
+CALIBRATION_FILE = Path(__file__).resolve().parents[3] / "config" / "compass_calibration.json"
+
+INTERFERENCE_VERSION = 1
+INTERFERENCE_FILE = Path(__file__).resolve().parents[3] / "config" / "compass_interference.json"
+MOTOR_FEATURES = ("applied_left", "applied_right", "current_left", "current_right")  # see Compass.motor_features
+RECORD_COLUMNS = ("time", "x", "y", "z") + MOTOR_FEATURES  # --compass-record CSV, read by scripts/fit_compass_interference.py
+
+
+class Calibration(NamedTuple):
+    offset: tuple[float, float, float]  # hard iron, gauss
+    matrix: tuple[tuple[float, float, float], ...]  # soft iron, 3x3, applied after the offset
+    heading_offset: float = -26.75 - 93  # deg, Boston declination and how the compass is mounted
+    method: str = "manual"  # ellipse, ellipsoid, online or manual
+    samples: int = 0
+    residual: float | None = None  # RMS of |field| / mean |field| - 1 after calibration
+    created: float | None = None  # time.time()
+
+    def apply(self, raw) -> np.ndarray:
+        """(..., 3) raw gauss to calibrated gauss."""
+        return (np.asarray(raw, dtype=float) - np.asarray(self.offset)) @ np.asarray(self.matrix).T
+
+    def heading(self, x: float, y: float, z: float = 0.0) -> float:
+        """Same math as apply, without NumPy, for every sample on the compass thread."""
+        (m00, m01, m02), (m10, m11, m12) = self.matrix[0], self.matrix[1]
+        dx, dy, dz = x - self.offset[0], y - self.offset[1], z - self.offset[2]
+        cal_x = m00 * dx + m01 * dy + m02 * dz
+        cal_y = m10 * dx + m11 * dy + m12 * dz
+        return (math.degrees(math.atan2(cal_x, cal_y)) + self.heading_offset) % 360
+
+
+# The hand tuned values Compass used before there was a calibration file
+DEFAULT_CALIBRATION = Calibration(offset=(-0.198, 0.013, 0.0), matrix=((0.84, 0, 0), (0, 0.73, 0), (0, 0, 1)))
+
+
+def _symmetric_sqrt(matrix: np.ndarray) -> np.ndarray:
+    values, vectors = np.linalg.eigh(matrix)
+    if np.any(values <= 0):
+        raise ValueError("samples don't lie on an ellipse, fit is not positive definite")
+    return vectors @ np.diag(np.sqrt(values)) @ vectors.T
+
+
+def _spread(samples: np.ndarray, calibration: Calibration, axes: int = 3) -> np.ndarray:
+    """Per sample squared deviation of the calibrated |field| from its mean, `residual` is the RMS of it."""
+    magnitudes = np.linalg.norm(calibration.apply(samples)[:, :axes], axis=1)
+    return (magnitudes / magnitudes.mean() - 1) ** 2
+
+
+def residual(samples: np.ndarray, calibration: Calibration, axes: int = 3) -> float:
+    return float(np.sqrt(np.mean(_spread(samples, calibration, axes))))
+
+
+def fit_ellipse(samples: np.ndarray) -> Calibration:
+    """
+    x/y only, for spinning in place: fits A x^2 + B xy + C y^2 + D x + E y = 1, so the
+    soft-iron cross term is included. z is passed through uncorrected.
+    """
+    samples = np.asarray(samples, dtype=float)
+    x, y = samples[:, 0], samples[:, 1]
+    design = np.column_stack((x * x, x * y, y * y, x, y))
+    (a, b, c, d, e), *_ = np.linalg.lstsq(design, np.ones(len(x)), rcond=None)
+
+    quadric = np.array(((a, b / 2), (b / 2, c)))
+    center = -0.5 * np.linalg.solve(quadric, (d, e))
+    scale = 1 + center @ quadric @ center
+    shape = quadric / scale  # (p - center)^T shape (p - center) = 1
+    radius = np.linalg.det(shape) ** -0.25  # geometric mean of the semi-axes, keeps gauss
+    soft_iron = _symmetric_sqrt(shape) * radius
+
+    matrix = np.eye(3)
+    matrix[:2, :2] = soft_iron
+    calibration = Calibration(
+        offset=(float(center[0]), float(center[1]), 0.0),
+        matrix=tuple(tuple(float(v) for v in row) for row in matrix),
+        method="ellipse",
+        samples=len(samples),
+        created=time.time(),
+    )
+    return calibration._replace(residual=residual(samples, calibration, axes=2))
+
+
+def fit_ellipsoid(samples: np.ndarray) -> Calibration:
+    """Full 3D fit with all soft-iron cross terms, needs samples from many orientations, not just yaw."""
+    samples = np.asarray(samples, dtype=float)
+    x, y, z = samples[:, 0], samples[:, 1], samples[:, 2]
+    design = np.column_stack((x * x, y * y, z * z, 2 * x * y, 2 * x * z, 2 * y * z, 2 * x, 2 * y, 2 * z))
+    (a, b, c, d, e, f, g, h, i), *_ = np.linalg.lstsq(design, np.ones(len(x)), rcond=None)
+
+    quadric = np.array(((a, d, e), (d, b, f), (e, f, c)))
+    center = -np.linalg.solve(quadric, (g, h, i))
+    scale = 1 + center @ quadric @ center
+    shape = quadric / scale
+    radius = np.linalg.det(shape) ** (-1 / 6)
+    soft_iron = _symmetric_sqrt(shape) * radius
+
+    calibration = Calibration(
+        offset=tuple(float(v) for v in center),
+        matrix=tuple(tuple(float(v) for v in row) for row in soft_iron),
+        method="ellipsoid",
+        samples=len(samples),
+        created=time.time(),
+    )
+    return calibration._replace(residual=residual(samples, calibration))
+
+
+def fit_calibration(samples: np.ndarray, heading_offset: float = DEFAULT_CALIBRATION.heading_offset) -> Calibration:
+    """Ellipsoid when the samples cover enough of the sphere, otherwise the x/y ellipse."""
+    samples = np.asarray(samples, dtype=float)
+    if len(samples) < 10:
+        raise ValueError(f"{len(samples)} samples is not enough for a calibration")
+    spread = np.linalg.svd(samples - samples.mean(axis=0), compute_uv=False)
+    if spread[2] > 0.3 * spread[0]:
+        return fit_ellipsoid(samples)._replace(heading_offset=heading_offset)
+    return fit_ellipse(samples)._replace(heading_offset=heading_offset)
+
+
+def _save(path: Path | str, version: int, data: dict):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps({"version": version, **data}, indent=2))
+    temporary.replace(path)  # never leave a half written file for the next startup
+
+
+def _load(path: Path | str, version: int) -> dict | None:
+    path = Path(path)
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text())
+    found = data.pop("version", None)
+    if found != version:
+        raise ValueError(f"{path} is version {found}, expected {version}")
+    return data
+
+
+def save_calibration(calibration: Calibration, path: Path | str = CALIBRATION_FILE):
+    _save(path, CALIBRATION_VERSION, calibration._asdict())
+
+
+def load_calibration(path: Path | str = CALIBRATION_FILE) -> Calibration | None:
+    """None if there is no file, ValueError if it is from another version or broken."""
+    data = _load(path, CALIBRATION_VERSION)
+    if data is None:
+        return None
+    data["offset"] = tuple(data["offset"])
+    data["matrix"] = tuple(tuple(row) for row in data["matrix"])
+    return Calibration(**data)
+
+
+class InterferenceModel(NamedTuple):
+    coefficients: tuple[tuple[float, ...], ...]  # 3 x MOTOR_FEATURES, gauss per unit of each feature
+    features: tuple[str, ...] = MOTOR_FEATURES
+    samples: int = 0
+    heading_error_before: float | None = None  # deg RMS on the held out part of the log
+    heading_error_after: float | None = None
+    created: float | None = None
+
+    def offset(self, features) -> tuple[float, float, float]:
+        """Field the motors add at these feature values, gauss. Plain Python, runs for every sample."""
+        return tuple(sum(c * f for c, f in zip(row, features)) for row in self.coefficients)  # type: ignore
+
+
+def fit_interference(raw: np.ndarray, features: np.ndarray, baseline: np.ndarray) -> InterferenceModel:
+    """
+    Least squares fit of raw - baseline = features @ coefficients.T, where baseline is the
+    field with the motors off (no intercept, so zero current means zero correction).
+    """
+    coefficients, *_ = np.linalg.lstsq(np.asarray(features, dtype=float), np.asarray(raw, dtype=float) - baseline, rcond=None)
+    return InterferenceModel(
+        coefficients=tuple(tuple(float(v) for v in row) for row in coefficients.T),
+        samples=len(raw),
+        created=time.time(),
+    )
+
+
+def save_interference(model: InterferenceModel, path: Path | str = INTERFERENCE_FILE):
+    _save(path, INTERFERENCE_VERSION, model._asdict())
+
+
+def load_interference(path: Path | str = INTERFERENCE_FILE) -> InterferenceModel | None:
+    """None if there is no file, ValueError if it is from another version or for other features."""
+    data = _load(path, INTERFERENCE_VERSION)
+    if data is None:
+        return None
+    data["coefficients"] = tuple(tuple(row) for row in data["coefficients"])
+    data["features"] = tuple(data["features"])
+    if data["features"] != MOTOR_FEATURES:
+        raise ValueError(f"{path} is for features {data['features']}, expected {MOTOR_FEATURES}")
+    return InterferenceModel(**data)
+
+
+class OnlineCalibrator:
+    """
+    Refines the x/y ellipse from normal driving. `add` only drops the sample into one of
+    `sectors` heading bins (so a long straight line doesn't swamp the fit), the fit
+    runs on its own thread once every sector has samples, and the result replaces the
+    current calibration only if it fits held-out samples clearly better: every other
+    sample is held out of the fit (least squares always fits its own samples better
+    than the current calibration does), and the candidate has to narrow the spread of
+    the calibrated |field| on them by more than twice its standard error, so noise
+    alone doesn't move the calibration.
+
+    Args:
+    on_update: called with the new Calibration, from the fit thread
+    """
+
+    def __init__(self, calibration: Calibration, on_update, sectors: int = 24, per_sector: int = 20,
+                 min_interval: float = 60.0, max_offset_change: float = 0.1):
+        self.calibration = calibration
+        self.on_update = on_update
+        self.sectors = sectors
+        self.per_sector = per_sector
+        self.min_interval = min_interval  # s between fits
+        self.max_offset_change = max_offset_change  # gauss, bigger jumps are more likely a magnet nearby than drift
+        self._bins: list[list[tuple[float, float, float]]] = [[] for _ in range(sectors)]
+        self._lock = threading.Lock()
+        self._fitting = False
+        self._last_fit = 0.0
+        self.fits = 0
+        self.updates = 0
+
+    def add(self, x: float, y: float, z: float):
+        """Called from the compass thread for every sample, cheap."""
+        angle = math.atan2(x - self.calibration.offset[0], y - self.calibration.offset[1])
+        sector = int((angle + math.pi) / (2 * math.pi) * self.sectors) % self.sectors
+        with self._lock:
+            samples = self._bins[sector]
+            if len(samples) >= self.per_sector:
+                samples.pop(0)
+            samples.append((x, y, z))
+            ready = not self._fitting and all(self._bins) and time.time() - self._last_fit > self.min_interval
+            if ready:
+                self._fitting = True
+                batch = [sample for samples in self._bins for sample in samples]
+        if ready:
+            threading.Thread(target=self._fit, args=(batch,), daemon=True).start()
+
+    def _fit(self, batch: list[tuple[float, float, float]]):
+        try:
+            samples = np.array(batch)  # sector by sector, so both halves go all the way around
+            fit, held_out = samples[0::2], samples[1::2]
+            candidate = fit_ellipse(fit)._replace(heading_offset=self.calibration.heading_offset)
+            self.fits += 1
+            gain = _spread(held_out, self.calibration, axes=2) - _spread(held_out, candidate, axes=2)
+            better = gain.mean() > 2 * gain.std(ddof=1) / math.sqrt(len(gain))
+            moved = math.dist(candidate.offset[:2], self.calibration.offset[:2])
+            if better and moved < self.max_offset_change:
+                self.calibration = candidate._replace(method="online")
+                self.updates += 1
+                self.on_update(self.calibration)
+        except (ValueError, np.linalg.LinAlgError):
+            pass  # not enough of a circle yet
+        finally:
+            with self._lock:
+                self._fitting = False
+                self._last_fit = time.time()
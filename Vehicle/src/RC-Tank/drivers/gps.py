@@ -1,29 +1,46 @@
 import time
+import threading
+import mmap
+import struct
+from collections import deque
+from contextlib import contextmanager
 from core.types import Location
 from core import states
 from core.config import get_logger
-import os
-from queue import Queue, Empty
+from queue import Empty, Queue
 from dotenv import load_dotenv
-from serial import Serial
-from pygnssutils import GNSSNTRIPClient, GNSSReader
+from serial import Serial, SerialException
+from pygnssutils import GNSSReader
 from pyubx2 import UBXMessage
+from drivers.ubx import FastGNSSReader, epoch_time
+from drivers.ntrip import Caster, NTRIPSession
 
 load_dotenv()
 
 PORT = "/dev/ttyACM0"
 BAUD = 38400
 
+# Navigation solutions per second (CFG-RATE). WaypointNavigation steers every 10 ms, so 1 Hz is too slow.
+# 20 Hz is the ZED-F9P's RTK limit and may drop constellations, 10 Hz is the safe default.
+NAV_RATES = (1, 5, 10, 20)
+NAV_RATE = 10
+
 # MaCORS
-# NTRIP_SERVER = "macorsrtk.massdot.state.ma.us"
-# NTRIP_PORT = 10000
-# NTRIP_MOUNT = "RTCM3MSM_IMAX"
+MACORS_SERVER = "macorsrtk.massdot.state.ma.us"
+MACORS_PORT = 10000
+MACORS_MOUNT = "RTCM3MSM_IMAX"
 
 # RTKdata
 NTRIP_SERVER = "rtk.rtkdata.com"
 NTRIP_PORT = 2101
 NTRIP_MOUNT = "AUTO"
 
+# Tried in order, the session moves on to the next one when a caster keeps failing
+CASTERS = [
+    Caster(NTRIP_SERVER, NTRIP_PORT, NTRIP_MOUNT),
+    Caster(MACORS_SERVER, MACORS_PORT, MACORS_MOUNT),
+]
+
 # generic coords for boston
 REFLAT = 42.361145
 REFLON = -71.057083
@@ -53,20 +70,217 @@ class RoverContext:
 
 gps = get_logger("gps")
 
+class TimestampedQueue(Queue):
+    """Queue that remembers when each item was put, so correction queueing latency can be measured."""
+    def _put(self, item):
+        super()._put((time.perf_counter(), item))
+
+
+# Recording file: MAGIC, then one RECORD header + data per chunk, appended as it happens
+RECORDING_MAGIC = b"RCGNSS1\n"
+RECORD = struct.Struct("<dBI")  # time.time(), direction, length
+RX = 0  # receiver -> host (UBX/NMEA)
+TX = 1  # host -> receiver (RTCM corrections, config)
+
+
+class StreamRecorder:
+    """Append-only recording of everything read from and written to the receiver."""
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(RECORDING_MAGIC)
+        self._lock = threading.Lock()  # the GNSS reader and the correction writer record from different threads
+
+    def record(self, direction: int, data: bytes):
+        if not data:
+            return
+        with self._lock:
+            self._file.write(RECORD.pack(time.time(), direction, len(data)))
+            self._file.write(data)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordingSerial:
+    """Wraps the receiver's Serial and records every read and write, everything else is passed through."""
+    def __init__(self, stream: Serial, recorder: StreamRecorder):
+        self._stream = stream
+        self.recorder = recorder
+
+    def read(self, size: int = 1) -> bytes:
+        data = self._stream.read(size)
+        self.recorder.record(RX, data)
+        return data
+
+    def readline(self) -> bytes:  # GNSSReader reads NMEA this way
+        data = self._stream.readline()
+        self.recorder.record(RX, data)
+        return data
+
+    def write(self, data) -> int | None:
+        self.recorder.record(TX, bytes(data))
+        return self._stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def read_recording(path: str):
+    """
+    Yields (timestamp, direction, data) for every record in a StreamRecorder file.
+    The file is memory mapped, so only the records themselves are copied out. A record
+    cut short by a crash or power loss ends the recording.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+            raise ValueError(f"{path} is not a GNSS recording")
+        pos = len(RECORDING_MAGIC)
+        while pos + RECORD.size <= len(mm):
+            timestamp, direction, length = RECORD.unpack_from(mm, pos)
+            pos += RECORD.size
+            if pos + length > len(mm):
+                break
+            yield timestamp, direction, mm[pos:pos + length]
+            pos += length
+
+
+class ReplaySerial:
+    """
+    Stands in for the receiver's Serial and plays back the RX side of a recording.
+    speed: 1.0 replays with the recorded timing, None as fast as possible.
+    Writes are counted and dropped. At the end reads return b"" like a serial timeout, and `finished` is set.
+    """
+    def __init__(self, path: str, speed: float | None = 1.0):
+        self.path = path
+        self.speed = speed
+        self.is_open = True
+        self.finished = False
+        self.timeout = 1
+        self.bytes_written = 0
+        self._records = ((t, data) for t, direction, data in read_recording(path) if direction == RX)
+        self._chunk = b""
+        self._pos = 0
+        self._first_time: float | None = None
+        self._start: float | None = None
+
+    def _next_chunk(self) -> bool:
+        record = next(self._records, None)
+        if record is None:
+            self.finished = True
+            return False
+        timestamp, self._chunk = record
+        self._pos = 0
+        if self.speed:
+            if self._first_time is None:
+                self._first_time, self._start = timestamp, time.perf_counter()
+            delay = (timestamp - self._first_time) / self.speed - (time.perf_counter() - self._start)
+            if delay > 0:
+                time.sleep(delay)
+        return True
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._chunk) - self._pos
+
+    def read(self, size: int = 1) -> bytes:
+        out = bytearray()
+        while len(out) < size:
+            if self._pos >= len(self._chunk) and not self._next_chunk():
+                break
+            take = self._chunk[self._pos:self._pos + size - len(out)]
+            self._pos += len(take)
+            out += take
+        return bytes(out)
+
+    def readline(self) -> bytes:
+        out = bytearray()
+        while not out.endswith(b"\n"):
+            data = self.read(1)
+            if not data:
+                break
+            out += data
+        return bytes(out)
+
+    def write(self, data) -> int:
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
 class GPS:
-    def __init__(self, port: str = PORT, baud: int = BAUD):
+    def __init__(self, port: str = PORT, baud: int = BAUD, fast_decoder: bool = True, nav_rate: int = NAV_RATE,
+                 record: str | None = None, replay: str | None = None, replay_speed: float | None = 1.0,
+                 casters: list[Caster] | None = None):
+        """
+        fast_decoder: split the stream and decode NAV-PVT with drivers/ubx.py instead of
+        building a pyubx2 object for every message
+        nav_rate: navigation solutions per second, one of NAV_RATES
+        record: append raw receiver bytes and written RTCM to this file
+        replay: read the receiver from this recording instead of `port`, see ReplaySerial for replay_speed
+        casters: where to get corrections from, in order of preference (CASTERS by default)
+        """
         gps.debug("Initializing GPS")
-        self.stream = Serial(PORT, BAUD, timeout=1)
+        if nav_rate not in NAV_RATES:
+            raise ValueError(f"nav_rate must be one of {NAV_RATES}, got {nav_rate}")
+        self.nav_rate = nav_rate
+        self.casters = casters or CASTERS
+        self.ntrip_session: NTRIPSession | None = None
+        self.replaying = replay is not None
+        self.recorder = StreamRecorder(record) if record else None
+        if replay is not None:
+            self.stream = ReplaySerial(replay, replay_speed)
+        else:
+            self.stream = Serial(port, baud, timeout=1)
+            if self.recorder:
+                self.stream = RecordingSerial(self.stream, self.recorder)
+
+            # Configure receiver to accept RTCM3 on USB and output UBX/NMEA
+            self._configure_zedf9p_usb(self.stream)
 
-        # Configure receiver to accept RTCM3 on USB and output UBX/NMEA
-        self._configure_zedf9p_usb(self.stream)
+        self.out_queue = TimestampedQueue()
+        self.gnr = FastGNSSReader(self.stream) if fast_decoder else GNSSReader(self.stream)
 
-        self.out_queue = Queue()
-        self.gnr = GNSSReader(self.stream)
+        self._write_lock = threading.Lock()  # corrections and config writes come from different threads
+        self.rtcm_queue_latencies: deque[float] = deque(maxlen=500)  # NTRIP client put -> serial write, in s
+        self.last_rtcm_time: float | None = None  # time.time() of the last correction written
+        self.rtcm_bytes = 0
+        self.first_rtcm_time: float | None = None
+
+        self.pvt_times: deque[float] = deque(maxlen=2 * nav_rate + 1)  # perf_counter of the last ~2 s of NAV-PVT
+        self.pvt_latencies: deque[float] = deque(maxlen=100)  # fix_time -> position published in states, in s
+        self.clock_offsets: deque[float] = deque(maxlen=10 * nav_rate)  # host receive time - GNSS epoch, last ~10 s
+        self.clock_offset: float | None = None  # smallest of them, host clock - GNSS time + the receiver's solution time
+        self.pvt_missed = 0  # epochs skipped, from gaps in iTOW
+        self.last_pvt: tuple[float, object] | None = None  # (fix_time, NAV-PVT), see handle_nav_pvt
+        self._last_itow: int | None = None
+        self.start_time = time.time()
+        self.has_gotten_fix = False
+        self.time_to_fix: float | None = None  # s from start_time to the first RTK fixed solution
+        self._stop_event = threading.Event()
 
         # Instantiate the context to hold live coordinates
         self.rover = RoverContext()
 
+    def stop(self):
+        """Ask read_gnss_loop to return, it notices within the 1 s serial timeout."""
+        self._stop_event.set()
+
+    def cleanup(self):
+        self.stop()
+        with self._write_lock:
+            if self.stream.is_open:
+                self.stream.close()
+        if self.recorder:
+            self.recorder.close()
+
     def _configure_zedf9p_usb(self, stream: Serial):
         """
         Configure ZED-F9P via UBX-CFG-VALSET (Generation 9 compatible)
@@ -74,7 +288,7 @@ class GPS:
         """
         layers = 1  # 1 = RAM
         transaction = 0
-        
+
         # Configure USB Port Protocol In/Out Masks
         cfg_data = [
             ("CFG_USBINPROT_UBX", 1),
@@ -85,8 +299,14 @@ class GPS:
             ("CFG_USBOUTPROT_RTCM3X", 0),
             
             # Ensure standard messages are output over USB
+            # NAV-PVT (100 B) every epoch is 2 kB/s at 20 Hz, inside 38400 baud even on a UART.
+            # GGA is only for the NTRIP client, so it stays at 1 Hz whatever the rate.
             ("CFG_MSGOUT_UBX_NAV_PVT_USB", 1),
-            ("CFG_MSGOUT_NMEA_ID_GGA_USB", 1),
+            ("CFG_MSGOUT_NMEA_ID_GGA_USB", self.nav_rate),  # every Nth epoch
+
+            # Measurement period, one navigation solution per measurement
+            ("CFG_RATE_MEAS", 1000 // self.nav_rate),
+            ("CFG_RATE_NAV", 1),
         ]
 
         msg = UBXMessage.config_set(layers, transaction, cfg_data) # type: ignore
@@ -94,73 +314,153 @@ class GPS:
         stream.flush()
         time.sleep(0.5)
     
+    def correction_writer_thread(self):
+        """Write RTCM to the receiver as soon as the NTRIP client queues it, independent of GNSS reads."""
+        while not self._stop_event.is_set():
+            try:
+                queued_at, (raw, parsed) = self.out_queue.get(timeout=1)
+            except Empty:
+                continue
+            if raw:
+                with self._write_lock:
+                    if not self.stream.is_open:
+                        break  # cleaned up
+                    self.stream.write(raw)
+                self.rtcm_queue_latencies.append(time.perf_counter() - queued_at)
+                self.last_rtcm_time = time.time()
+                self.rtcm_bytes += len(raw)
+                if self.first_rtcm_time is None:
+                    self.first_rtcm_time = self.last_rtcm_time
+                    gps.debug(f"Time to first correction: {self.first_rtcm_time - self.start_time}")
+            self.out_queue.task_done()
+
+    def correction_stats(self) -> dict[str, float | None]:
+        latencies = sorted(self.rtcm_queue_latencies)
+        return {
+            "rtcm_queue_ms_p50": latencies[len(latencies) // 2] * 1000 if latencies else None,
+            "rtcm_queue_ms_max": latencies[-1] * 1000 if latencies else None,
+            "rtcm_age": time.time() - self.last_rtcm_time if self.last_rtcm_time else None,  # s since last correction
+            "rtcm_bytes": self.rtcm_bytes,
+        }
+
+    def nav_stats(self) -> dict[str, float | int | None]:
+        times = self.pvt_times
+        latencies = sorted(self.pvt_latencies)
+        return {
+            "nav_rate": self.nav_rate,  # configured, Hz
+            "nav_rate_achieved": (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else None,
+            "pvt_latency_ms_p50": latencies[len(latencies) // 2] * 1000 if latencies else None,
+            "pvt_latency_ms_max": latencies[-1] * 1000 if latencies else None,
+            "pvt_missed": self.pvt_missed,
+            "clock_offset_s": self.clock_offset,  # more than a solution time off 0: the host clock isn't synced
+        }
+
+    def handle_nav_pvt(self, parsed_gnss, received: float | None = None):
+        """
+        received: time.time() the frame finished arriving.
+
+        fix_time is on the host clock without trusting it to agree with GNSS time (no RTC,
+        no NTP yet, a replay): the epoch plus the smallest receive - epoch of the last
+        ~10 s. The fastest frame counts as arriving at its epoch, so fix_time leaves out the
+        receiver's constant solution time but keeps any extra delay of this frame.
+        """
+        received = received or time.time()
+        fix_time = epoch_time(parsed_gnss)
+        if fix_time:
+            self.clock_offsets.append(received - fix_time)
+            self.clock_offset = min(self.clock_offsets)
+            fix_time += self.clock_offset
+        else:
+            fix_time = received
+
+        # Update the live coordinates so the NTRIP client can use them!
+        self.rover.lat = parsed_gnss.lat
+        self.rover.lon = parsed_gnss.lon
+        self.rover.sats = parsed_gnss.numSV
+        # hMSL is in mm, convert to meters
+        self.rover.alt = getattr(parsed_gnss, "hMSL", 0.0) / 1000.0
+
+        # Publish before logging, WaypointNavigation reads this every 10 ms
+        states.gps_location = Location(lat = self.rover.lat, lon = self.rover.lon, alt = self.rover.alt)
+        states.gps_fix_time = fix_time
+        self.last_pvt = (fix_time, parsed_gnss)  # for the pose estimator, which needs hAcc and velocity
+        self.pvt_latencies.append(time.time() - fix_time)
+        self.pvt_times.append(time.perf_counter())
+
+        period = 1000 // self.nav_rate
+        if self._last_itow is not None and parsed_gnss.iTOW > self._last_itow + period:
+            self.pvt_missed += (parsed_gnss.iTOW - self._last_itow) // period - 1
+        self._last_itow = parsed_gnss.iTOW
+        
+        rtk_status = {0: "None", 1: "Float", 2: "Fixed"}.get(parsed_gnss.carrSoln, "Unknown")
+        gps.debug(
+            f"Fix: {parsed_gnss.fixType}D | RTK: {rtk_status} | "
+            f"diffSoln: {parsed_gnss.diffSoln} | corrAge: {parsed_gnss.lastCorrectionAge}s | "
+            f"hAcc: {parsed_gnss.hAcc}mm | Sats: {parsed_gnss.numSV} | "
+            f"Lat: {parsed_gnss.lat}, Lon: {parsed_gnss.lon}"
+        )
+
+        if rtk_status == "Fixed" and self.has_gotten_fix == False:
+            fix_time_taken = time.time()
+
+            self.time_to_fix = fix_time_taken - self.start_time
+            gps.debug(f"Time to fix: {self.time_to_fix}")
+
+            self.has_gotten_fix = True
+
+
+        # gps.debug(f"{self.rover.lon}, {self.rover.lat}, {time.time()}")
+
+        states.ntrip_status = { 
+            "fix_type": parsed_gnss.fixType, # int
+            "rtk": rtk_status, # string
+            "diff_soln": parsed_gnss.diffSoln, # int, if it is solving
+            "corr_age": parsed_gnss.lastCorrectionAge, # int
+            "h_acc": parsed_gnss.hAcc, # int
+            "sats": parsed_gnss.numSV, # int, number sats
+            **self.correction_stats(),
+            **self.nav_stats(),
+            **(self.ntrip_session.stats() if self.ntrip_session else {}),
+            }
+
+    @contextmanager
+    def ntrip_client(self, **session_options):
+        """Stream corrections into the receiver while the block runs, see NTRIPSession for the options."""
+        self.ntrip_session = NTRIPSession(self.rover, self.out_queue, self.casters, **session_options).start()
+
+        # Corrections get their own thread so they never wait behind a blocking GNSS read
+        threading.Thread(target=self.correction_writer_thread, daemon=True).start()
+
+        try:
+            yield self.ntrip_session
+        finally:
+            self.ntrip_session.stop()
+
+    def read_gnss_loop(self):
+        """Read the receiver until `cleanup()` or the end of a replay. Separate from `update_gps_thread` so it can run without NTRIP."""
+        while not self._stop_event.is_set():
+            try:
+                raw_gnss, parsed_gnss = self.gnr.read()
+                received = time.time()
+            except SerialException as e: # unplugged, or closed under us
+                if not self._stop_event.is_set():
+                    gps.error(f"Receiver port lost, stopping: {e}")
+                return
+            if raw_gnss is None and self.replaying and self.stream.finished:
+                gps.info(f"Replay of {self.stream.path} finished")
+                return
+            if parsed_gnss is not None and getattr(parsed_gnss, "identity", None) == "NAV-PVT":
+                self.handle_nav_pvt(parsed_gnss, received)
+
     def update_gps_thread(self):
-            start_time = time.time()
-            has_gotten_fix = False
-
-            gps.debug(f"GPS thread started. UNIX TIME: {start_time}\n")
-
-            with GNSSNTRIPClient(self.rover) as gnc:
-                gnc.run(
-                    server=NTRIP_SERVER,
-                    port=NTRIP_PORT,
-                    mountpoint=NTRIP_MOUNT,
-                    datatype="RTCM",
-                    ntripuser=os.getenv("NTRIP_USER", "anon"),
-                    ntrippassword=os.getenv("NTRIP_PWD", "password"),
-                    ggainterval=10,
-                    ggamode=0, # use live location from gps
-                    output=self.out_queue,
-                )
-
-                while True:
-                    # inject corrections + print what arrives
-                    try:
-                        while True:
-                            raw, parsed = self.out_queue.get_nowait()
-                            ident = getattr(parsed, "identity", type(parsed).__name__)
-                            # print(f"NTRIP: {ident} ({len(raw)} bytes)")
-                            if raw:
-                                self.stream.write(raw)
-                            self.out_queue.task_done()
-                    except Empty:
-                        pass
-
-                    # show rover status
-                    raw_gnss, parsed_gnss = self.gnr.read()
-                    if parsed_gnss is not None and getattr(parsed_gnss, "identity", None) == "NAV-PVT":
-                        
-                        # Update the live coordinates so the NTRIP client can use them!
-                        self.rover.lat = parsed_gnss.lat
-                        self.rover.lon = parsed_gnss.lon
-                        self.rover.sats = parsed_gnss.numSV
-                        # hMSL is in mm, convert to meters
-                        self.rover.alt = getattr(parsed_gnss, "hMSL", 0.0) / 1000.0
-                        
-                        rtk_status = {0: "None", 1: "Float", 2: "Fixed"}.get(parsed_gnss.carrSoln, "Unknown")
-                        gps.debug(
-                            f"Fix: {parsed_gnss.fixType}D | RTK: {rtk_status} | "
-                            f"diffSoln: {parsed_gnss.diffSoln} | corrAge: {parsed_gnss.lastCorrectionAge}s | "
-                            f"hAcc: {parsed_gnss.hAcc}mm | Sats: {parsed_gnss.numSV} | "
-                            f"Lat: {parsed_gnss.lat}, Lon: {parsed_gnss.lon}"
-                        )
-
-                        if rtk_status == "Fixed" and has_gotten_fix == False:
-                            fix_time = time.time()
-
-                            gps.debug(f"Time to fix: {fix_time-start_time}")
-
-                            has_gotten_fix = True
-
-
-                        # gps.debug(f"{self.rover.lon}, {self.rover.lat}, {time.time()}")
-
-                        states.gps_location = Location(lat = self.rover.lat, lon = self.rover.lon, alt = self.rover.alt)
-                        states.ntrip_status = { 
-                            "fix_type": parsed_gnss.fixType, # int
-                            "rtk": rtk_status, # string
-                            "diff_soln": parsed_gnss.diffSoln, # int, if it is solving
-                            "corr_age": parsed_gnss.lastCorrectionAge, # int
-                            "h_acc": parsed_gnss.hAcc, # int
-                            "sats": parsed_gnss.numSV # int, number sats
-                            }
\ No newline at end of file
+            self.start_time = time.time()
+
+            gps.debug(f"GPS thread started. UNIX TIME: {self.start_time}\n")
+
+            if self.replaying:
+                # The recording already holds the corrections the receiver got
+                self.read_gnss_loop()
+                return
+
+            with self.ntrip_client():
+                self.read_gnss_loop()
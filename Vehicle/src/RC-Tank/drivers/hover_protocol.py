@@ -0,0 +1,179 @@
+"""
+Frame codec for the hoverboard UART bus (`REMOTE_UARTBUS` in the firmware).
+
+Kept free of `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import struct
+import time
+from typing import NamedTuple
+
+START_BYTE = 0x2F  # `/` in ASCII
+DATA_TYPE_SPEED = 0x00  # `SerialServer2Hover`
+DEFAULT_STATE = 32  # Battery3Led, same as the firmware's HoverSend default
+
+# Start Byte (1B) + Data Type (1B) + Slave ID (1B) + Speed (2B LE) + State (1B) + CRC (2B LE)
+CONTROL_FRAME = struct.Struct("<BBBhBH")
+CONTROL_FRAME_SIZE = CONTROL_FRAME.size
+_CRC_OFFSET = CONTROL_FRAME_SIZE - 2
+
+# `SerialHover2Server`, sent back by each slave after it receives a frame
+FEEDBACK_START = b"\xCD\xAB"  # START_FRAME 0xABCD, little-endian
+# Start (2B) + Slave ID (1B) + Speed (2B) + Volt (2B) + Amp (2B) + Odom (4B) + CRC (2B)
+FEEDBACK_FRAME = struct.Struct("<HBhHhiH")
+# Same frame with SEND_IMU_DATA: gyro xyz, accel xyz and temperature inserted before the CRC
+FEEDBACK_FRAME_IMU = struct.Struct("<HBhHhi7hH")
+
+
+def _make_crc_table() -> tuple[int, ...]:
+    """Precompute CRC-CCITT (poly 0x1021, init 0) for every possible high byte."""
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = (crc << 1) ^ 0x1021
+            else:
+                crc <<= 1
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+
+CRC_TABLE = _make_crc_table()
+
+
+def calc_crc(data, start: int = 0, end: int | None = None) -> int:
+    """
+    Table-driven version of `CalcCRC` from the firmware.
+    `start`/`end` let callers checksum part of a buffer without slicing it.
+    """
+    if end is None:
+        end = len(data)
+    table = CRC_TABLE
+    crc = 0
+    for i in range(start, end):
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ data[i]]
+    return crc
+
+
+def pack_control_into(buffer: bytearray, offset: int, iSlave: int, iSpeed: int, wState: int = DEFAULT_STATE):
+    """Pack one `SerialServer2Hover` frame into `buffer` at `offset`, CRC included."""
+    CONTROL_FRAME.pack_into(buffer, offset, START_BYTE, DATA_TYPE_SPEED, iSlave, iSpeed, wState, 0)
+    crc_at = offset + _CRC_OFFSET
+    crc = calc_crc(buffer, offset, crc_at)
+    buffer[crc_at] = crc & 0xFF
+    buffer[crc_at + 1] = crc >> 8
+
+
+class FrameEncoder:
+    """
+    Packs control frames in place into one reusable buffer, so sending a
+    command does not allocate. The returned memoryview is only valid until
+    the next `encode`/`encode_pair` call.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray(CONTROL_FRAME_SIZE * 2)
+        self._view = memoryview(self.buffer)
+        self._single = self._view[:CONTROL_FRAME_SIZE]
+
+    def encode(self, iSlave: int, iSpeed: int, wState: int = DEFAULT_STATE) -> memoryview:
+        pack_control_into(self.buffer, 0, iSlave, iSpeed, wState)
+        return self._single
+
+    def encode_pair(self, left: int, right: int, wState: int = DEFAULT_STATE) -> memoryview:
+        """Both slaves back to back (slave 0 is left, slave 1 is right) so they go out in one write."""
+        pack_control_into(self.buffer, 0, 0, left, wState)
+        pack_control_into(self.buffer, CONTROL_FRAME_SIZE, 1, right, wState)
+        return self._view
+
+
+class HoverFeedback(NamedTuple):
+    """One decoded `SerialHover2Server` frame."""
+    timestamp: float  # time.time() when the bytes were read
+    slave: int
+    speed: float  # km/h
+    voltage: float  # V
+    current: float  # A
+    odom: int  # hall steps (the GD32 firmware sends a frame counter here)
+    temperature: int | None = None  # only with SEND_IMU_DATA
+
+
+class FeedbackParser:
+    """
+    Incremental parser for the feedback stream. Bytes that do not complete a
+    frame stay in the buffer until the next `feed`, frames are only accepted
+    when the CRC matches, and after garbage or a bad CRC it resyncs on the
+    next start word.
+    """
+
+    def __init__(self, imu_data: bool = False):
+        self._frame = FEEDBACK_FRAME_IMU if imu_data else FEEDBACK_FRAME
+        self._imu_data = imu_data
+        self._buffer = bytearray()
+
+        self.frames_ok = 0
+        self.crc_errors = 0
+        self.bytes_skipped = 0
+
+    def feed(self, data, timestamp: float | None = None) -> list[HoverFeedback]:
+        """Add raw bytes from the UART and return every complete, valid frame."""
+        if timestamp is None:
+            timestamp = time.time()
+
+        buffer = self._buffer
+        buffer += data
+        frame = self._frame
+        size = frame.size
+        samples: list[HoverFeedback] = []
+        pos = 0
+
+        while True:
+            start = buffer.find(FEEDBACK_START, pos)
+            if start < 0:
+                # Keep a trailing 0xCD, it may be the first half of the next start word
+                keep = 1 if pos < len(buffer) and buffer[-1] == 0xCD else 0
+                self.bytes_skipped += len(buffer) - pos - keep
+                pos = len(buffer) - keep
+                break
+
+            self.bytes_skipped += start - pos
+            if len(buffer) - start < size:
+                pos = start  # partial frame, wait for more bytes
+                break
+
+            fields = frame.unpack_from(buffer, start)
+            if calc_crc(buffer, start, start + size - 2) != fields[-1]:
+                self.crc_errors += 1
+                self.bytes_skipped += 1
+                pos = start + 1
+                continue
+
+            samples.append(HoverFeedback(
+                timestamp=timestamp,
+                slave=fields[1],
+                speed=fields[2] / 100.0,
+                voltage=fields[3] / 100.0,
+                current=fields[4] / 100.0,
+                odom=fields[5],
+                temperature=fields[-2] if self._imu_data else None,
+            ))
+            self.frames_ok += 1
+            pos = start + size
+
+        # At most one partial frame is left behind, so the buffer never grows
+        del buffer[:pos]
+
+        return samples
+
+    def reset(self):
+        self._buffer.clear()
+
+
+def pack_feedback(slave: int, speed: float, voltage: float, current: float, odom: int) -> bytes:
+    """Build a `SerialHover2Server` frame the way `AnswerMaster` in the firmware does."""
+    buffer = bytearray(FEEDBACK_FRAME.size)
+    FEEDBACK_FRAME.pack_into(buffer, 0, 0xABCD, slave, round(speed * 100), round(voltage * 100), round(current * 100), odom, 0)
+    crc = calc_crc(buffer, 0, FEEDBACK_FRAME.size - 2)
+    buffer[-2] = crc & 0xFF
+    buffer[-1] = crc >> 8
+    return bytes(buffer)
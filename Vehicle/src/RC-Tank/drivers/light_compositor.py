@@ -0,0 +1,96 @@
+"""
+Layered frames for the light strip: every layer holds a color or None (transparent) per
+pixel, the topmost color wins, and a frame is only handed out for transmission when
+it differs from the last one that was sent.
+
+Kept free of `periphery` and `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import threading
+
+LAYERS = ("side", "headlights", "status", "animation")  # bottom to top
+BLACK = (0, 0, 0)
+
+Color = tuple[int, int, int]
+
+
+class LightCompositor:
+    """
+    Layers only mark the compositor dirty when a pixel actually changes, so repeated
+    commands don't even compose. `next_frame` composes when dirty and returns the frame
+    only if it differs from the last transmitted one.
+
+    Counters: `composed` frames built, `transmitted` frames handed out to send,
+    `skipped` next_frame calls that had nothing new to send.
+    """
+
+    def __init__(self, num_pixels: int, layers: tuple[str, ...] = LAYERS, background: Color = BLACK):
+        self.num_pixels = num_pixels
+        self.background = background
+        self._layers: dict[str, list[Color | None]] = {name: [None] * num_pixels for name in layers}
+        self._stack = tuple(self._layers[name] for name in reversed(layers))  # top first
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._frame: list[Color] = [background] * num_pixels
+        self._sent: list[Color] | None = None  # None until the first transmission, or after invalidate()
+
+        self.composed = 0
+        self.transmitted = 0
+        self.skipped = 0
+
+    def set(self, layer: str, index: int, color: Color | None):
+        """color None makes the pixel show whatever is below it."""
+        if not 0 <= index < self.num_pixels:
+            return
+        with self._lock:
+            pixels = self._layers[layer]
+            if pixels[index] != color:
+                pixels[index] = color
+                self._dirty = True
+
+    def fill(self, layer: str, color: Color | None, indices=None):
+        with self._lock:
+            pixels = self._layers[layer]
+            for index in range(self.num_pixels) if indices is None else indices:
+                if 0 <= index < self.num_pixels and pixels[index] != color:
+                    pixels[index] = color
+                    self._dirty = True
+
+    def clear(self, layer: str):
+        self.fill(layer, None)
+
+    def compose(self) -> list[Color]:
+        """Topmost color per pixel, background where every layer is transparent."""
+        with self._lock:
+            if self._dirty:
+                frame = []
+                for index in range(self.num_pixels):
+                    for pixels in self._stack:
+                        color = pixels[index]
+                        if color is not None:
+                            break
+                    else:
+                        color = self.background
+                    frame.append(color)
+                self._frame = frame
+                self._dirty = False
+                self.composed += 1
+            return self._frame
+
+    def next_frame(self, force: bool = False) -> list[Color] | None:
+        """The frame to send, or None if the strip already shows it. Counts it as transmitted."""
+        frame = self.compose()
+        with self._lock:
+            if not force and frame == self._sent:
+                self.skipped += 1
+                return None
+            self._sent = frame
+            self.transmitted += 1
+            return frame
+
+    def invalidate(self):
+        """The strip may not show the last frame (failed transfer), send the next one regardless."""
+        with self._lock:
+            self._sent = None
+
+    def stats(self) -> dict[str, int]:
+        return {"composed": self.composed, "transmitted": self.transmitted, "skipped": self.skipped}
@@ -1,95 +1,130 @@
+import threading
 import time
-from periphery import SPI #type:ignore
+try:
+    from periphery import SPI #type:ignore
+except ImportError:  # not on the Jetson, pass `spi` (sim/spi.py)
+    SPI = None
+from core.config import get_logger
+from drivers.neopixel import SPI_HZ, NeoPixelEncoder
+from drivers.light_compositor import LAYERS, LightCompositor
+
+lights = get_logger("lights")
 
 class Lights:
-    def __init__(self, num_pixels=30):
+    def __init__(self, num_pixels=30, spi=None, worker=True):
+        """worker: start update_lights_thread right away, so no show() ever transfers on the caller's thread"""
         # Jetson Orin Nano SPI defaults (spidev0.0 @ 6.4 MHz)
-        self.spi = SPI("/dev/spidev0.0", 0, 6400000)
+        self.spi = spi or SPI("/dev/spidev0.0", 0, SPI_HZ)
         self.num_pixels = num_pixels
-        self.pixels = [(0, 0, 0)] * num_pixels  # RGB tuples
+        self.encoder = NeoPixelEncoder(num_pixels)  # GRB bit patterns + reset pulse, one buffer reused every show()
+        self.compositor = LightCompositor(num_pixels)  # side, headlights, status, animation layers
         self.side_value = 100
-        self._update_strip()
-    
-    def _rgb_to_spi(self, r, g, b):
-        """Convert RGB values to SPI bit pattern for NeoPixels"""
-        # NeoPixels expect GRB format
-        grb = (g << 16) | (r << 8) | b
-        spi_data = []
-        
-        # One LED bit per SPI byte at 6.4MHz gives 1.25us/bit.
-        # 0-bit: ~0.31us high + 0.94us low; 1-bit: ~0.62us high + 0.62us low.
-        for i in range(23, -1, -1):  # 24 bits, MSB first
-            if (grb >> i) & 1:
-                spi_data.extend([0b11110000])  # Logic 1 pulse
-            else:
-                spi_data.extend([0b11000000])  # Logic 0 pulse
-        
-        return spi_data
-    
-    def _update_strip(self):
-        """Send current pixel data to the strip"""
-        spi_data = []
-        
-        # Convert all pixels to SPI data
-        for r, g, b in self.pixels:
-            spi_data.extend(self._rgb_to_spi(r, g, b))
-        
-        # Add reset signal (zeros)
-        spi_data.extend([0x00] * 80)  # >=50us reset pulse
-        
-        # Send data
-        self.spi.transfer(spi_data)
-        time.sleep(0.001)  # Small delay
-    
-    def set_pixel(self, index, r, g, b):
-        """Set individual pixel color"""
-        if 0 <= index < self.num_pixels:
-            self.pixels[index] = (r, g, b)
-    
-    def fill(self, r, g, b):
-        """Fill all pixels with the same color"""
-        for i in range(self.num_pixels):
-            self.pixels[i] = (r, g, b)
-    
+        self.green_side = range(0, 6)
+        self.headlight_pixels = range(6, 24)
+        self.red_side = range(24, num_pixels)
+
+        # Mailbox for update_lights_thread: the layers hold the latest state, this only says "show it"
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._worker: threading.Thread | None = None
+        self._spi_lock = threading.Lock()
+        self.requests = 0
+
+        self._update_strip(force=True)
+        if worker:
+            self._worker = threading.Thread(target=self.update_lights_thread, daemon=True)
+            self._worker.start()
+
+    def _update_strip(self, force=False):
+        """Send the composed frame to the strip, unless it already shows it"""
+        with self._spi_lock:  # the worker and a synchronous show() around start/stop
+            frame = self.compositor.next_frame(force=force)
+            if frame is None:
+                return
+            try:
+                self.spi.transfer(self.encoder.encode(frame))
+            except Exception:
+                self.compositor.invalidate()
+                raise
+            time.sleep(0.001)  # Small delay
+
+    def set_pixel(self, index, r, g, b, layer="animation"):
+        """Set individual pixel color, on top of the side markers and headlights by default"""
+        self.compositor.set(layer, index, (r, g, b))
+
+    def fill(self, r, g, b, layer="animation"):
+        """Fill all pixels of a layer with the same color"""
+        self.compositor.fill(layer, (r, g, b))
+
+    def clear(self, layer="animation"):
+        """Make a layer transparent again"""
+        self.compositor.clear(layer)
+
     def show(self):
-        """Update the physical strip with current pixel values"""
-        self._update_strip()
+        """
+        Update the physical strip with current pixel values. Returns right away while
+        update_lights_thread runs, requests that come in before it gets to them
+        collapse into one transfer of the latest frame. Transfers right here without
+        the worker, or once it's stopped.
+        """
+        self.requests += 1
+        if self._worker:
+            self._wake.set()
+        else:
+            self._update_strip()
+
+    def update_lights_thread(self):
+        """Does the encoding, SPI transfer and settle sleep, so callers on the event loop never block on them."""
+        while not self._stop_event.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self._update_strip()
+            except Exception as e:
+                lights.warning(f"Light strip update failed: {e}")
+
+    def stop(self):
+        """Stop update_lights_thread after its last update, show() is synchronous again afterwards."""
+        worker, self._worker = self._worker, None
+        self._stop_event.set()
+        self._wake.set()
+        if worker and worker is not threading.current_thread():
+            worker.join(timeout=1)
+
+    def stats(self):
+        return {"requests": self.requests, **self.compositor.stats()}
+
+    def _side_markers(self):
+        self.compositor.fill("side", (0, self.side_value, 0), self.green_side)
+        self.compositor.fill("side", (self.side_value, 0, 0), self.red_side)
 
     def all_on(self):
-        for i in range(self.num_pixels):
-            if i < 6:
-                self.set_pixel(i, 0, self.side_value, 0)
-            elif i > 23:
-                self.set_pixel(i, self.side_value, 0, 0)
-            else:
-                self.set_pixel(i, 255, 255, 255)
+        self._side_markers()
+        self.compositor.fill("headlights", (255, 255, 255), self.headlight_pixels)
         self.show()
-    
+
     def side_on(self):
-        for i in range(self.num_pixels):
-            if i < 6:
-                self.set_pixel(i, 0, self.side_value, 0)
-            elif i > 23:
-                self.set_pixel(i, self.side_value, 0, 0)
-            else:
-                self.set_pixel(i, 0, 0, 0)
+        self._side_markers()
+        for layer in LAYERS[1:]:  # everything but the side markers off, like before the layers
+            self.compositor.clear(layer)
         self.show()
-    
+
     def set_headlights(self, level: int):
-        level = int((level/100)*255)
+        level = int((min(max(level, 0), 100)/100)*255)  # the encoder's lookup table only has 0-255
 
-        for i in range(self.num_pixels):
-            if i > 5 and i < 24:
-                self.set_pixel(i, level, level, level)
+        # Off is transparent so the layers below show through
+        self.compositor.fill("headlights", (level, level, level) if level else None, self.headlight_pixels)
         self.show()
 
         return {"status": "ok", "level": f"{level}"}
-    
+
     def off(self):
-        self.fill(0, 0, 0)
+        for layer in LAYERS:
+            self.compositor.clear(layer)
         self.show()
-    
+
     def cleanup(self):
         """Clean up SPI resources"""
+        self.stop()
         self.off()
-        self.spi.close()
\ No newline at end of file
+        self.spi.close()
@@ -1,9 +1,11 @@
 import time
-import struct
 import serial  # type: ignore
 import threading
+from collections import deque
 from core.types import MotorCommand
 from core.config import get_logger
+from core.latency import CommandTrace
+from drivers.hover_protocol import CONTROL_FRAME_SIZE, FeedbackParser, FrameEncoder, HoverFeedback, calc_crc
 
 motor = get_logger("motor")
 
@@ -20,18 +22,28 @@ class Motor:
                  port: str = "/dev/ttyTHS1",
                  baudrate: int = 4800,
                  send_interval: float = 0.1,
-                 max_speed: int = 1000):
+                 max_speed: int = 1000,
+                 event_driven: bool = False,
+                 high_baudrate: int | None = None):
+        """
+        event_driven: send as soon as `set_motor` changes the command instead of
+        waiting for the next `send_interval` tick, which then only acts as a keep-alive.
+        high_baudrate: try this rate first (needs REMOTE_BAUD in the ESC firmware to match)
+        and fall back to `baudrate` if the ESCs don't answer.
+        """
        
         self.PORT = port
-        self.BAUDRATE = baudrate
+        self.BAUDRATE = high_baudrate or baudrate
         self.SEND_INTERVAL = send_interval # in s
         self.MAX_SPEED = max_speed
+        self.EVENT_DRIVEN = event_driven
 
         self.ser = serial.Serial(self.PORT, baudrate=self.BAUDRATE, timeout=1)
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
 
         self._state_lock = threading.Lock()
+        self._wake = threading.Condition(self._state_lock)  # set_motor -> _io_worker in event driven mode
         self.last_update_time = time.time()
         self.desired_left = 0
         self.desired_right = 0
@@ -39,29 +51,59 @@ class Motor:
         self.applied_right = 0
 
         self.voltage: float = 0.0
+        self.feedback: dict[int, HoverFeedback] = {}  # latest feedback frame per slave id
+        self._feedback_parser = FeedbackParser()
+
+        self._encoder = FrameEncoder()
+        self._stop_frames = bytes(self._encoder.encode_pair(0, 0)) * 2  # Stop twice because of a weird bug with ESC
+
+        if high_baudrate and high_baudrate != baudrate and not self._probe_baudrate():
+            motor.warning(f"No ESC answer at {high_baudrate} baud, falling back to {baudrate}")
+            self.ser.baudrate = baudrate
+            self.ser.reset_input_buffer()
+            self.BAUDRATE = baudrate
+        motor.debug(f"Motor link at {self.BAUDRATE} baud")
+
+        self._pending_command_time: float | None = None  # perf_counter of the oldest command not yet on the wire
+        self.command_latencies: deque[float] = deque(maxlen=1000)  # set_motor -> ser.write, in s
+        self._pending_traces: list[CommandTrace] = []  # of the commands not yet on the wire, see core/latency.py
+        self.frames_coalesced = 0
+        self._pair_wire_time = 2 * CONTROL_FRAME_SIZE * 10 / self.BAUDRATE  # 8N1 = 10 bits per byte
+        self._last_sent: tuple[int, int] | None = None
+        self._last_send_time = 0.0
 
         self.stopped = True
 
         self._stop_event = threading.Event()
+        self._start_io()
+
+    def _start_io(self):
         self._io_thread = threading.Thread(target=self._io_worker, daemon=True)
         self._io_thread.start()
     
     def stop(self):
         """Request the I/O loop to exit and wait for shutdown."""
         self._stop_event.set()
+        with self._wake:
+            self._wake.notify()
         if self._io_thread.is_alive():
             self._io_thread.join(timeout=2)
     
+    def _probe_baudrate(self, timeout: float = 0.3) -> bool:
+        """Send a stop pair at the current rate and check that a valid feedback frame comes back."""
+        parser = FeedbackParser()
+        self.ser.reset_input_buffer()
+        self.ser.write(self._stop_frames)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            data = self.read_feedback()
+            if data and parser.feed(data):
+                return True
+            time.sleep(0.01)
+        return False
+
     def calc_crc(self, data: bytes) -> int:
-        crc = 0
-        for byte in data:
-            crc ^= (byte << 8)
-            for _ in range(8):
-                if crc & 0x8000:
-                    crc = (crc << 1) ^ 0x1021
-                else:
-                    crc <<= 1
-        return crc & 0xFFFF  # Ensure a 16-bit CRC
+        return calc_crc(data)
 
     def read_feedback(self):
         try:
@@ -76,76 +118,32 @@ class Motor:
             raise
         return None
 
-    def read_voltage_from_uart(self, data):
+    def handle_feedback(self, data: bytes) -> list[HoverFeedback]:
         """
-        Read battery voltage from hoverboard UART data.  
-        
-        Args: 
-            data: bytes or bytearray from UART
-            
-        Returns:  
-            float: Voltage in volts, or None if no valid packet found
+        Feed raw UART bytes to the streaming parser and publish every complete frame.
+        Partial frames are kept until the next read.
         """
-        # Handle None or empty data
-        if data is None or len(data) == 0:
-            return None
-        
-        # Convert to bytearray if needed
-        if isinstance(data, str):
-            # If hex string like "cdab01ae11f605..."
-            data = bytes.fromhex(data. replace('\\x', ''))
-        elif isinstance(data, bytes):
-            data = bytearray(data)
-        
-        # Need at least 15 bytes for a complete packet
-        if len(data) < 15:
-            return None
-        
-        # Find start frame (CD AB)
-        for i in range(len(data) - 14):  # Need at least 15 bytes
-            if data[i] == 0xCD and data[i+1] == 0xAB:
-                # Found start frame, extract voltage at bytes 5-6
-                volt_lo = data[i + 5]
-                volt_hi = data[i + 6]
-                
-                # Combine (little-endian)
-                voltage_raw = (volt_hi << 8) | volt_lo
-                
-                # Convert to volts
-                voltage = voltage_raw / 100.0
-                
-                return voltage
-        
-        return None  # No valid packet found
+        samples = self._feedback_parser.feed(data)
+        if samples:
+            with self._state_lock:
+                for sample in samples:
+                    self.feedback[sample.slave] = sample
+                self.voltage = samples[-1].voltage
+        return samples
 
-    
     def build_packet(self, iSlave: int, iSpeed: int, wState: int) -> bytes:
         """
         Build UART packet in `SerialServer2Hover` format:
         Start Byte (1B) + Data Type (1B) + Slave ID (1B) + Speed (2B LE) + State (1B) + CRC (2B LE)
         """
-        START_BYTE = b'\x2F'  # Start byte, `/` in ASCII
-        DATA_TYPE = b'\x00'  # Data type (`0x00` for SerialServer2Hover)
-
-        # Encode fields
-        slave_byte = struct.pack("<B", iSlave)  # Slave ID, 1 byte
-        speed_bytes = struct.pack("<h", iSpeed)  # Speed (signed 16-bit, little-endian)
-        state_byte = struct.pack("<B", wState)  # State byte
-
-        # Combine fields for CRC calculation
-        payload_without_crc = START_BYTE + DATA_TYPE + slave_byte + speed_bytes + state_byte
-        checksum = self.calc_crc(payload_without_crc)  # Calculate checksum
-        crc_bytes = struct.pack("<H", checksum)  # CRC (16-bit, little-endian)
-
-        # Final packet: Append checksum
-        return payload_without_crc + crc_bytes
+        return bytes(self._encoder.encode(iSlave, iSpeed, wState))
 
     def send_packet(self, iSlave: int, iSpeed: int, wState: int):
         """Send the constructed hoverboard control packet."""
         if self.ser is None:
             raise RuntimeError("Serial port is not opened. Initialize it before sending packets.")
 
-        packet = self.build_packet(iSlave, iSpeed, wState)
+        packet = self._encoder.encode(iSlave, iSpeed, wState)  # reused buffer, no allocation
         self.ser.write(packet)
         # self.ser.flush() # Blocking, causes latency
 
@@ -153,9 +151,19 @@ class Motor:
         # motor.debug(f"Sent packet | Slave: {iSlave} | Speed: {iSpeed} | State: {wState} | Packet: {packet.hex()}")
 
     def _send_pair(self, left_speed: int, right_speed: int) -> bool:
+        """Send both slaves in one write so the link can't split left and right."""
+        try:
+            self.ser.write(self._encoder.encode_pair(left_speed, right_speed))  # slave 0 is left, slave 1 is right
+            if left_speed != 0 or right_speed != 0:
+                self.stopped = False
+            return True
+        except serial.SerialException as exc:
+            motor.error(f"{RED}Serial write failed: {exc}{RESET}")
+            return False
+
+    def _send_stop(self) -> bool:
         try:
-            self.set_esc(0, left_speed)  # slave 0 is left
-            self.set_esc(1, right_speed)  # slave 1 is right
+            self.ser.write(self._stop_frames)
             return True
         except serial.SerialException as exc:
             motor.error(f"{RED}Serial write failed: {exc}{RESET}")
@@ -169,55 +177,105 @@ class Motor:
             self.applied_right = 0
             self.stopped = True
 
+    def _wait_for_work(self):
+        if not self.EVENT_DRIVEN:
+            self._stop_event.wait(self.SEND_INTERVAL)
+            return
+
+        with self._wake:
+            if self._pending_command_time is None and not self._stop_event.is_set():
+                self._wake.wait(self.SEND_INTERVAL)  # keep-alive if nothing changes
+
+        # Don't queue frames faster than the link can carry them, newer commands replace the pending one meanwhile
+        gap = self._pair_wire_time - (time.time() - self._last_send_time)
+        if gap > 0:
+            self._stop_event.wait(gap)
+
+    def latency_stats(self) -> dict[str, float]:
+        """Command-to-wire latency in ms over the last `command_latencies` samples."""
+        samples = sorted(self.command_latencies)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "mean": sum(samples) / len(samples) * 1000,
+            "p50": samples[len(samples) // 2] * 1000,
+            "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+            "max": samples[-1] * 1000,
+        }
+
+    def _io_step(self):
+        """One pass of the I/O loop: enforce the deadman, then send or coalesce the desired speeds."""
+        now = time.time()
+        with self._state_lock:
+            desired_left = self.desired_left
+            desired_right = self.desired_right
+            time_since_last_update = (now - self.last_update_time) * 1000
+            command_time = self._pending_command_time
+            self._pending_command_time = None
+            traces, self._pending_traces = self._pending_traces, []
+
+        timeout_hit = time_since_last_update > 2000
+        if timeout_hit:
+            if not self.stopped:
+                motor.error(f"{RED}TIMEOUT HIT ({time_since_last_update:.0f}ms), STOPPING{RESET}")
+            sent = self._send_stop()
+            if sent:
+                with self._state_lock:
+                    self.applied_left = 0
+                    self.applied_right = 0
+                    self.stopped = True
+            else:
+                self._set_safe_stopped_state()
+            self._last_sent = None
+        elif self.EVENT_DRIVEN and self._last_sent == (desired_left, desired_right) and now - self._last_send_time < self.SEND_INTERVAL:
+            # Same frame already went out recently, the keep-alive will repeat it
+            self.frames_coalesced += 1
+            for trace in traces:  # already on the wire
+                trace.finish(time.time())
+        else:
+            sent = self._send_pair(desired_left, desired_right)
+            if sent:
+                if command_time is not None:
+                    self.command_latencies.append(time.perf_counter() - command_time)
+                if traces:
+                    written = time.time()
+                    for trace in traces:
+                        trace.finish(written)
+                self._last_sent = (desired_left, desired_right)
+                self._last_send_time = now
+                with self._state_lock:
+                    self.applied_left = desired_left
+                    self.applied_right = desired_right
+                    self.stopped = (desired_left == 0 and desired_right == 0)
+            else:
+                self._last_sent = None
+                self._set_safe_stopped_state()
+
     def _io_worker(self):
         while not self._stop_event.is_set():
-            now = time.time()
-            with self._state_lock:
-                desired_left = self.desired_left
-                desired_right = self.desired_right
-                time_since_last_update = (now - self.last_update_time) * 1000
-
-            timeout_hit = time_since_last_update > 2000
-            if timeout_hit:
-                if not self.stopped:
-                    motor.error(f"{RED}TIMEOUT HIT ({time_since_last_update:.0f}ms), STOPPING{RESET}")
-                sent = self._send_pair(0, 0)
-                if sent:
-                    self._send_pair(0, 0)  # Do this twice because of a weird bug with ESC
-                    with self._state_lock:
-                        self.applied_left = 0
-                        self.applied_right = 0
-                        self.stopped = True
-                else:
-                    self._set_safe_stopped_state()
-            else:
-                sent = self._send_pair(desired_left, desired_right)
-                if sent:
-                    with self._state_lock:
-                        self.applied_left = desired_left
-                        self.applied_right = desired_right
-                        self.stopped = (desired_left == 0 and desired_right == 0)
-                else:
-                    self._set_safe_stopped_state()
+            self._io_step()
 
             try:
                 feedback = self.read_feedback()
                 if feedback:
-                    voltage = self.read_voltage_from_uart(feedback)
-                    if voltage is not None:
-                        self.voltage = voltage
-                    else:
-                        motor.debug("Warning: Could not parse voltage from feedback")
+                    samples = self.handle_feedback(feedback)
+                    if not samples:
+                        motor.debug("No complete feedback frame yet")
             except serial.SerialException:
                 self._set_safe_stopped_state()
                 self._stop_event.wait(self.SEND_INTERVAL)
 
-            self._stop_event.wait(self.SEND_INTERVAL)
+            self._wait_for_work()
 
-        self._send_pair(0, 0)
-        self._send_pair(0, 0)
+        self._send_stop()
         self._set_safe_stopped_state()
 
+    def _notify_io(self):
+        """Called from set_motor with the state lock held."""
+        if self.EVENT_DRIVEN:
+            self._wake.notify()
+
     def clamp(self, x, lo, hi):
         return max(lo, min(hi, x))
 
@@ -226,7 +284,7 @@ class Motor:
         if throttle != 0:
             self.stopped = False
     
-    def set_motor(self, command: MotorCommand):
+    def set_motor(self, command: MotorCommand, trace: CommandTrace | None = None):
         """
         Set the speed of the tank's motors.
         Takes left and right speeds, -1000 to 1000.
@@ -235,8 +293,15 @@ class Motor:
             "left": 500,
             "right": -500
         }
+        trace: finished when the frame goes out on the wire
         """
 
+        left_speed, right_speed = self._speeds(command)
+        with self._state_lock:
+            return self._apply(left_speed, right_speed, trace)
+
+    def _speeds(self, command: MotorCommand) -> tuple[int, int]:
+        """Clamped wire speeds (left, right) of a command, 1234_0000 on either side is a stop."""
         if command.left == 1234_0000 or command.right == 1234_0000:
             command.left = 0
             command.right = 0
@@ -244,20 +309,23 @@ class Motor:
         command.left = self.clamp(command.left, -1000, 1000)
         command.right = self.clamp(command.right, -1000, 1000)
 
-        left_speed = int(-command.left)
-        right_speed = int(command.right)
+        return int(-command.left), int(command.right)
 
-        with self._state_lock:
-            self.last_update_time = time.time()
-            self.desired_left = left_speed
-            self.desired_right = right_speed
-            applied_left = self.applied_left
-            applied_right = self.applied_right
-            voltage = self.voltage
+    def _apply(self, left_speed: int, right_speed: int, trace: CommandTrace | None) -> dict:
+        """Hand the speeds to the io worker. Called with the state lock held."""
+        self.last_update_time = time.time()
+        self.desired_left = left_speed
+        self.desired_right = right_speed
+        if self._pending_command_time is None:
+            self._pending_command_time = time.perf_counter()
+        if trace is not None and len(self._pending_traces) < 32:
+            trace.set_motor = time.time()
+            self._pending_traces.append(trace)
+        self._notify_io()
 
         motor.debug(f'motor ran, left: {left_speed}, right: {right_speed}')
 
-        return {"status": "ok", "left": applied_left, "right": applied_right, 'voltage': voltage}
+        return {"status": "ok", "left": self.applied_left, "right": self.applied_right, 'voltage': self.voltage}
 
     def cleanup(self):
         self.stop()
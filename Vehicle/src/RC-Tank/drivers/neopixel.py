@@ -0,0 +1,58 @@
+"""
+NeoPixel (WS2812) encoding for the SPI bus: every LED bit becomes one SPI byte at
+6.4 MHz (1.25us/bit), so each color byte is looked up as 8 precomputed SPI bytes and
+written into a buffer that is reused for every frame.
+
+Kept free of `periphery` and `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+try:
+    import numpy as np
+except ImportError:  # only needed for pixels given as an array
+    np = None
+
+SPI_HZ = 6_400_000
+BIT_0 = 0b11000000  # ~0.31us high + 0.94us low
+BIT_1 = 0b11110000  # ~0.62us high + 0.62us low
+BYTES_PER_PIXEL = 24  # GRB, 8 SPI bytes per color byte
+RESET_BYTES = 80  # >=50us low
+
+
+def _make_bit_table() -> bytes:
+    """8 SPI bytes for every possible color byte, MSB first, back to back."""
+    table = bytearray()
+    for value in range(256):
+        table.extend(BIT_1 if value & (0x80 >> bit) else BIT_0 for bit in range(8))
+    return bytes(table)
+
+
+BIT_TABLE = _make_bit_table()  # BIT_TABLE[8 * value:8 * value + 8]
+_SLICES = tuple(BIT_TABLE[8 * value:8 * value + 8] for value in range(256))  # no slicing per color byte
+
+
+class NeoPixelEncoder:
+    """
+    Encodes RGB pixels into `buffer` (pixels then the reset pulse) in place and returns
+    it, ready for `SPI.transfer`. The reset bytes are never touched after __init__.
+
+    A list of (r, g, b) tuples goes through the byte table in pure Python. An (N, 3)
+    uint8 array, for long strips with animations computed in NumPy, is encoded with one
+    fancy index instead; converting a list to an array first costs more than it saves.
+    """
+
+    def __init__(self, num_pixels: int):
+        self.num_pixels = num_pixels
+        self.buffer = bytearray(num_pixels * BYTES_PER_PIXEL + RESET_BYTES)
+        self._size = num_pixels * BYTES_PER_PIXEL
+        if np is not None:
+            self._table = np.frombuffer(BIT_TABLE, dtype=np.uint8).reshape(256, 8)
+            self._pixels = np.frombuffer(self.buffer, dtype=np.uint8, count=self._size).reshape(num_pixels, 3, 8)
+
+    def encode(self, pixels) -> bytearray:
+        """pixels: num_pixels (r, g, b) ints 0-255, or an (num_pixels, 3) uint8 array."""
+        if np is not None and isinstance(pixels, np.ndarray):
+            self._pixels[:] = self._table[pixels[:, (1, 0, 2)]]
+            return self.buffer
+
+        slices = _SLICES
+        self.buffer[:self._size] = b"".join([slices[g] + slices[r] + slices[b] for r, g, b in pixels])
+        return self.buffer
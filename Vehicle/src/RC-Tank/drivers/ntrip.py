@@ -0,0 +1,220 @@
+"""
+NTRIP session manager. Keeps corrections flowing on a flaky link: watches correction
+age and throughput, reconnects with jittered exponential backoff, and rotates through
+the configured casters when one keeps failing.
+
+pygnssutils' own retry is turned off (it waits out a 10 s inactivity timeout and then
+backs off 10, 20, 40 s), every session is a fresh GNSSNTRIPClient.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from queue import Queue
+from typing import NamedTuple
+from pygnssutils import GNSSNTRIPClient
+
+from core.config import get_logger
+
+gps = get_logger("gps")
+
+
+class Caster(NamedTuple):
+    server: str
+    port: int
+    mountpoint: str
+    user: str | None = None  # None reads NTRIP_USER / NTRIP_PWD from .env
+    password: str | None = None
+
+    def __str__(self):
+        return f"{self.server}:{self.port}/{self.mountpoint}"
+
+
+class _SessionOutput(Queue):
+    """Looks like a Queue to GNSSNTRIPClient, counts RTCM for the session and passes everything on."""
+    def __init__(self, session: "NTRIPSession", output: Queue, generation: int):
+        super().__init__()
+        self.session = session
+        self.output = output
+        self.generation = generation
+
+    def put(self, item, block=True, timeout=None):
+        raw, parsed = item
+        if raw and raw[:1] == b"\xd3":  # RTCM3, not the GGA the client echoes
+            self.session._on_rtcm(self.generation, len(raw))
+        self.output.put(item, block, timeout)
+
+
+class NTRIPSession:
+    """
+    Runs GNSSNTRIPClient sessions one after another in its own thread, writing to `output`.
+
+    A session is dropped when it has delivered no RTCM `connect_timeout` s after
+    connecting, when the newest correction is `stall_timeout` s old, or when the last
+    `window` s carried less than `min_throughput` B/s. After `failures_per_caster` failed
+    sessions in a row the next caster is tried.
+
+    app: object with get_coordinates() for the GGA sent to the caster, like RoverContext
+    """
+
+    def __init__(self,
+                 app,
+                 output: Queue,
+                 casters: list[Caster],
+                 stall_timeout: float = 5.0,
+                 connect_timeout: float = 10.0,
+                 min_throughput: float = 0.0,
+                 window: float = 10.0,
+                 backoff_base: float = 1.0,
+                 backoff_cap: float = 30.0,
+                 failures_per_caster: int = 2,
+                 seed: int | None = None):
+        if not casters:
+            raise ValueError("NTRIPSession needs at least one caster")
+        self.app = app
+        self.output = output
+        self.casters = casters
+        self.stall_timeout = stall_timeout
+        self.connect_timeout = connect_timeout
+        self.min_throughput = min_throughput
+        self.window = window
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failures_per_caster = failures_per_caster
+        self._random = random.Random(seed)
+
+        self.caster_index = 0
+        self.state = "stopped"  # connecting, streaming, backoff, stopped
+        self.sessions = 0
+        self.failures = 0  # in a row, for the backoff
+        self.last_error: str | None = None
+        self._caster_failures = 0
+        self._generation = 0  # late output from an old client is not counted for the new one
+        self._session_start: float | None = None
+        self._last_rtcm: float | None = None  # time.time(), this session
+        self._rtcm_log: deque[tuple[float, int]] = deque()  # (time, bytes) over the last window
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    @property
+    def caster(self) -> Caster:
+        return self.casters[self.caster_index]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _on_rtcm(self, generation: int, size: int):
+        if generation != self._generation:
+            return
+        now = time.time()
+        with self._lock:
+            self._last_rtcm = now
+            self._rtcm_log.append((now, size))
+        if self.state == "connecting":
+            self.state = "streaming"
+            self.failures = 0
+            self._caster_failures = 0
+            gps.debug(f"NTRIP streaming from {self.caster} after {now - self._session_start:.2f} s")
+
+    def throughput(self) -> float:
+        """RTCM B/s over the last `window` s."""
+        now = time.time()
+        with self._lock:
+            while self._rtcm_log and self._rtcm_log[0][0] < now - self.window:
+                self._rtcm_log.popleft()
+            total = sum(size for _, size in self._rtcm_log)
+        span = min(self.window, now - self._session_start) if self._session_start else self.window
+        return total / span if span > 0 else 0.0
+
+    def stats(self) -> dict[str, str | float | int | None]:
+        now = time.time()
+        return {
+            "caster": str(self.caster),
+            "ntrip_state": self.state,
+            "ntrip_sessions": self.sessions,
+            "ntrip_uptime": now - self._session_start if self.state == "streaming" and self._session_start else None,  # s
+            "ntrip_rate": round(self.throughput(), 1),  # B/s
+            "ntrip_error": self.last_error,
+        }
+
+    def _connect(self, caster: Caster) -> GNSSNTRIPClient:
+        client = GNSSNTRIPClient(self.app, retries=0, timeout=max(1, int(self.stall_timeout)))
+        try:
+            client.run(
+                server=caster.server,
+                port=caster.port,
+                mountpoint=caster.mountpoint,
+                datatype="RTCM",
+                ntripuser=caster.user or os.getenv("NTRIP_USER", "anon"),
+                ntrippassword=caster.password or os.getenv("NTRIP_PWD", "password"),
+                ggainterval=10,
+                ggamode=0, # use live location from gps
+                output=_SessionOutput(self, self.output, self._generation),
+            )
+        except Exception:
+            client.stop()  # run() may have started its worker before it failed
+            raise
+        return client
+
+    def _watch(self, client: GNSSNTRIPClient) -> str | None:
+        """Block until the session should be dropped, returns why (None when stopping)."""
+        while not self._stop_event.wait(0.25):
+            now = time.time()
+            if not client.connected:
+                return "connection closed"
+            if self._last_rtcm is None:
+                if now - self._session_start > self.connect_timeout:
+                    return f"no corrections {self.connect_timeout:.0f} s after connecting"
+            elif now - self._last_rtcm > self.stall_timeout:
+                return f"corrections stalled for {now - self._last_rtcm:.1f} s"
+            if self.min_throughput and now - self._session_start > self.window and self.throughput() < self.min_throughput:
+                return f"throughput {self.throughput():.0f} B/s below {self.min_throughput:.0f} B/s"
+        return None
+
+    def run(self):
+        while not self._stop_event.is_set():
+            caster = self.caster
+            with self._lock:
+                self._generation += 1
+                self._last_rtcm = None
+                self._rtcm_log.clear()
+            self._session_start = time.time()
+            self.sessions += 1
+            self.state = "connecting"
+            gps.debug(f"NTRIP connecting to {caster} (session {self.sessions})")
+
+            client = None
+            try:
+                client = self._connect(caster)
+                reason = self._watch(client)
+            except Exception as e:
+                reason = f"{type(e).__name__}: {e}"
+            finally:
+                if client:
+                    client.stop()  # or its thread and socket outlive the session
+            if reason is None:
+                break
+
+            self.last_error = reason
+            self.failures += 1
+            self._caster_failures += 1
+            if self._caster_failures >= self.failures_per_caster and len(self.casters) > 1:
+                self.caster_index = (self.caster_index + 1) % len(self.casters)
+                self._caster_failures = 0
+
+            # Full jitter, so a fleet (or a modem coming back) doesn't reconnect in lockstep
+            delay = self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (self.failures - 1)))
+            gps.warning(f"NTRIP {caster}: {reason}, retrying {self.caster} in {delay:.1f} s")
+            self.state = "backoff"
+            self._stop_event.wait(delay)
+
+        self.state = "stopped"
@@ -0,0 +1,156 @@
+"""
+Data-ready synchronized sampling and heading filtering for the QMC5883P.
+
+Talks to the chip through the I2CDevice the adafruit driver already opened
+(`QMC5883P.i2c_device`), or anything else with `write`/`write_then_readinto` used as a
+context manager, like sim/compass.py. Kept free of `board` and `core` imports so the
+scripts in `Vehicle/scripts` can use it too.
+"""
+import math
+import struct
+import time
+from collections import deque
+from typing import NamedTuple
+
+# Registers, from the QMC5883P datasheet
+REG_XOUT_LSB = 0x01  # X, Y, Z as int16 little endian, 0x01-0x06
+REG_STATUS = 0x09
+REG_CONTROL1 = 0x0A
+REG_CONTROL2 = 0x0B
+
+STATUS_DRDY = 0x01
+STATUS_OVFL = 0x02
+
+MODE_CONTINUOUS = 0b11
+ODR_BITS = {10: 0b00, 50: 0b01, 100: 0b10, 200: 0b11}  # Hz
+RANGE_BITS = {30: 0b00, 12: 0b01, 8: 0b10, 2: 0b11}  # +- gauss
+LSB_PER_GAUSS = {30: 1000, 12: 2500, 8: 3750, 2: 15000}
+
+FIELD = struct.Struct("<hhh")
+
+
+class MagSample(NamedTuple):
+    timestamp: float  # time.time() the data-ready flag was seen
+    x: float  # gauss
+    y: float
+    z: float
+
+
+class BurstSampler:
+    """
+    Reads X/Y/Z in one 6 byte burst as soon as the chip flags data ready. Between
+    samples it sleeps until just before the next one is due, so polling the status
+    register costs one or two transactions per sample instead of a busy loop.
+
+    Args:
+    device: the I2C device, used as `with device: device.write_then_readinto(...)`
+    odr: output data rate in Hz, one of ODR_BITS
+    field_range: +- gauss, one of RANGE_BITS
+    """
+
+    def __init__(self, device, odr: int = 100, field_range: int = 8):
+        if odr not in ODR_BITS:
+            raise ValueError(f"QMC5883P has no {odr} Hz data rate, use one of {list(ODR_BITS)}")
+        self.device = device
+        self.odr = odr
+        self.field_range = field_range
+        self.period = 1 / odr
+        self._scale = 1 / LSB_PER_GAUSS[field_range]
+        self._status_reg = bytes((REG_STATUS,))
+        self._data_reg = bytes((REG_XOUT_LSB,))
+        self._status = bytearray(1)
+        self._data = bytearray(FIELD.size)
+        self._next_due: float | None = None  # perf_counter of the next expected sample
+
+        self.transactions = 0
+        self.samples = 0
+        self.overflows = 0
+        self.timeouts = 0
+
+    def configure(self):
+        """Continuous mode at `odr`, 8x oversampling (OSR1) and no downsampling (OSR2)."""
+        control1 = MODE_CONTINUOUS | ODR_BITS[self.odr] << 2 | 0b00 << 4 | 0b00 << 6
+        control2 = RANGE_BITS[self.field_range] << 2  # set/reset on
+        with self.device as i2c:
+            i2c.write(bytes((REG_CONTROL2, control2)))
+            i2c.write(bytes((REG_CONTROL1, control1)))
+        self.transactions += 2
+        self._next_due = None
+
+    def _wait_ready(self, deadline: float) -> int | None:
+        """Poll the status register until DRDY and read the data in the same bus lock, returns the status."""
+        now = time.perf_counter()
+        if self._next_due is not None and self._next_due > now:
+            time.sleep(self._next_due - now)
+        poll = self.period / 10
+        while True:
+            with self.device as i2c:
+                i2c.write_then_readinto(self._status_reg, self._status)
+                self.transactions += 1
+                status = self._status[0]
+                if status & STATUS_DRDY:
+                    i2c.write_then_readinto(self._data_reg, self._data)
+                    self.transactions += 1
+                    # Aim a little early for the next one, the chip's clock isn't ours
+                    self._next_due = time.perf_counter() + self.period * 0.9
+                    return status
+            if time.perf_counter() > deadline:
+                self._next_due = None
+                return None
+            time.sleep(poll)
+
+    def read(self, timeout: float = 0.5) -> MagSample | None:
+        """Block until the next sample, None if the chip didn't flag one within `timeout` s."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            status = self._wait_ready(deadline)
+            if status is None:
+                self.timeouts += 1
+                return None
+            if status & STATUS_OVFL:
+                self.overflows += 1  # saturated, try the next one
+                continue
+            self.samples += 1
+            x, y, z = FIELD.unpack(self._data)
+            scale = self._scale
+            return MagSample(time.time(), x * scale, y * scale, z * scale)
+
+
+class HeadingFilter:
+    """
+    Circular mean or median over the last `window` headings, so the filter doesn't
+    break where headings wrap from 359 to 0 degrees.
+
+    `add` returns (filtered heading in deg, variance in deg^2). The variance is the
+    squared circular standard deviation of the samples in the window, -2 ln R with R
+    the mean resultant length.
+    """
+
+    def __init__(self, window: int = 5, method: str = "mean"):
+        if method not in ("mean", "median"):
+            raise ValueError(f"Unknown heading filter {method}, use mean or median")
+        self.method = method
+        self._angles: deque[float] = deque(maxlen=window)  # rad
+        self._sin: deque[float] = deque(maxlen=window)
+        self._cos: deque[float] = deque(maxlen=window)
+
+    def add(self, heading: float) -> tuple[float, float]:
+        angle = math.radians(heading)
+        self._angles.append(angle)
+        self._sin.append(math.sin(angle))
+        self._cos.append(math.cos(angle))
+
+        n = len(self._angles)
+        s, c = sum(self._sin), sum(self._cos)
+        mean = math.atan2(s, c)
+        resultant = min(math.hypot(s, c) / n, 1.0)
+        variance = math.degrees(math.sqrt(-2 * math.log(resultant))) ** 2 if resultant > 0 else 180.0 ** 2
+
+        if self.method == "median":
+            # Median of the offsets from the mean, which are continuous around it
+            offsets = sorted((a - mean + math.pi) % (2 * math.pi) - math.pi for a in self._angles)
+            middle = n // 2
+            offset = offsets[middle] if n % 2 else (offsets[middle - 1] + offsets[middle]) / 2
+            mean += offset
+
+        return math.degrees(mean) % 360, variance
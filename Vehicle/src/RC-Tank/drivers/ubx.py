@@ -0,0 +1,224 @@
+"""
+Lightweight UBX/NMEA frame splitter with a precompiled NAV-PVT decoder for the ZED-F9P.
+Only NAV-PVT is decoded here, everything else is skipped without building objects
+and only handed to pyubx2 when asked.
+
+Kept free of `core` imports so the scripts in `Vehicle/scripts` can use it too.
+"""
+import calendar
+import struct
+from collections import deque
+from typing import NamedTuple
+
+UBX_SYNC = b"\xb5\x62"
+NMEA_START = ord("$")
+NAV_PVT_ID = (0x01, 0x07)  # class, id
+MAX_UBX_PAYLOAD = 4096  # anything longer is a false sync
+MAX_NMEA_LENGTH = 100  # 82 by the spec, some receivers go a bit over
+
+# UBX-NAV-PVT payload, 92 bytes (u-blox F9 HPG interface description)
+NAV_PVT = struct.Struct("<IHBBBBBBIiBBBBiiiiIIiiiiiIIHH4xihH")
+
+
+class NavPvt(NamedTuple):
+    """Decoded NAV-PVT, with the same field names and scaling pyubx2 uses."""
+    iTOW: int  # ms
+    year: int  # UTC
+    month: int
+    day: int
+    hour: int
+    min: int
+    second: int
+    validDate: int
+    validTime: int
+    nano: int  # ns, can be negative
+    fixType: int
+    gnssFixOk: int
+    diffSoln: int
+    carrSoln: int  # 0 = none, 1 = float, 2 = fixed
+    numSV: int
+    lon: float  # deg
+    lat: float  # deg
+    height: int  # mm
+    hMSL: int  # mm
+    hAcc: int  # mm
+    vAcc: int  # mm
+    velN: int  # mm/s
+    velE: int  # mm/s
+    velD: int  # mm/s
+    gSpeed: int  # mm/s
+    headMot: float  # deg
+    sAcc: int  # mm/s
+    headAcc: float  # deg
+    lastCorrectionAge: int  # enum, 0 = not available, 1 = < 1 s, 2 = 1-2 s, ...
+
+    identity = "NAV-PVT"  # like pyubx2's UBXMessage.identity, not a field
+
+
+def ubx_checksum(data, start: int, end: int) -> tuple[int, int]:
+    """8-bit Fletcher checksum over data[start:end] (class, id, length and payload)."""
+    ck_a = ck_b = 0
+    for i in range(start, end):
+        ck_a = (ck_a + data[i]) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return ck_a, ck_b
+
+
+def decode_nav_pvt(payload, offset: int = 0) -> NavPvt:
+    (iTOW, year, month, day, hour, minute, second, valid, _tAcc, nano,
+     fixType, flags, _flags2, numSV, lon, lat, height, hMSL, hAcc, vAcc,
+     velN, velE, velD, gSpeed, headMot, sAcc, headAcc, _pDOP, flags3,
+     _headVeh, _magDec, _magAcc) = NAV_PVT.unpack_from(payload, offset)
+    return NavPvt(
+        iTOW=iTOW,
+        year=year,
+        month=month,
+        day=day,
+        hour=hour,
+        min=minute,
+        second=second,
+        validDate=valid & 0x01,
+        validTime=(valid >> 1) & 0x01,
+        nano=nano,
+        fixType=fixType,
+        gnssFixOk=flags & 0x01,
+        diffSoln=(flags >> 1) & 0x01,
+        carrSoln=(flags >> 6) & 0x03,
+        numSV=numSV,
+        lon=lon / 1e7,
+        lat=lat / 1e7,
+        height=height,
+        hMSL=hMSL,
+        hAcc=hAcc,
+        vAcc=vAcc,
+        velN=velN,
+        velE=velE,
+        velD=velD,
+        gSpeed=gSpeed,
+        headMot=headMot / 1e5,
+        sAcc=sAcc,
+        headAcc=headAcc / 1e5,
+        lastCorrectionAge=(flags3 >> 1) & 0x0F,
+    )
+
+
+def epoch_time(pvt) -> float | None:
+    """
+    UTC time of the navigation epoch as a Unix timestamp, comparable with time.time().
+    Works on NavPvt and pyubx2's NAV-PVT. None until the receiver has a valid date and time.
+    """
+    if not (pvt.validDate and pvt.validTime):
+        return None
+    return calendar.timegm((pvt.year, pvt.month, pvt.day, pvt.hour, pvt.min, pvt.second)) + pvt.nano / 1e9
+
+
+class FrameSplitter:
+    """
+    Incremental splitter for a mixed UBX/NMEA byte stream. `feed` returns
+    (protocol, raw) tuples for every complete frame, where protocol is "UBX" or
+    "NMEA". UBX frames are only returned when the checksum matches. Partial
+    frames wait for the next `feed`, and garbage is skipped up to the next sync.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.ubx_frames = 0
+        self.nmea_frames = 0
+        self.checksum_errors = 0
+        self.bytes_skipped = 0
+
+    def feed(self, data) -> list[tuple[str, bytes]]:
+        buffer = self._buffer
+        buffer += data
+        frames: list[tuple[str, bytes]] = []
+        pos = 0
+        size = len(buffer)
+
+        while pos < size:
+            ubx = buffer.find(UBX_SYNC, pos)
+            nmea = buffer.find(b"$", pos, ubx if ubx >= 0 else size)
+            start = nmea if nmea >= 0 else ubx
+            if start < 0:
+                keep = 1 if buffer[-1] == UBX_SYNC[0] else 0  # could be the first sync byte
+                self.bytes_skipped += size - pos - keep
+                pos = size - keep
+                break
+            self.bytes_skipped += start - pos
+            pos = start
+
+            if buffer[start] == NMEA_START:
+                # NMEA is ASCII, a UBX sync means the sentence was cut short, don't run into the frame
+                limit = start + MAX_NMEA_LENGTH if ubx < 0 else min(ubx, start + MAX_NMEA_LENGTH)
+                end = buffer.find(b"\r\n", start, limit)
+                if end < 0:
+                    if ubx >= 0 and ubx < start + MAX_NMEA_LENGTH:
+                        self.bytes_skipped += ubx - start
+                        pos = ubx
+                        continue
+                    if size - start < MAX_NMEA_LENGTH:
+                        break  # wait for the rest of the sentence
+                    self.bytes_skipped += 1
+                    pos = start + 1
+                    continue
+                frames.append(("NMEA", bytes(buffer[start:end + 2])))
+                self.nmea_frames += 1
+                pos = end + 2
+                continue
+
+            if size - start < 6:
+                break
+            length = buffer[start + 4] | (buffer[start + 5] << 8)
+            if length > MAX_UBX_PAYLOAD:
+                self.bytes_skipped += 1
+                pos = start + 1
+                continue
+            end = start + 6 + length + 2
+            if size < end:
+                break
+            if ubx_checksum(buffer, start + 2, end - 2) != (buffer[end - 2], buffer[end - 1]):
+                self.checksum_errors += 1
+                self.bytes_skipped += 1
+                pos = start + 1
+                continue
+            frames.append(("UBX", bytes(buffer[start:end])))
+            self.ubx_frames += 1
+            pos = end
+
+        del buffer[:pos]
+        return frames
+
+
+class FastGNSSReader:
+    """
+    Drop-in for pygnssutils' GNSSReader in `GPS.update_gps_thread`: `read()` returns
+    (raw, parsed) for one message at a time. NAV-PVT is decoded with `decode_nav_pvt`,
+    other UBX classes in `parse_ids` go through pyubx2, and everything else comes back
+    with parsed = None. Returns (None, None) when the serial read times out.
+    """
+
+    def __init__(self, stream, parse_ids: set[tuple[int, int]] | None = None):
+        self.stream = stream
+        self.splitter = FrameSplitter()
+        self.parse_ids = parse_ids or set()
+        self._pending: deque[tuple[str, bytes]] = deque()
+
+    def _parse(self, protocol: str, raw: bytes):
+        if protocol != "UBX":
+            return None
+        msg_id = (raw[2], raw[3])
+        if msg_id == NAV_PVT_ID and len(raw) == 8 + NAV_PVT.size:
+            return decode_nav_pvt(raw, 6)
+        if msg_id in self.parse_ids:
+            from pyubx2 import UBXReader  # only needed when asked for
+            return UBXReader.parse(raw)
+        return None
+
+    def read(self):
+        while not self._pending:
+            data = self.stream.read(max(1, self.stream.in_waiting))
+            if not data:
+                return None, None
+            self._pending.extend(self.splitter.feed(data))
+
+        protocol, raw = self._pending.popleft()
+        return raw, self._parse(protocol, raw)
@@ -0,0 +1,279 @@
+"""
+Pose estimator for waypoint navigation: an extended Kalman filter over
+[east m, north m, heading rad, speed m/s, yaw rate rad/s] in a local tangent plane
+around the first GNSS fix.
+
+Fuses NAV-PVT position and velocity (weighted by hAcc / sAcc), compass heading and
+ESC wheel speed, and predicts forward every control tick, so navigation gets a
+timestamped pose at the control rate instead of whatever sensor updated last.
+Heading follows states.heading: degrees clockwise from north.
+"""
+import math
+import threading
+import time
+from collections import deque
+import numpy as np
+
+from core import states
+from core.config import get_logger
+from core.types import Pose
+
+self_driving = get_logger("self_driving")
+
+EARTH_RADIUS = 6_378_137  # m, same as WaypointNavigation
+E, N, PSI, V, W = range(5)  # state indices
+
+
+def wrap_angle(angle: float) -> float:
+  """-pi..pi"""
+  return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+class PoseEKF:
+  """
+  The filter itself, no I/O, so it can be benchmarked and replayed.
+
+  Args:
+  accel_noise: m/s^2, how fast the speed may change between steps
+  yaw_accel_noise: rad/s^2, how fast the yaw rate may change
+  """
+
+  def __init__(self, accel_noise: float = 1.0, yaw_accel_noise: float = 2.0):
+    self.accel_noise = accel_noise
+    self.yaw_accel_noise = yaw_accel_noise
+    self.x = np.zeros(5)
+    self.P = np.diag([1e6, 1e6, math.pi ** 2, 1.0, 1.0])
+    self._I = np.eye(5)
+    self._F = np.eye(5)
+    self._Q = np.zeros((5, 5))
+    self._H_position = np.zeros((2, 5))
+    self._H_position[0, E] = self._H_position[1, N] = 1
+    self._H_heading = np.zeros((1, 5))
+    self._H_heading[0, PSI] = 1
+    self._H_odometry = np.zeros((2, 5))
+    self._H_odometry[0, V] = self._H_odometry[1, W] = 1
+    self._H_velocity = np.zeros((2, 5))
+
+  def initialize(self, east: float, north: float, position_std: float, heading: float | None = None, heading_std: float = math.pi):
+    self.x[:] = (east, north, wrap_angle(heading or 0.0), 0.0, 0.0)
+    self.P = np.diag([position_std ** 2, position_std ** 2, heading_std ** 2 if heading is not None else math.pi ** 2, 1.0, 1.0])
+
+  def predict(self, dt: float):
+    """Constant speed and yaw rate over dt s."""
+    if dt <= 0:
+      return
+    x = self.x
+    sin_psi, cos_psi = math.sin(x[PSI]), math.cos(x[PSI])
+    F = self._F
+    F[E, PSI] = x[V] * cos_psi * dt
+    F[E, V] = sin_psi * dt
+    F[N, PSI] = -x[V] * sin_psi * dt
+    F[N, V] = cos_psi * dt
+    F[PSI, W] = dt
+
+    x[E] += x[V] * sin_psi * dt
+    x[N] += x[V] * cos_psi * dt
+    x[PSI] = wrap_angle(x[PSI] + x[W] * dt)
+
+    Q = self._Q
+    Q[V, V] = (self.accel_noise * dt) ** 2
+    Q[W, W] = (self.yaw_accel_noise * dt) ** 2
+    self.P = F @ self.P @ F.T + Q
+
+  def _update(self, innovation: np.ndarray, H: np.ndarray, R: np.ndarray):
+    PHt = self.P @ H.T
+    S = H @ PHt + R
+    K = PHt @ np.linalg.inv(S)
+    self.x += K @ innovation
+    self.x[PSI] = wrap_angle(self.x[PSI])
+    # Joseph form, stays symmetric positive definite with the large GNSS weight changes
+    IKH = self._I - K @ H
+    self.P = IKH @ self.P @ IKH.T + K @ R @ K.T
+
+  def update_position(self, east: float, north: float, std: float):
+    innovation = np.array((east - self.x[E], north - self.x[N]))
+    self._update(innovation, self._H_position, np.eye(2) * std ** 2)
+
+  def update_velocity(self, vel_east: float, vel_north: float, std: float):
+    """GNSS velocity, which also observes heading while moving."""
+    x = self.x
+    sin_psi, cos_psi = math.sin(x[PSI]), math.cos(x[PSI])
+    H = self._H_velocity
+    H[0, PSI] = x[V] * cos_psi
+    H[0, V] = sin_psi
+    H[1, PSI] = -x[V] * sin_psi
+    H[1, V] = cos_psi
+    innovation = np.array((vel_east - x[V] * sin_psi, vel_north - x[V] * cos_psi))
+    self._update(innovation, H, np.eye(2) * std ** 2)
+
+  def update_heading(self, heading: float, std: float):
+    innovation = np.array((wrap_angle(heading - self.x[PSI]),))
+    self._update(innovation, self._H_heading, np.array(((std ** 2,),)))
+
+  def update_odometry(self, speed: float, yaw_rate: float, speed_std: float, yaw_rate_std: float):
+    innovation = np.array((speed - self.x[V], yaw_rate - self.x[W]))
+    self._update(innovation, self._H_odometry, np.diag((speed_std ** 2, yaw_rate_std ** 2)))
+
+
+class PoseEstimator:
+  """
+  Runs PoseEKF at the control rate and publishes states.pose.
+
+  NAV-PVT comes from `gps.last_pvt`, the compass from states.heading / heading_time
+  (written by Compass.update_compass_thread), wheel speed from `motors.feedback`.
+  Each source is fused once per new sample, every tick predicts to now.
+
+  Args:
+  rate: Hz, WaypointNavigation steers every 10 ms
+  track_width: m between the track centers, for the yaw rate from the wheel speeds
+  compass_std: deg
+  wheel_speed_std: m/s, tracks slip, so this is loose
+  yaw_rate_std: deg/s, skid steering turns slower than the wheel speeds say
+  """
+
+  def __init__(self,
+               gps=None,
+               motors=None,
+               rate: float = 100,
+               track_width: float = 0.5,
+               compass_std: float = 5.0,
+               wheel_speed_std: float = 0.2,
+               yaw_rate_std: float = 20.0,
+               max_gnss_lag: float = 0.5):
+    self.gps = gps
+    self.motors = motors
+    self.rate = rate
+    self.track_width = track_width
+    self.compass_std = math.radians(compass_std)
+    self.wheel_speed_std = wheel_speed_std
+    self.yaw_rate_std = math.radians(yaw_rate_std)
+    self.max_gnss_lag = max_gnss_lag
+
+    self.ekf = PoseEKF()
+    self.origin: tuple[float, float] | None = None  # lat, lon of the local plane
+    self._meters_per_deg_lon = 0.0
+    self._meters_per_deg_lat = math.radians(1) * EARTH_RADIUS
+    self._time: float | None = None  # time.time() the filter state is at
+    self._last_pvt_time = 0.0
+    self._last_fused_time: float | None = None  # fix time of the last NAV-PVT good enough to fuse
+    self._last_heading_time = 0.0
+    self._last_wheel_time = 0.0
+
+    self.step_times: deque[float] = deque(maxlen=1000)  # s per step
+    self._stop_event = threading.Event()
+
+  def to_local(self, lat: float, lon: float) -> tuple[float, float]:
+    assert self.origin
+    return (lon - self.origin[1]) * self._meters_per_deg_lon, (lat - self.origin[0]) * self._meters_per_deg_lat
+
+  def to_global(self, east: float, north: float) -> tuple[float, float]:
+    assert self.origin
+    return self.origin[0] + north / self._meters_per_deg_lat, self.origin[1] + east / self._meters_per_deg_lon
+
+  def _fuse_gnss(self, now: float):
+    last = getattr(self.gps, "last_pvt", None)
+    if last is None or last[0] == self._last_pvt_time:
+      return
+    fix_time, pvt = last
+    self._last_pvt_time = fix_time
+    if pvt.fixType < 2 or not pvt.gnssFixOk:
+      return
+    position_std = max(pvt.hAcc / 1000, 0.01)
+    speed_std = max(pvt.sAcc / 1000, 0.05)
+    vel_north, vel_east = pvt.velN / 1000, pvt.velE / 1000
+
+    if self.origin is None:
+      self.origin = (pvt.lat, pvt.lon)
+      self._meters_per_deg_lon = self._meters_per_deg_lat * math.cos(math.radians(pvt.lat))
+      heading = math.radians(states.heading) if states.heading_time else None
+      self.ekf.initialize(0.0, 0.0, position_std, heading, self.compass_std)
+      self._time = now
+      self._last_fused_time = fix_time
+      self_driving.debug(f"Pose estimator origin {self.origin}")
+      return
+
+    # Move the fix to now along its own velocity (fix_time is on the host clock, see GPS.handle_nav_pvt)
+    lag = min(max(now - fix_time, 0.0), self.max_gnss_lag)
+    east, north = self.to_local(pvt.lat, pvt.lon)
+    self.ekf.update_position(east + vel_east * lag, north + vel_north * lag, position_std)
+    self.ekf.update_velocity(vel_east, vel_north, speed_std)
+    self._last_fused_time = fix_time
+
+  def _fuse_compass(self):
+    heading_time = states.heading_time
+    if not heading_time or heading_time == self._last_heading_time:
+      return
+    self._last_heading_time = heading_time
+    self.ekf.update_heading(math.radians(states.heading), self.compass_std)
+
+  def _fuse_wheels(self):
+    feedback = getattr(self.motors, "feedback", None)
+    if not feedback or 0 not in feedback or 1 not in feedback:
+      return
+    left, right = feedback[0], feedback[1]
+    newest = max(left.timestamp, right.timestamp)
+    if newest == self._last_wheel_time:
+      return
+    self._last_wheel_time = newest
+    # km/h from the ESCs, the left motor is mounted mirrored (Motor.set_motor negates it)
+    left_speed = -left.speed / 3.6
+    right_speed = right.speed / 3.6
+    # Heading is clockwise, so the left track running faster turns right (positive)
+    self.ekf.update_odometry((left_speed + right_speed) / 2, (left_speed - right_speed) / self.track_width,
+                             self.wheel_speed_std, self.yaw_rate_std)
+
+  def step(self, now: float | None = None) -> Pose | None:
+    """One control tick: predict to now, fuse whatever is new, publish states.pose."""
+    start = time.perf_counter()
+    now = now or time.time()
+    if self.origin is None:
+      self._fuse_gnss(now)
+      return None
+
+    self.ekf.predict(now - self._time)
+    self._time = now
+    self._fuse_gnss(now)
+    self._fuse_compass()
+    self._fuse_wheels()
+
+    x = self.ekf.x
+    lat, lon = self.to_global(x[E], x[N])
+    pose = Pose(
+      timestamp=now,
+      lat=lat,
+      lon=lon,
+      heading=math.degrees(x[PSI]) % 360,
+      speed=x[V],
+      yaw_rate=math.degrees(x[W]),
+      covariance=self.ekf.P.tolist(),
+      gnss_time=self._last_fused_time,
+    )
+    states.pose = pose
+
+    self.step_times.append(time.perf_counter() - start)
+    return pose
+
+  def stats(self) -> dict[str, float | None]:
+    times = sorted(self.step_times)
+    return {
+      "pose_step_us_p50": times[len(times) // 2] * 1e6 if times else None,
+      "pose_step_us_max": times[-1] * 1e6 if times else None,
+    }
+
+  def stop(self):
+    self._stop_event.set()
+
+  def update_pose_thread(self):
+    period = 1 / self.rate
+    next_tick = time.perf_counter()
+    while not self._stop_event.is_set():
+      try:
+        self.step()
+      except Exception as e:
+        self_driving.error(f"Pose estimator step failed: {e}")
+      next_tick += period
+      delay = next_tick - time.perf_counter()
+      if delay > 0:
+        self._stop_event.wait(delay)
+      else:
+        next_tick = time.perf_counter()  # fell behind, don't try to catch up
@@ -10,6 +10,9 @@ from dotenv import load_dotenv
 
 self_driving = get_logger("self_driving")
 
+POSE_TIMEOUT = 0.5 # s, older poses mean the estimator stopped, steer from the raw sensors
+GNSS_TIMEOUT = 2.0 # s without a GNSS fix, dead reckoning on the tracks and compass drifts too far to steer on
+
 class WaypointNavigation:
   def __init__(self):
     pass
@@ -31,6 +34,7 @@ class WaypointNavigation:
     derivative = 0
     control = 0
     previous_error = 0
+    waiting_for_gnss = False
 
     # KP = 1
     # KI = 0
@@ -41,7 +45,7 @@ class WaypointNavigation:
       last_time = time.time()
 
       # when more than x meters away form waypoint, keep trying to drive to it
-      while self._calc_distance(waypoint, states.gps_location) > success_distance:
+      while self._calc_distance(waypoint, self._position()) > success_distance:
         if self.mode != 1:
           self_driving.debug("Shouldn't be in self driving mode! Stopping.")
           if services.motors:
@@ -54,8 +58,20 @@ class WaypointNavigation:
         KD = float(os.getenv("KD", "0"))
 
         # self_driving.debug(f"Going to waypoint {waypoint}")
-        bearing_to_waypoint = self._calc_bearing_to_waypoint(states.gps_location, waypoint)
-        heading = states.heading
+        pose = self._pose()
+        if self._gnss_age(pose) > GNSS_TIMEOUT:
+          # Lost GNSS: stand still until it's back instead of steering on a guess
+          if not waiting_for_gnss:
+            self_driving.warning(f"No GNSS fix for {GNSS_TIMEOUT} s, stopping until it's back")
+            waiting_for_gnss = True
+          if services.motors:
+            services.motors.set_motor(MotorCommand(left=0, right=0))
+          sleep(.1)
+          last_time = time.time()  # no PID step across the wait
+          continue
+        waiting_for_gnss = False
+        bearing_to_waypoint = self._calc_bearing_to_waypoint(pose or states.gps_location, waypoint)
+        heading = pose.heading if pose else states.heading
 
         difference = bearing_to_waypoint - heading
 
@@ -110,6 +126,21 @@ class WaypointNavigation:
           self_driving.debug("Was unable to set motor speed")
         sleep(.01)
   
+  def _pose(self):
+    """Fused pose from the estimator, None if it isn't running."""
+    pose = states.pose
+    if pose and time.time() - pose.timestamp < POSE_TIMEOUT:
+      return pose
+    return None
+
+  def _gnss_age(self, pose) -> float:
+    """s since the GNSS fix steering is based on, the last one the estimator fused if it runs."""
+    fix_time = pose.gnss_time if pose else states.gps_fix_time
+    return time.time() - fix_time if fix_time else math.inf
+
+  def _position(self):
+    return self._pose() or states.gps_location
+
   def _calc_bearing_to_waypoint(self, current: Location, waypoint: Location):
     lat1 = math.radians(current.lat)
     lat2 = math.radians(waypoint.lat)
@@ -0,0 +1,134 @@
+"""
+Stand-in for the QMC5883P behind an adafruit I2CDevice, so drivers/qmc5883p.py can be
+benchmarked without the I2C bus.
+
+    sensor = QMC5883PSimulator(odr=100, noise=0.03)
+    sampler = BurstSampler(sensor, odr=100)
+
+Samples come out at the configured data rate on the chip's own (slightly wrong) clock,
+DRDY in the status register is cleared by reading the data, and every transaction
+takes as long as its bytes need on a `bus_hz` I2C bus.
+"""
+import math
+import random
+import threading
+import time
+
+from drivers.qmc5883p import FIELD, LSB_PER_GAUSS, ODR_BITS, REG_CONTROL1, REG_STATUS, REG_XOUT_LSB, STATUS_DRDY
+
+
+class QMC5883PSimulator:
+    """
+    Args:
+    odr: Hz until the host writes CONTROL1
+    heading: deg at t=0, atan2(x, y) of the field
+    rotation_rate: deg/s the tank turns
+    noise: gauss, per axis and sample
+    spike_rate: fraction of samples hit by a `spike` deg heading error (motor switching)
+    hard_iron: gauss added to every reading, like a magnetized part near the chip
+    soft_iron: 3x3 applied to the earth field before that, like steel bending it
+    clock_error: relative error of the chip's sample clock
+    """
+
+    def __init__(self,
+                 odr: int = 100,
+                 heading: float = 0.0,
+                 rotation_rate: float = 0.0,
+                 field: float = 0.5,
+                 noise: float = 0.0,
+                 spike_rate: float = 0.0,
+                 spike: float = 30.0,
+                 hard_iron: tuple[float, float, float] = (0.0, 0.0, 0.0),
+                 soft_iron: tuple[tuple[float, float, float], ...] = ((1, 0, 0), (0, 1, 0), (0, 0, 1)),
+                 clock_error: float = 0.01,
+                 bus_hz: int = 400_000,
+                 seed: int | None = None):
+        self.heading = heading
+        self.rotation_rate = rotation_rate
+        self.field = field
+        self.noise = noise
+        self.spike_rate = spike_rate
+        self.spike = spike
+        self.hard_iron = hard_iron
+        self.soft_iron = soft_iron
+        self.clock_error = clock_error
+        self.bus_hz = bus_hz
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._lsb = LSB_PER_GAUSS[8]
+        self._set_odr(odr)
+
+        self._last_read = -1  # index of the last sample the host read
+        self._cached: tuple[int, bytes] | None = None
+
+        self.transactions = 0
+        self.bus_time = 0.0  # s the bus was busy
+
+    def _set_odr(self, odr: int):
+        self.odr = odr
+        self._period = 1 / odr * (1 + self.clock_error)
+        self._start = time.perf_counter()
+        self._last_read = -1
+
+    def heading_at(self, t: float) -> float:
+        """True heading at perf_counter() t, deg."""
+        return (self.heading + self.rotation_rate * (t - self._start)) % 360
+
+    def field_at(self, heading: float, pitch: float = 0.0, roll: float = 0.0) -> tuple[float, float, float]:
+        """Distorted reading in gauss with the tank at `heading` (atan2(x, y) of the undistorted field), degrees."""
+        angle, pitch, roll = math.radians(heading), math.radians(pitch), math.radians(roll)
+        x, y, z = self.field * math.sin(angle), self.field * math.cos(angle), -0.4
+        # Tilt around the x (pitch) then y (roll) axis
+        y, z = y * math.cos(pitch) - z * math.sin(pitch), y * math.sin(pitch) + z * math.cos(pitch)
+        x, z = x * math.cos(roll) + z * math.sin(roll), -x * math.sin(roll) + z * math.cos(roll)
+        return tuple(sum(m * v for m, v in zip(row, (x, y, z))) + offset for row, offset in zip(self.soft_iron, self.hard_iron))
+
+    def sample_time(self, index: int) -> float:
+        return self._start + (index + 1) * self._period
+
+    def _index(self) -> int:
+        return int((time.perf_counter() - self._start) / self._period) - 1
+
+    def _sample(self, index: int) -> bytes:
+        if self._cached and self._cached[0] == index:
+            return self._cached[1]
+        heading = self.heading_at(self.sample_time(index))
+        if self.spike_rate and self._random.random() < self.spike_rate:
+            heading += self._random.choice((-1, 1)) * self.spike
+        x, y, z = (v + self._random.gauss(0, self.noise) for v in self.field_at(heading))
+        data = FIELD.pack(*(max(-32768, min(32767, round(v * self._lsb))) for v in (x, y, z)))
+        self._cached = (index, data)
+        return data
+
+    def _transfer(self, size: int):
+        """Address + register + data bytes, 9 clocks each."""
+        duration = (size + 2) * 9 / self.bus_hz
+        self.transactions += 1
+        self.bus_time += duration
+        time.sleep(duration)  # the i2c-dev ioctl blocks too
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+    def write(self, buffer: bytes):
+        self._transfer(len(buffer))
+        if buffer[0] == REG_CONTROL1:
+            odr_bits = buffer[1] >> 2 & 0b11
+            self._set_odr({bits: odr for odr, bits in ODR_BITS.items()}[odr_bits])
+
+    def write_then_readinto(self, out_buffer: bytes, in_buffer: bytearray):
+        self._transfer(len(out_buffer) + len(in_buffer))
+        register = out_buffer[0]
+        index = self._index()
+        if register == REG_STATUS:
+            in_buffer[0] = STATUS_DRDY if index > self._last_read else 0
+        elif register == REG_XOUT_LSB:
+            if index >= 0:
+                in_buffer[:FIELD.size] = self._sample(index)
+                self._last_read = index
+        else:
+            raise ValueError(f"QMC5883PSimulator can't read register {register:#04x}")
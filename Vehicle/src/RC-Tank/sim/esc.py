@@ -0,0 +1,192 @@
+"""
+Stand-in for the two hoverboard ESCs on a pseudo-terminal, so drivers/motor.py can be
+benchmarked and tested without /dev/ttyTHS1.
+
+    with ESCSimulator() as esc:
+        motors = Motor(port=esc.port)
+"""
+import os
+import random
+import select
+import termios
+import threading
+import time
+import tty
+from typing import NamedTuple
+
+from drivers.hover_protocol import (
+    CONTROL_FRAME, CONTROL_FRAME_SIZE, DATA_TYPE_SPEED, START_BYTE, calc_crc, pack_feedback,
+)
+
+
+class ReceivedFrame(NamedTuple):
+    """A control frame as it arrived at the simulated ESC."""
+    arrival: float  # time.perf_counter()
+    slave: int
+    speed: int
+    state: int
+
+
+class ESCSimulator:
+    """
+    Opens a pty pair, decodes `SerialServer2Hover` frames written to `port` and
+    answers with `SerialHover2Server` feedback frames.
+
+    Args:
+    feedback_rate: Hz per slave, or None to answer every received frame like `AnswerMaster` does
+    noise: probability of writing a few garbage bytes before a feedback frame
+    truncate: probability of cutting a feedback frame short
+    baudrate: only understand the host when it opened `port` at this rate (like a real
+    UART at the wrong speed), None accepts any rate
+    pace: don't send feedback faster than `baudrate` can carry it (a pty has no line rate),
+    feedback due while the line is still busy is skipped like the firmware does
+    """
+
+    def __init__(self,
+                 slaves: tuple[int, ...] = (0, 1),
+                 feedback_rate: float | None = None,
+                 noise: float = 0.0,
+                 truncate: float = 0.0,
+                 voltage: float = 36.0,
+                 baudrate: int | None = None,
+                 pace: bool = False,
+                 seed: int | None = None):
+        self.slaves = slaves
+        self.feedback_rate = feedback_rate
+        self.noise = noise
+        self.truncate = truncate
+        self.voltage = voltage
+        self._speed_flag = getattr(termios, f"B{baudrate}") if baudrate else None
+        self._random = random.Random(seed)
+        self._byte_time = 10 / baudrate if pace and baudrate else 0.0  # s per byte, 8N1
+        self._tx_busy_until = 0.0
+
+        self._master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+
+        self._rx = bytearray()
+        self._speeds = {slave: 0 for slave in slaves}
+        self._odom = {slave: 0 for slave in slaves}
+
+        self.received: list[ReceivedFrame] = []
+        self.crc_errors = 0
+        self.feedback_sent = 0
+        self.feedback_corrupted = 0
+        self.feedback_skipped = 0  # line still busy, with pace
+        self.cpu_time = 0.0  # thread CPU spent by the simulator itself, in s
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2)
+        os.close(self._master_fd)
+        os.close(self._slave_fd)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _baud_matches(self) -> bool:
+        if self._speed_flag is None:
+            return True
+        return termios.tcgetattr(self._slave_fd)[5] == self._speed_flag  # ospeed set by the host
+
+    def _decode_control(self) -> list[ReceivedFrame]:
+        buffer = self._rx
+        frames: list[ReceivedFrame] = []
+        now = time.perf_counter()
+        pos = 0
+        while True:
+            start = buffer.find(START_BYTE, pos)
+            if start < 0:
+                pos = len(buffer)
+                break
+            if len(buffer) - start < CONTROL_FRAME_SIZE:
+                pos = start
+                break
+            _, data_type, slave, speed, state, crc = CONTROL_FRAME.unpack_from(buffer, start)
+            if data_type != DATA_TYPE_SPEED or calc_crc(buffer, start, start + CONTROL_FRAME_SIZE - 2) != crc:
+                self.crc_errors += 1
+                pos = start + 1
+                continue
+            frames.append(ReceivedFrame(now, slave, speed, state))
+            pos = start + CONTROL_FRAME_SIZE
+        del buffer[:pos]
+        return frames
+
+    def _feedback(self, slave: int) -> bytes:
+        speed = self._speeds.get(slave, 0)
+        self._odom[slave] = self._odom.get(slave, 0) + 1
+        frame = pack_feedback(
+            slave,
+            speed=speed / 100.0,
+            voltage=self.voltage + self._random.uniform(-0.05, 0.05),
+            current=abs(speed) / 500.0,
+            odom=self._odom[slave],
+        )
+        self.feedback_sent += 1
+
+        if self.noise and self._random.random() < self.noise:
+            frame = bytes(self._random.getrandbits(8) for _ in range(self._random.randint(1, 6))) + frame
+            self.feedback_corrupted += 1
+        if self.truncate and self._random.random() < self.truncate:
+            frame = frame[:self._random.randint(1, len(frame) - 1)]
+            self.feedback_corrupted += 1
+        return frame
+
+    def _run(self):
+        period = 1 / self.feedback_rate if self.feedback_rate else None
+        next_feedback = time.perf_counter()
+        cpu_start = time.thread_time()
+
+        while not self._stop_event.is_set():
+            timeout = 0.05
+            if period is not None:
+                timeout = max(0.0, min(timeout, next_feedback - time.perf_counter()))
+
+            readable, _, _ = select.select([self._master_fd], [], [], timeout)
+            out = bytearray()
+            frames_out = 0
+            if readable:
+                try:
+                    data = os.read(self._master_fd, 4096)
+                except OSError:
+                    break
+                if not self._baud_matches():
+                    continue  # wrong rate, a real UART would only see framing errors
+                self._rx += data
+                for frame in self._decode_control():
+                    self.received.append(frame)
+                    self._speeds[frame.slave] = frame.speed
+                    if period is None and frame.slave in self.slaves:
+                        out += self._feedback(frame.slave)
+                        frames_out += 1
+
+            if period is not None and time.perf_counter() >= next_feedback:
+                next_feedback += period
+                if self._baud_matches():
+                    for slave in self.slaves:
+                        out += self._feedback(slave)
+                        frames_out += 1
+
+            if out and self._byte_time:
+                now = time.perf_counter()
+                if now < self._tx_busy_until:
+                    self.feedback_skipped += frames_out
+                    out.clear()
+                else:
+                    self._tx_busy_until = now + len(out) * self._byte_time
+            if out:
+                os.write(self._master_fd, out)
+
+        self.cpu_time = time.thread_time() - cpu_start
@@ -0,0 +1,183 @@
+"""
+Stand-in for the ZED-F9P on a pseudo-terminal, so drivers/gps.py can be checked at
+high navigation rates without the receiver.
+
+    with GNSSSimulator(rate=20) as rx:
+        gps = GPS(port=rx.port, nav_rate=20)
+"""
+import math
+import multiprocessing
+import os
+import select
+import threading
+import time
+import tty
+from datetime import datetime, timezone
+from pyrtcm import calc_crc24q # type: ignore
+from pyubx2 import UBXMessage # type: ignore
+
+from drivers.gps import REFLAT, REFLON
+
+
+def nmea_gga(lat: float, lon: float, utc: datetime, quality: int = 4, sats: int = 22) -> bytes:
+    lat_deg, lon_deg = int(abs(lat)), int(abs(lon))
+    body = (
+        f"GNGGA,{utc:%H%M%S}.{utc.microsecond // 10000:02d},"
+        f"{lat_deg:02d}{(abs(lat) - lat_deg) * 60:08.5f},{'N' if lat >= 0 else 'S'},"
+        f"{lon_deg:03d}{(abs(lon) - lon_deg) * 60:08.5f},{'E' if lon >= 0 else 'W'},"
+        f"{quality},{sats},0.6,12.3,M,-33.1,M,1.0,0000"
+    )
+    checksum = 0
+    for char in body.encode():
+        checksum ^= char
+    return f"${body}*{checksum:02X}\r\n".encode()
+
+
+class GNSSSimulator:
+    """
+    Opens a pty pair and writes one NAV-PVT per navigation epoch to `port`, plus a GGA
+    once a second, with the epoch time taken from the host clock. The rover drives a
+    slow circle around the Boston reference point.
+
+    Args:
+    rate: navigation epochs per second
+    latency: s between the epoch and the moment its NAV-PVT is written, like the receiver's solution time
+    process: run in a forked process, so output timing doesn't depend on the GIL of the process under test
+    fix_after: None reports RTK fixed all the time. Otherwise the solution follows the RTCM3
+    the host writes: float from the first valid frame, fixed after `fix_after` s of
+    corrections, back to no RTK once corrections are `correction_timeout` s old.
+    """
+
+    def __init__(self,
+                 rate: float = 20,
+                 latency: float = 0.02,
+                 process: bool = False,
+                 fix_after: float | None = None,
+                 correction_timeout: float = 10.0):
+        self.rate = rate
+        self.latency = latency
+        self.process = process
+        self.fix_after = fix_after
+        self.correction_timeout = correction_timeout
+
+        self._master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+
+        self.received = bytearray()  # everything the host wrote (config, RTCM)
+        self.epochs_sent = 0
+        self.rtcm_frames = 0
+
+        self._rtcm_buffer = bytearray()
+        self._last_rtcm: float | None = None
+        self._corrected_since: float | None = None  # start of the current run of corrections
+
+        if process:
+            context = multiprocessing.get_context("fork")
+            self._stop_event = context.Event()
+            self._results, child_results = context.Pipe(duplex=False)
+            self._thread = context.Process(target=self._run_process, args=(child_results,), daemon=True)
+        else:
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self.process:
+            if self._results.poll(2):
+                self.epochs_sent, self.rtcm_frames, received = self._results.recv()
+                self.received[:] = received
+            self._thread.join(timeout=2)
+        elif self._thread.is_alive():
+            self._thread.join(timeout=2)
+        os.close(self._master_fd)
+        os.close(self._slave_fd)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _scan_rtcm(self, data: bytes):
+        buffer = self._rtcm_buffer
+        buffer += data
+        pos = 0
+        while True:
+            start = buffer.find(0xD3, pos)
+            if start < 0 or len(buffer) - start < 3:
+                pos = len(buffer) if start < 0 else start
+                break
+            end = start + 3 + ((buffer[start + 1] & 0x03) << 8 | buffer[start + 2]) + 3
+            if len(buffer) < end:
+                pos = start
+                break
+            if calc_crc24q(bytes(buffer[start:end])) != 0:
+                pos = start + 1
+                continue
+            self.rtcm_frames += 1
+            now = time.time()
+            if self._last_rtcm is None or now - self._last_rtcm > self.correction_timeout:
+                self._corrected_since = now
+            self._last_rtcm = now
+            pos = end
+        del buffer[:pos]
+
+    def _solution(self, epoch: float) -> tuple[int, int, int]:
+        """(carrSoln, diffSoln, lastCorrectionAge) for this epoch."""
+        if self.fix_after is None:
+            return 2, 1, 1
+        if self._last_rtcm is None or epoch - self._last_rtcm > self.correction_timeout:
+            return 0, 0, 0
+        age = epoch - self._last_rtcm
+        age_enum = 1 if age < 1 else 2 if age < 2 else 3 if age < 5 else 4  # u-blox lastCorrectionAge buckets
+        fixed = self._corrected_since is not None and epoch - self._corrected_since >= self.fix_after
+        return 2 if fixed else 1, 1, age_enum
+
+    def _epoch(self, epoch: float) -> bytes:
+        utc = datetime.fromtimestamp(epoch, timezone.utc)
+        angle = self.epochs_sent / self.rate * 0.1
+        lat = REFLAT + 1e-4 * math.sin(angle)
+        lon = REFLON + 1e-4 * math.cos(angle)
+        carr_soln, diff_soln, correction_age = self._solution(epoch)
+        pvt = UBXMessage(
+            "NAV", "NAV-PVT", 0,
+            iTOW=int(round(epoch * 1000)) % (7 * 86400 * 1000),
+            year=utc.year, month=utc.month, day=utc.day,
+            hour=utc.hour, min=utc.minute, second=utc.second, nano=utc.microsecond * 1000,
+            validDate=1, validTime=1, fixType=3, gnssFixOk=1, diffSoln=diff_soln, carrSoln=carr_soln, numSV=22,
+            lat=lat, lon=lon, height=-20800, hMSL=12300, hAcc={2: 14, 1: 300}.get(carr_soln, 1500),
+            vAcc=20, gSpeed=500, lastCorrectionAge=correction_age,
+        )
+        out = pvt.serialize()
+        if self.epochs_sent % max(1, int(round(self.rate))) == 0:
+            out += nmea_gga(lat, lon, utc, quality={2: 4, 1: 5}.get(carr_soln, 1))
+        self.epochs_sent += 1
+        return out
+
+    def _run_process(self, results):
+        self._run()
+        results.send((self.epochs_sent, self.rtcm_frames, bytes(self.received)))
+
+    def _run(self):
+        period = 1 / self.rate
+        next_epoch = math.ceil(time.time() / period) * period  # epochs are aligned to the second, like the receiver
+
+        while not self._stop_event.is_set():
+            timeout = max(0.0, min(0.05, next_epoch + self.latency - time.time()))
+            readable, _, _ = select.select([self._master_fd], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self._master_fd, 4096)
+                except OSError:
+                    break
+                self.received += data
+                self._scan_rtcm(data)
+
+            if time.time() >= next_epoch + self.latency:
+                os.write(self._master_fd, self._epoch(next_epoch))
+                next_epoch += period
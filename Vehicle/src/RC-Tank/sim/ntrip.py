@@ -0,0 +1,278 @@
+"""
+Stand-in for an NTRIP caster (RTKdata, MaCORS) on localhost, so the GPS driver's
+correction path can be benchmarked and tested without the internet.
+
+    with NTRIPCaster(latency=0.2, dropout_interval=30) as caster:
+        gps = GPS(port=rx.port, casters=[Caster("127.0.0.1", caster.port, caster.mountpoint)])
+
+Serves RTCM3 recorded with `GPS(record=...)`, or a synthetic 1 Hz base station stream
+(1005 + MSM4 for GPS, GLONASS, Galileo and BeiDou) when no recording is given.
+"""
+import random
+import socket
+import threading
+import time
+from typing import NamedTuple
+from pyrtcm import calc_crc24q # type: ignore
+
+from drivers.gps import TX, read_recording
+
+MSM4_TYPES = (1074, 1084, 1094, 1124)  # GPS, GLONASS, Galileo, BeiDou
+
+
+class BitWriter:
+    def __init__(self):
+        self.value = 0
+        self.bits = 0
+
+    def put(self, value: int, bits: int):
+        self.value = (self.value << bits) | (value & ((1 << bits) - 1))
+        self.bits += bits
+
+    def to_bytes(self) -> bytes:
+        padding = -self.bits % 8
+        return (self.value << padding).to_bytes((self.bits + padding) // 8, "big")
+
+
+def rtcm_frame(payload: bytes) -> bytes:
+    frame = bytes((0xD3, len(payload) >> 8 & 0x03, len(payload) & 0xFF)) + payload
+    return frame + calc_crc24q(frame).to_bytes(3, "big")
+
+
+def rtcm_1005(station: int = 1) -> bytes:
+    """Stationary reference station ARP, roughly at the Boston reference point."""
+    bits = BitWriter()
+    bits.put(1005, 12)
+    bits.put(station, 12)
+    bits.put(0, 6)  # ITRF realization year
+    bits.put(0b1111, 4)  # GPS, GLONASS, Galileo, reference station indicator
+    bits.put(15297340000, 38)  # ECEF X, 0.0001 m
+    bits.put(0, 1)  # single receiver oscillator
+    bits.put(0, 1)  # reserved
+    bits.put(-45541540000, 38)  # ECEF Y
+    bits.put(0, 2)  # quarter cycle indicator
+    bits.put(42794460000, 38)  # ECEF Z
+    return rtcm_frame(bits.to_bytes())
+
+
+def rtcm_msm4(msg_type: int, epoch_ms: int, sats: int, signals: int, rng: random.Random, station: int = 1, last: bool = False) -> bytes:
+    """An MSM4 message with random but well-formed observations."""
+    bits = BitWriter()
+    bits.put(msg_type, 12)
+    bits.put(station, 12)
+    bits.put(epoch_ms, 30)
+    bits.put(0 if last else 1, 1)  # multiple message bit
+    bits.put(0, 3)  # IODS
+    bits.put(0, 7)  # reserved
+    bits.put(0, 2)  # clock steering
+    bits.put(0, 2)  # external clock
+    bits.put(0, 1)  # smoothing
+    bits.put(0, 3)  # smoothing interval
+    bits.put(((1 << sats) - 1) << (64 - sats), 64)  # satellite mask
+    bits.put(((1 << signals) - 1) << (32 - signals), 32)  # signal mask
+    bits.put((1 << sats * signals) - 1, sats * signals)  # cell mask
+    for _ in range(sats):
+        bits.put(rng.randint(60, 90), 8)  # rough range, ms
+    for _ in range(sats):
+        bits.put(rng.getrandbits(10), 10)  # rough range modulo 1 ms
+    cells = sats * signals
+    for _ in range(cells):
+        bits.put(rng.getrandbits(15), 15)  # fine pseudorange
+    for _ in range(cells):
+        bits.put(rng.getrandbits(22), 22)  # fine phase range
+    for _ in range(cells):
+        bits.put(15, 4)  # lock time indicator
+    for _ in range(cells):
+        bits.put(0, 1)  # half-cycle ambiguity
+    for _ in range(cells):
+        bits.put(rng.randint(30, 50), 6)  # CNR, dBHz
+    return rtcm_frame(bits.to_bytes())
+
+
+def synthetic_rtcm(seconds: int = 60, seed: int | None = None) -> list[tuple[float, bytes]]:
+    """(offset in s, frames) for a 1 Hz base station, 1005 every 10 s."""
+    rng = random.Random(seed)
+    stream = []
+    for second in range(seconds):
+        out = rtcm_1005() if second % 10 == 0 else b""
+        for i, msg_type in enumerate(MSM4_TYPES):
+            out += rtcm_msm4(msg_type, second * 1000 % 604_800_000, rng.randint(7, 10), 2, rng, last=i == len(MSM4_TYPES) - 1)
+        stream.append((float(second), out))
+    return stream
+
+
+def recorded_rtcm(path: str) -> list[tuple[float, bytes]]:
+    """(offset in s, bytes) of the corrections written to the receiver in a GPS recording."""
+    stream = []
+    first = None
+    for timestamp, direction, data in read_recording(path):
+        if direction != TX or data[:1] != b"\xd3":
+            continue  # config writes
+        first = timestamp if first is None else first
+        stream.append((timestamp - first, bytes(data)))
+    if not stream:
+        raise ValueError(f"{path} has no RTCM corrections")
+    return stream
+
+
+class Connection(NamedTuple):
+    opened: float  # time.time()
+    closed: float
+    first_byte: float | None  # time.time() of the first correction byte sent
+    bytes_sent: int
+    dropped: bool  # closed by a simulated dropout
+
+
+class NTRIPCaster:
+    """
+    Serves one RTCM stream on `mountpoint` to any number of NTRIP 1 or 2 clients,
+    looping the source. Other mountpoints get 404, an empty one gets a sourcetable.
+
+    Args:
+    source: (offset in s, bytes) like `synthetic_rtcm` or `recorded_rtcm`, synthetic if None
+    latency: s added before every chunk is sent, like a slow caster or link
+    bandwidth: bytes/s the client link can carry, None is unlimited
+    dropout_interval: mean s between connections being dropped (random, exponential), None never drops
+    dropout_mode: "close" resets the connection, "stall" keeps it open and stops sending (a dead cellular link)
+
+    Set `down` to answer every new request with 503, like a caster that is out of service.
+    """
+
+    def __init__(self,
+                 source: list[tuple[float, bytes]] | None = None,
+                 mountpoint: str = "AUTO",
+                 latency: float = 0.0,
+                 bandwidth: float | None = None,
+                 dropout_interval: float | None = None,
+                 dropout_mode: str = "close",
+                 seed: int | None = None):
+        self.source = source or synthetic_rtcm(seed=seed)
+        self.mountpoint = mountpoint
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.dropout_interval = dropout_interval
+        self.dropout_mode = dropout_mode
+        self.down = False
+        self._random = random.Random(seed)
+        self._period = self.source[-1][0] + 1  # loop length, s
+
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.port = self._server.getsockname()[1]
+
+        self.connections: list[Connection] = []
+        self.gga_received = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._server.close()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def bytes_sent(self) -> int:
+        return sum(c.bytes_sent for c in self.connections)
+
+    def _accept(self):
+        while not self._stop_event.is_set():
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _read_request(self, client: socket.socket) -> tuple[str, bool] | None:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            data = client.recv(4096)
+            if not data:
+                return None
+            request += data
+        header, body = request.split(b"\r\n\r\n", 1)
+        lines = header.decode(errors="replace").split("\r\n")
+        path = lines[0].split(" ")[1].lstrip("/")
+        ntrip2 = any(line.lower().startswith("ntrip-version: ntrip/2") for line in lines)
+        if b"GGA" in body or any(line.lower().startswith("ntrip-gga") for line in lines):
+            self.gga_received += 1
+        return path, ntrip2
+
+    def _count_gga(self, client: socket.socket, closed: threading.Event):
+        """NTRIP 1 clients keep sending GGA on the same socket."""
+        try:
+            while True:
+                data = client.recv(4096)
+                if not data:
+                    break
+                self.gga_received += data.count(b"GGA")
+        except OSError:
+            pass
+        closed.set()
+
+    def _serve(self, client: socket.socket):
+        opened = time.time()
+        first_byte = None
+        sent = 0
+        dropped = False
+        try:
+            request = self._read_request(client)
+            if request is None:
+                return
+            path, ntrip2 = request
+            if path == "":
+                table = f"STR;{self.mountpoint};RC-Tank;RTCM 3.2;;2;GPS+GLO+GAL+BDS;SIM;USA;42.36;-71.06;1;0;sim;none;B;N;0;\r\nENDSOURCETABLE\r\n"
+                client.sendall(f"SOURCETABLE 200 OK\r\nContent-Type: gnss/sourcetable\r\n\r\n{table}".encode())
+                return
+            if path != self.mountpoint:
+                client.sendall(b"HTTP/1.1 404 Not Found\r\n\r\n")
+                return
+            if self.down:
+                client.sendall(b"HTTP/1.1 503 Service Unavailable\r\n\r\n")
+                return
+            if ntrip2:
+                client.sendall(b"HTTP/1.1 200 OK\r\nNtrip-Version: Ntrip/2.0\r\nContent-Type: gnss/data\r\n\r\n")
+            else:
+                client.sendall(b"ICY 200 OK\r\n\r\n")
+            closed = threading.Event()
+            threading.Thread(target=self._count_gga, args=(client, closed), daemon=True).start()
+
+            drop_at = opened + self._random.expovariate(1 / self.dropout_interval) if self.dropout_interval else None
+            start = time.perf_counter()
+            loop = 0
+            while not self._stop_event.is_set():
+                for offset, data in self.source:
+                    delay = start + loop * self._period + offset + self.latency - time.perf_counter()
+                    if delay > 0 and self._stop_event.wait(delay):
+                        return
+                    if drop_at and time.time() >= drop_at:
+                        dropped = True
+                        if self.dropout_mode == "stall":
+                            while not closed.is_set() and not self._stop_event.is_set():
+                                closed.wait(0.1)
+                        return
+                    if self.bandwidth:
+                        for i in range(0, len(data), 256):
+                            client.sendall(data[i:i + 256])
+                            time.sleep(min(256, len(data) - i) / self.bandwidth)
+                    else:
+                        client.sendall(data)
+                    first_byte = first_byte or time.time()
+                    sent += len(data)
+                loop += 1
+        except OSError:
+            pass  # client went away
+        finally:
+            client.close()
+            with self._lock:
+                self.connections.append(Connection(opened, time.time(), first_byte, sent, dropped))
@@ -0,0 +1,40 @@
+"""
+Stand-in for periphery.SPI, so drivers/lights.py can be benchmarked without
+/dev/spidev0.0. A transfer blocks the calling thread for as long as the bytes take
+on the wire, like the spidev ioctl does.
+
+    lights = Lights(spi=SPISimulator())
+"""
+import threading
+import time
+
+from drivers.neopixel import SPI_HZ
+
+
+class SPISimulator:
+    """
+    Args:
+    overhead: s per transfer on top of the bytes themselves (ioctl, DMA setup)
+    """
+
+    def __init__(self, max_speed: int = SPI_HZ, overhead: float = 0.0002):
+        self.max_speed = max_speed
+        self.overhead = overhead
+        self._lock = threading.Lock()  # one transfer at a time, like the bus
+        self.transfers = 0
+        self.bytes = 0
+        self.busy = 0.0  # s spent in transfer
+        self.last: bytes | None = None
+
+    def transfer(self, data):
+        with self._lock:
+            duration = len(data) * 8 / self.max_speed + self.overhead
+            time.sleep(duration)
+            self.transfers += 1
+            self.bytes += len(data)
+            self.busy += duration
+            self.last = bytes(data)
+            return type(data)(len(data)) if isinstance(data, (bytes, bytearray)) else [0] * len(data)
+
+    def close(self):
+        pass
@@ -1,25 +1,104 @@
-import { gpsData, heading, ntripStatus, voltage } from '$lib/stores';
+import { gpsData, heading, ntripStatus, ping, voltage } from '$lib/stores';
+import {
+	SUBPROTOCOL_BINARY,
+	SUBPROTOCOL_JSON,
+	clientTime,
+	decodeTelemetry,
+	encodeLights,
+	encodeMotor
+} from './binaryProtocol';
+
+const CLOCK_SYNC_INTERVAL = 2000; // ms
 
 class WebSocketHandler {
 	ws: WebSocket | null = null;
 
 	ping = $state('N/A');
 	pendingRequests = new Map();
+	sequence = 0; // of binary frames and JSON motor commands we send, the server drops stale ones
+	telemetry: any = null; // last keyframe with the deltas since applied
+	clockOffset: number | null = null; // s, server clock minus ours, from the last ping
+	rtt: number | null = null; // s, of the last ping without the server's time in between
+	clockSync: ReturnType<typeof setInterval> | undefined;
 
 	connect(ip: string) {
-		this.ws = new WebSocket(`wss://${ip}:5000/ws`);
-		this.ws.onmessage = (e) => this.handleMessage(JSON.parse(e.data));
+		// The server picks binary if it can, motor, lights and telemetry then go as binary frames
+		this.ws = new WebSocket(`wss://${ip}:5000/ws`, [SUBPROTOCOL_BINARY, SUBPROTOCOL_JSON]);
+		this.ws.binaryType = 'arraybuffer';
+		clearInterval(this.clockSync);
+		this.clockSync = setInterval(() => this.syncClock().catch(() => {}), CLOCK_SYNC_INTERVAL);
+		this.ws.onmessage = (e) => {
+			if (e.data instanceof ArrayBuffer) {
+				const telemetry = decodeTelemetry(e.data);
+				if (telemetry) this.handleTelemetry(telemetry);
+			} else this.handleMessage(JSON.parse(e.data));
+		};
+	}
+
+	get binary() {
+		return this.ws?.protocol === SUBPROTOCOL_BINARY;
 	}
 
 	send(type: string, data: any) {
 		if (this.ws?.readyState === WebSocket.OPEN) {
-			const id = crypto.randomUUID();
 			type = type.toLowerCase();
-			this.ws.send(JSON.stringify({ id, type, data }));
+			if (this.binary && (type === 'motor' || type === 'lights')) {
+				const sequence = this.sequence++;
+				this.ws.send(
+					type === 'motor'
+						? encodeMotor(sequence, data.left, data.right)
+						: encodeLights(sequence, data)
+				);
+				return String(sequence); // success
+			}
+			const id = crypto.randomUUID();
+			const message =
+				type === 'motor'
+					? { id, type, data, sequence: this.sequence++, timestamp: clientTime() }
+					: { id, type, data };
+			this.ws.send(JSON.stringify(message));
 			return id; // success
 		} else return false; // error
 	}
 
+	// NTP style: the pong carries when the server got the ping and when it answered. We send
+	// the offset and round trip back with the next ping, the server uses them to put the
+	// timestamps on our motor commands on its clock for latency tracing
+	async syncClock() {
+		const sent = clientTime();
+		const reply: any = await this.twoWayMessage('ping', {
+			sent,
+			offset: this.clockOffset,
+			rtt: this.rtt
+		});
+		const received = clientTime();
+		this.rtt = received - sent - (reply.server_sent - reply.server_received);
+		this.clockOffset = (reply.server_received - sent + (reply.server_sent - received)) / 2;
+		this.ping = `${Math.round((received - sent) * 1000)}ms`;
+		ping.set(this.ping);
+	}
+
+	handleTelemetry(data: any) {
+		voltage.set(data.voltage);
+
+		gpsData.set({
+			lat: data.gps.lat,
+			lon: data.gps.lon,
+			alt: data.gps.alt
+		});
+
+		ntripStatus.set({
+			fixType: data.ntrip_status.fix_type,
+			rtk: data.ntrip_status.rtk,
+			diffSoln: data.ntrip_status.diff_soln,
+			corrAge: data.ntrip_status.corr_age,
+			hAcc: data.ntrip_status.h_acc,
+			sats: data.ntrip_status.sats
+		});
+
+		heading.set(data.heading);
+	}
+
 	handleMessage(message: any) {
 		const splitMessage = message.type.split(':');
 
@@ -36,24 +115,13 @@ class WebSocketHandler {
 			const messageType = splitMessage[0];
 
 			if (messageType === 'telemetry') {
-				voltage.set(message.data.voltage);
-
-				gpsData.set({
-					lat: message.data.gps.lat,
-					lon: message.data.gps.lon,
-					alt: message.data.gps.alt
-				});
-
-				ntripStatus.set({
-					fixType: message.data.ntrip_status.fix_type,
-					rtk: message.data.ntrip_status.rtk,
-					diffSoln: message.data.ntrip_status.diff_soln,
-					corrAge: message.data.ntrip_status.corr_age,
-					hAcc: message.data.ntrip_status.h_acc,
-					sats: message.data.ntrip_status.sats
-				});
-
-				heading.set(message.data.heading);
+				// keyframe, everything
+				this.telemetry = message.data;
+				this.handleTelemetry(this.telemetry);
+			} else if (messageType === 'telemetry_delta' && this.telemetry) {
+				// only the fields that changed, wait for a keyframe if we don't have one yet
+				this.telemetry = { ...this.telemetry, ...message.data };
+				this.handleTelemetry(this.telemetry);
 			}
 		}
 	}
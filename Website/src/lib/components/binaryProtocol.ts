@@ -0,0 +1,82 @@
+// Binary websocket subprotocol, mirrors Vehicle/src/RC-Tank/api/protocol.py. Change both together.
+// Little-endian frames: kind (u8), sequence (u32), timestamp (f64, s since the epoch), then the payload.
+
+import { STOP_SPEED } from '$lib/stores';
+
+export const SUBPROTOCOL_BINARY = 'rctank.binary.v1';
+export const SUBPROTOCOL_JSON = 'rctank.json';
+
+const KIND_MOTOR = 1;
+const KIND_LIGHTS = 2;
+const KIND_TELEMETRY = 3;
+
+const HEADER_SIZE = 13;
+const MOTOR_SIZE = HEADER_SIZE + 4; // left, right: i16, a stop goes as 0, 0
+const LIGHTS_SIZE = HEADER_SIZE + 1; // level: u8
+const TELEMETRY_SIZE = HEADER_SIZE + 41;
+
+const RTK = ['None', 'Float', 'Fixed', 'Unknown'];
+const NO_INT = 0xff;
+const NO_H_ACC = 0xffffffff;
+
+// s since the epoch, sub-millisecond unlike Date.now().
+// The server lines it up with its own clock for latency tracing.
+export const clientTime = () => (performance.timeOrigin + performance.now()) / 1000;
+
+const clamp = (value: number, low: number, high: number) =>
+	Math.max(low, Math.min(high, Math.round(value)));
+
+function header(view: DataView, kind: number, sequence: number) {
+	view.setUint8(0, kind);
+	view.setUint32(1, sequence >>> 0, true);
+	view.setFloat64(5, clientTime(), true);
+}
+
+export function encodeMotor(sequence: number, left: number, right: number): ArrayBuffer {
+	const buffer = new ArrayBuffer(MOTOR_SIZE);
+	const view = new DataView(buffer);
+	header(view, KIND_MOTOR, sequence);
+	if (left === STOP_SPEED || right === STOP_SPEED) left = right = 0; // would clamp to full speed
+	view.setInt16(13, clamp(left, -1000, 1000), true);
+	view.setInt16(15, clamp(right, -1000, 1000), true);
+	return buffer;
+}
+
+export function encodeLights(sequence: number, level: number): ArrayBuffer {
+	const buffer = new ArrayBuffer(LIGHTS_SIZE);
+	const view = new DataView(buffer);
+	header(view, KIND_LIGHTS, sequence);
+	view.setUint8(13, clamp(level, 0, 100));
+	return buffer;
+}
+
+const orNull = (value: number, missing: number = NO_INT) => (value === missing ? null : value);
+const nanToNull = (value: number) => (Number.isNaN(value) ? null : value);
+
+// Returns the same shape as the "data" of a JSON telemetry message, or null for anything else
+export function decodeTelemetry(buffer: ArrayBuffer) {
+	const view = new DataView(buffer);
+	if (buffer.byteLength !== TELEMETRY_SIZE || view.getUint8(0) !== KIND_TELEMETRY) return null;
+
+	const rtk = view.getUint8(51);
+	return {
+		sequence: view.getUint32(1, true),
+		timestamp: view.getFloat64(5, true),
+		gps: {
+			lat: view.getFloat64(13, true),
+			lon: view.getFloat64(21, true),
+			alt: view.getFloat32(29, true)
+		},
+		heading: nanToNull(view.getFloat32(33, true)),
+		voltage: nanToNull(view.getFloat32(37, true)),
+		position_age: nanToNull(view.getFloat32(41, true)),
+		ntrip_status: {
+			h_acc: orNull(view.getUint32(45, true), NO_H_ACC),
+			corr_age: orNull(view.getUint8(49)),
+			rtk: rtk < RTK.length ? RTK[rtk] : null,
+			fix_type: orNull(view.getUint8(50)),
+			diff_soln: orNull(view.getUint8(52)),
+			sats: orNull(view.getUint8(53))
+		}
+	};
+}